@@ -0,0 +1,46 @@
+
+''' Measure how long it takes a fresh interpreter to import flipper and do some light work.
+
+Each measurement is made in a new subprocess so that nothing is already
+imported. Run using:
+    
+    > python benchmarks/startup.py [repeats] '''
+
+import subprocess
+import sys
+from statistics import median
+
+HEAVY_MODULES = ['numpy', 'networkx', 'pandas', 'realalg', 'snappy', 'multiprocessing', 'sqlite3']
+
+STAGES = [
+    ('import flipper', 'import flipper'),
+    ('load surface', 'import flipper; S = flipper.load("S_2_1")'),
+    ('apply encoding', 'import flipper; S = flipper.load("S_2_1"); h = S.mapping_class("abcD"); h(S.triangulation.key_curves()[0])'),
+    ]
+
+TEMPLATE = '''
+import sys
+from time import perf_counter
+start = perf_counter()
+{code}
+print(perf_counter() - start)
+print(','.join(module for module in {heavy!r} if module in sys.modules))
+'''
+
+def measure(code):
+    ''' Return the time taken to run code in a fresh interpreter and the heavy modules that it imported. '''
+    
+    output = subprocess.run([sys.executable, '-c', TEMPLATE.format(code=code, heavy=HEAVY_MODULES)], check=True, capture_output=True, text=True).stdout.split('\n')
+    return float(output[0]), [module for module in output[1].split(',') if module]
+
+def main(repeats=5):
+    ''' Print the median startup time of each stage. '''
+    
+    for name, code in STAGES:
+        results = [measure(code) for _ in range(repeats)]
+        timing = median(time for time, _ in results)
+        print(f'{name:<16} {1000 * timing:8.1f}ms   heavy modules: {", ".join(results[0][1]) or "none"}')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
+
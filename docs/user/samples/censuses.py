@@ -2,7 +2,7 @@ from time import time
 import snappy
 import flipper
 
-for _, row in flipper.census('CHW').iterrows():
+for row in flipper.get_census('CHW'):
     start_time = time()
     M = snappy.Manifold(row.manifold)
     N = snappy.Manifold(flipper.load(row.surface).mapping_class(row.monodromy).bundle())
@@ -1,6 +1,6 @@
 import flipper
 
-for _, row in flipper.census('knots').iterrows():
+for row in flipper.get_census('knots'):
     stratum = flipper.load(row.surface).mapping_class(row.monodromy).stratum()
     vertex_orders = [stratum[singularity] for singularity in stratum]
     real_vertex_orders = [stratum[singularity] for singularity in stratum if not singularity.filled]
@@ -28,17 +28,13 @@ or by loading one of the provided EquippedTriangulations using::
 # import flipper.application  # Uses tkinter.
 import flipper.kernel
 from flipper.load import load  # noqa: F401
-from flipper.census import census  # noqa: F401
+from flipper.census import census, get_census  # noqa: F401
 
 from numbers import Integral as IntegerType  # noqa: F401
 
-import importlib.metadata
-__version__ = importlib.metadata.version('flipper')
-
 # Set up really short names for the most commonly used classes and functions by users.
 create_triangulation = flipper.kernel.create_triangulation
 triangulation_from_iso_sig = flipper.kernel.triangulation_from_iso_sig
-monodromy_from_bundle = flipper.kernel.monodromy_from_bundle
 norm = flipper.kernel.norm
 
 AbortError = flipper.kernel.AbortError
@@ -47,3 +43,16 @@ AssumptionError = flipper.kernel.AssumptionError
 ComputationError = flipper.kernel.ComputationError
 FatalError = flipper.kernel.FatalError
 
+def __getattr__(name):
+    # These are looked up on first use as they are slow to import.
+    if name == '__version__':
+        import importlib.metadata  # pylint: disable=import-outside-toplevel
+        value = importlib.metadata.version('flipper')
+    elif name == 'monodromy_from_bundle':
+        value = flipper.kernel.monodromy_from_bundle
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    
+    globals()[name] = value  # So we only go through this lookup once.
+    return value
+
@@ -1,18 +1,197 @@
 
-''' A module for loading flipper databases. '''
+''' A module for loading flipper databases.
 
-import pandas as pd
+Each census is parsed the first time that it is used and is then held in
+memory as a Census. A copy of the parsed columns is also written to
+flipper.kernel.utilities.cache_directory() so that later sessions can
+skip parsing the CSV file altogether. '''
 
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+import csv
 import os
+import pickle
+import zlib
+
+import flipper
 
 DATABASE_DIRECTORY = os.path.join(os.path.dirname(__file__), 'censuses')
 DATABASES = set(os.path.splitext(os.path.basename(path))[0] for path in os.listdir(DATABASE_DIRECTORY) if os.path.splitext(path)[1] == '.csv')
+CACHE_VERSION = 1
+
+# The Census objects that have been loaded so far, indexed by the path of their CSV file.
+LOADED = dict()
+
+def _parse_column(values):
+    ''' Return the given column of strings converted to ints, floats or bools if every entry allows it.
+    
+    Missing entries become None. This matches how pandas.read_csv types the columns of a census. '''
+    
+    present = [value for value in values if value != '']
+    for kind in [int, float]:
+        try:
+            for value in present: kind(value)
+        except ValueError:
+            continue
+        return [kind(value) if value != '' else None for value in values]
+    
+    if present and all(value in ('True', 'False') for value in present):
+        return [value == 'True' if value != '' else None for value in values]
+    
+    return [value if value != '' else None for value in values]
+
+class Census:
+    ''' This represents a census of monodromies, stored column by column.
+    
+    Rows can be streamed using iter(self) and looked up by manifold name,
+    monodromy, surface and dilatation. The indices needed for these lookups
+    are built the first time that they are used. '''
+    def __init__(self, name, columns, data):
+        assert isinstance(columns, (list, tuple))
+        assert isinstance(data, dict)
+        assert all(len(data[column]) == len(data[columns[0]]) for column in columns)
+        
+        self.name = name
+        self.columns = list(columns)
+        self.data = data
+        self.num_rows = len(self.data[self.columns[0]]) if self.columns else 0
+        self.Row = namedtuple('Row', [column.replace(' ', '_') for column in self.columns])
+        
+        self._cache = dict()
+    
+    @classmethod
+    def from_csv(cls, path):
+        ''' Return the census stored in the given CSV file. '''
+        
+        with open(path, newline='', encoding='utf-8') as source:
+            reader = csv.reader(source)
+            columns = next(reader)
+            rows = [row for row in reader if row]  # Skip blank lines.
+        
+        data = dict((column, _parse_column([row[index] for row in rows])) for index, column in enumerate(columns))
+        return cls(os.path.splitext(os.path.basename(path))[0], columns, data)
+    
+    def __repr__(self):
+        return str(self)
+    def __str__(self):
+        return f'Census {self.name} with {self.num_rows} rows'
+    def __len__(self):
+        return self.num_rows
+    def __iter__(self):
+        return self.rows()
+    def __getitem__(self, index):
+        return self.Row(*[self.data[column][index] for column in self.columns])
+    def __reduce__(self):
+        return (self.__class__, (self.name, self.columns, self.data))
+    
+    def rows(self):
+        ''' Yield the rows of this census in order as named tuples. '''
+        
+        for index in range(self.num_rows):
+            yield self[index]
+    
+    def _index(self, column):
+        ''' Return a dictionary mapping each value in the given column to the list of rows where it occurs. '''
+        
+        if ('index', column) not in self._cache:
+            index = dict()
+            for position, value in enumerate(self.data[column]):
+                index.setdefault(value, []).append(position)
+            self._cache[('index', column)] = index
+        
+        return self._cache[('index', column)]
+    
+    def by_manifold(self, manifold):
+        ''' Return the row describing the given manifold.
+        
+        Raises a KeyError if there is no such row. '''
+        
+        positions = self._index('manifold').get(manifold)
+        if not positions:
+            raise KeyError(manifold)
+        
+        return self[positions[0]]
+    
+    def by_surface(self, surface):
+        ''' Return the list of rows whose monodromy is over the given surface. '''
+        
+        return [self[position] for position in self._index('surface').get(surface, [])]
+    
+    def by_monodromy(self, monodromy, surface=None):
+        ''' Return the list of rows with the given monodromy.
+        
+        If surface is given then only rows over that surface are returned. '''
+        
+        return [self[position] for position in self._index('monodromy').get(monodromy, []) if surface is None or self.data['surface'][position] == surface]
+    
+    def by_dilatation(self, lower=None, upper=None):
+        ''' Return the list of rows whose dilatation lies in the interval [lower, upper], in order of dilatation.
+        
+        A bound of None means that side of the interval is unbounded. '''
+        
+        if 'dilatation_order' not in self._cache:
+            order = sorted((position for position in range(self.num_rows) if self.data['dilatation'][position] is not None), key=lambda position: self.data['dilatation'][position])
+            self._cache['dilatation_order'] = (order, [self.data['dilatation'][position] for position in order])
+        
+        order, dilatations = self._cache['dilatation_order']
+        start = 0 if lower is None else bisect_left(dilatations, lower)
+        stop = len(order) if upper is None else bisect_right(dilatations, upper)
+        return [self[position] for position in order[start:stop]]
+    
+    def dataframe(self):
+        ''' Return this census as a pandas.DataFrame. '''
+        
+        # pandas is slow to import so we only do so when a DataFrame is actually needed.
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        
+        return pd.DataFrame(self.data, columns=self.columns)
+
+def _cache_path(path):
+    ''' Return where the parsed form of the CSV file at path is cached. '''
+    
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(flipper.kernel.utilities.cache_directory(), f'census-{name}-{zlib.crc32(os.path.abspath(path).encode()):08x}.pickle')
+
+def get_census(census_name):
+    ''' Return the requested database as a Census.
+    
+    census_name can either be the name of one of the databases that come
+    with flipper or the path to a CSV file. '''
+    
+    path = os.path.join(DATABASE_DIRECTORY, census_name + '.csv') if census_name in DATABASES else census_name
+    path = os.path.abspath(path)
+    
+    stat = os.stat(path)
+    stamp = (CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+    if path in LOADED and LOADED[path][0] == stamp:
+        return LOADED[path][1]
+    
+    census_object = None
+    cache_path = _cache_path(path)
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            cached_stamp, cached_census = pickle.load(cache_file)
+        if cached_stamp == stamp:
+            census_object = cached_census
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        pass  # There is no usable cached copy.
+    
+    if census_object is None:
+        census_object = Census.from_csv(path)
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(cache_path, 'wb') as cache_file:
+                pickle.dump((stamp, census_object), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError:
+            pass  # The cache directory is not writable, so we will just parse the file again next session.
+    
+    LOADED[path] = (stamp, census_object)
+    return census_object
 
 def census(census_name):
-    ''' Return the requsted database. '''
+    ''' Return the requsted database as a pandas.DataFrame.
     
-    if census_name in DATABASES:
-        census_name = os.path.join(DATABASE_DIRECTORY, census_name + '.csv')
+    Use get_census to access a database without pandas. '''
     
-    return pd.read_csv(census_name)
+    return get_census(census_name).dataframe()
 
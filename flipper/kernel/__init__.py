@@ -15,26 +15,47 @@ in a functions docstring:
         If the assumptions are met then this function is guaranteed to terminate correctly.
         If not then this a flipper.AssumptionError will be raised. '''
 
-from realalg import RealNumberField, RealAlgebraic  # noqa: F401
+import importlib
 
 from .bundle import Bundle  # noqa: F401
+from .cache import ResultCache, MemoryCache  # noqa: F401
 from .encoding import Encoding  # noqa: F401
 from .error import AssumptionError, ComputationError, FatalError, ApproximationError, AbortError  # noqa: F401
 from .equippedtriangulation import EquippedTriangulation  # noqa: F401
 from .flatstructure import FlatStructure, Vector2  # noqa: F401
 from .lamination import Lamination  # noqa: F401
+from .layeredtriangulation import LayeredTriangulation  # noqa: F401
 from .matrix import Matrix, id_matrix, zero_matrix, dot  # noqa: F401
 from .moves import Move, Isometry, EdgeFlip, LinearTransformation  # noqa: F401
 from .permutation import Permutation  # noqa: F401
 from .splittingsequence import SplittingSequence, SplittingSequences  # noqa: F401
 from .triangulation import Vertex, Edge, Triangle, Triangulation, Corner, norm  # noqa: F401
 from .triangulation3 import Tetrahedron, Triangulation3  # noqa: F401
+from .wire import WireReader, WireWriter  # noqa: F401
 
-from . import utilities  # noqa: F401
+from . import cache, utilities, wire  # noqa: F401
 
 # Functions that help with construction.
-from .taut import monodromy_from_bundle  # noqa: F401
 create_triangulation = Triangulation.from_tuple
 triangulation_from_iso_sig = Triangulation.from_string
+triangulation3_from_iso_sig = Triangulation3.from_iso_sig
 create_equipped_triangulation = EquippedTriangulation.from_tuple
 
+
+# Some parts of the kernel rely on large packages that are slow to import.
+# So that workers which only need to apply encodings to integral laminations
+# start quickly, we only load these the first time that they are asked for.
+LAZY_ATTRIBUTES = {
+    'RealNumberField': ('realalg', 'RealNumberField'),
+    'RealAlgebraic': ('realalg', 'RealAlgebraic'),
+    'monodromy_from_bundle': ('flipper.kernel.taut', 'monodromy_from_bundle'),
+    }
+
+def __getattr__(name):
+    if name in LAZY_ATTRIBUTES:
+        module_name, attribute = LAZY_ATTRIBUTES[name]
+        value = getattr(importlib.import_module(module_name), attribute)
+        globals()[name] = value  # So we only go through this lookup once.
+        return value
+    
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -45,6 +45,13 @@ class Bundle:
     def __snappy__(self):
         return self.snappy_string()
     
+    def iso_sig(self):
+        ''' Return the isomorphism signature of the triangulation of this bundle.
+        
+        See Triangulation3.iso_sig() for more information. '''
+        
+        return self.triangulation3.iso_sig()
+    
     def cusp_types(self):
         ''' Return the list of the type of each cusp. '''
         
@@ -69,22 +76,24 @@ class Bundle:
         LONGITUDES, MERIDIANS = flipper.kernel.triangulation3.LONGITUDES, flipper.kernel.triangulation3.MERIDIANS
         
         slopes = [None] * self.triangulation3.num_cusps
+        peripheral_curves = self.triangulation3.peripheral_array()
         
-        for index in range(self.triangulation3.num_cusps):
-            meridian_intersection, longitude_intersection = 0, 0
-            for corner_class in self.triangulation.corner_classes:
-                corner = corner_class[0]
-                tetra, perm = self.immersion[corner.triangle]
-                if tetra.cusp_indices[perm(corner.side)] == index:
-                    for corner in corner_class:
-                        tetra, perm = self.immersion[corner.triangle]
-                        side, other = perm(corner.side), perm(3)
-                        meridian_intersection += tetra.peripheral_curves[MERIDIANS][side][other]
-                        longitude_intersection += tetra.peripheral_curves[LONGITUDES][side][other]
-                    slopes[index] = (longitude_intersection, -meridian_intersection)
-                    break
-            else:
-                raise RuntimeError('No vertex was mapped to this cusp.')
+        # Each cusp is the image of a vertex so we only need to walk around the first vertex mapped to it.
+        for corner_class in self.triangulation.corner_classes:
+            corner = corner_class[0]
+            tetra, perm = self.immersion[corner.triangle]
+            index = tetra.cusp_indices[perm(corner.side)]
+            if slopes[index] is None:
+                meridian_intersection, longitude_intersection = 0, 0
+                for corner in corner_class:
+                    tetra, perm = self.immersion[corner.triangle]
+                    side, other = perm(corner.side), perm(3)
+                    meridian_intersection += int(peripheral_curves[tetra.index, MERIDIANS, side, other])
+                    longitude_intersection += int(peripheral_curves[tetra.index, LONGITUDES, side, other])
+                slopes[index] = (longitude_intersection, -meridian_intersection)
+        
+        if any(slope is None for slope in slopes):
+            raise RuntimeError('No vertex was mapped to this cusp.')
         
         return slopes
         
@@ -101,10 +110,11 @@ class Bundle:
         EXIT_CUSP_LEFT, EXIT_CUSP_RIGHT = flipper.kernel.triangulation3.EXIT_CUSP_LEFT, flipper.kernel.triangulation3.EXIT_CUSP_RIGHT
         
         slopes = [None] * self.triangulation3.num_cusps
+        peripheral_curves = self.triangulation3.peripheral_array()
         
-        cusp_pairing = self.triangulation3.cusp_identification_map()
         for index, cusp in enumerate(self.triangulation3.cusps):
-            self.triangulation3.clear_temp_peripheral_structure()
+            # Only the corners of this cusp are touched.
+            self.triangulation3.clear_temp_peripheral_structure(cusp)
             
             # Set the degeneracy curve into the TEMPS peripheral structure.
             # First find a good starting point:
@@ -116,19 +126,19 @@ class Bundle:
                     break
             
             # Then walk around, never crossing through an edge where both ends veer the same way.
-            current_tetrahedron, current_side, current_other = start_tetrahedron, start_side, start_other
+            current, current_side, current_other = start_tetrahedron.index, start_side, start_other
             while True:
-                current_tetrahedron.peripheral_curves[TEMPS][current_side][current_other] += 1
+                peripheral_curves[current, TEMPS, current_side, current_other] += 1
                 if start_tetrahedron.get_edge_label(current_side, current_other) == VEERING_LEFT:
                     leave = EXIT_CUSP_LEFT[(current_side, current_other)]
                 else:
                     leave = EXIT_CUSP_RIGHT[(current_side, current_other)]
-                current_tetrahedron.peripheral_curves[TEMPS][current_side][leave] -= 1
-                current_tetrahedron, current_side, current_other = cusp_pairing[(current_tetrahedron, current_side, leave)]
-                if (current_tetrahedron, current_side, current_other) == (start_tetrahedron, start_side, start_other):
+                peripheral_curves[current, TEMPS, current_side, leave] -= 1
+                current, current_side, current_other = self.triangulation3.cusp_neighbour(current, current_side, leave)
+                if (current, current_side, current_other) == (start_tetrahedron.index, start_side, start_other):
                     break
             
-            slopes[index] = self.triangulation3.slope()
+            slopes[index] = self.triangulation3.slope(cusp)
         
         return slopes
 
@@ -0,0 +1,206 @@
+
+''' A module for storing the invariants of mapping classes between sessions.
+
+Provides two classes: ResultCache and MemoryCache.
+
+While a cache is installed, the expensive methods of Encoding (order,
+nielsen_thurston_type, pml_fixedpoint, splitting_sequence, dilatation,
+canonical, stratum and the veering bundle) first look up their result
+in it and record any result that they do compute. As results are keyed
+by mapping class rather than by Encoding, different words representing
+the same mapping class share them. A ResultCache stores its results on
+disk, so they can be shared between sessions and processes, while a
+MemoryCache holds a bounded number of them in this process. '''
+
+from collections import OrderedDict
+from hashlib import sha256
+import pickle
+
+import flipper
+
+# The caches that Encodings currently consult, in the order in which they are consulted.
+ACTIVE_CACHES = []
+
+class ResultCache:
+    ''' This represents a store of results about mapping classes.
+    
+    The results are held in an SQLite database at path, so a cache at
+    the same path can be opened again by a later session or by another
+    worker process. The default path of ':memory:' gives a cache that
+    only lasts as long as this object.
+    
+    Each result is stored under the key of a mapping class, see
+    self.key(), and the name of the field it records. '''
+    def __init__(self, path=':memory:', timeout=60.0):
+        # Most sessions never use a ResultCache so we only import this when one is made.
+        import sqlite3  # pylint: disable=import-outside-toplevel
+        
+        self.path = path
+        self.timeout = timeout
+        self.connection = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        if self.path != ':memory:':
+            # Write-ahead logging allows readers to proceed while another process writes.
+            self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT, field TEXT, value BLOB, PRIMARY KEY (key, field))')
+    
+    def __repr__(self):
+        return str(self)
+    def __str__(self):
+        return f'ResultCache({self.path!r})'
+    def __reduce__(self):
+        # Connections cannot be pickled so we just reopen the database.
+        return (self.__class__, (self.path, self.timeout))
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+    def __enter__(self):
+        self.install()
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.uninstall()
+    
+    def install(self):
+        ''' Make Encodings consult this cache. '''
+        
+        if self not in ACTIVE_CACHES:
+            ACTIVE_CACHES.append(self)
+    
+    def uninstall(self):
+        ''' Stop Encodings from consulting this cache. '''
+        
+        if self in ACTIVE_CACHES:
+            ACTIVE_CACHES.remove(self)
+    
+    def close(self):
+        ''' Uninstall this cache and close its database. '''
+        
+        self.uninstall()
+        self.connection.close()
+    
+    @staticmethod
+    def key(encoding):
+        ''' Return the key that results about the given mapping class are stored under.
+        
+        This is built from the labelled source triangulation together with
+        encoding.identify(). Since identify() depends on how the triangulation
+        is labelled, the iso_sig of the triangulation would not be enough. '''
+        
+        assert isinstance(encoding, flipper.kernel.Encoding)
+        
+        if '__cache_key__' not in encoding._cache:
+            data = repr((encoding.source_triangulation.package(), encoding.identify()))
+            encoding._cache['__cache_key__'] = sha256(data.encode('utf-8')).hexdigest()
+        
+        return encoding._cache['__cache_key__']
+    
+    def lookup(self, key, field):
+        ''' Return the value stored under (key, field).
+        
+        Raises a KeyError if there is no such value. '''
+        
+        row = self.connection.execute('SELECT value FROM results WHERE key = ? AND field = ?', (key, field)).fetchone()
+        if row is None:
+            raise KeyError((key, field))
+        
+        return pickle.loads(row[0])
+    
+    def store(self, key, field, value):
+        ''' Store value under (key, field), replacing any existing value. '''
+        
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO results (key, field, value) VALUES (?, ?, ?)', (key, field, data))
+    
+    def fields(self, key):
+        ''' Return the dictionary of all values stored for the given key. '''
+        
+        return dict((field, pickle.loads(value)) for field, value in self.connection.execute('SELECT field, value FROM results WHERE key = ?', (key,)))
+    
+    def clear(self):
+        ''' Remove every value from this cache. '''
+        
+        with self.connection:
+            self.connection.execute('DELETE FROM results')
+
+class MemoryCache(ResultCache):
+    ''' This represents a store of results about mapping classes held in memory.
+    
+    It can be used in the same way as a ResultCache but is much faster to
+    consult. Results are kept pickled, so that the objects handed out can be
+    modified safely, and at most max_size bytes of them are kept. Once this
+    is exceeded the least recently used results are discarded. '''
+    def __init__(self, max_size=2**26):  # pylint: disable=super-init-not-called
+        self.max_size = max_size
+        self.results = OrderedDict()  # Mapping each (key, field) to its pickled value.
+        self.size = 0  # The total number of bytes in self.results.
+        self.hits = 0
+        self.misses = 0
+    
+    def __str__(self):
+        return f'MemoryCache with {len(self)} results using {self.size} of {self.max_size} bytes'
+    def __reduce__(self):
+        # A copy starts empty, which avoids sending lots of data to worker processes.
+        return (self.__class__, (self.max_size,))
+    def __len__(self):
+        return len(self.results)
+    
+    def close(self):
+        ''' Uninstall this cache and discard its results. '''
+        
+        self.uninstall()
+        self.clear()
+    
+    def lookup(self, key, field):
+        ''' Return the value stored under (key, field).
+        
+        Raises a KeyError if there is no such value. '''
+        
+        try:
+            data = self.results[(key, field)]
+        except KeyError:
+            self.misses += 1
+            raise
+        
+        self.hits += 1
+        self.results.move_to_end((key, field))
+        return pickle.loads(data)
+    
+    def store(self, key, field, value):
+        ''' Store value under (key, field), replacing any existing value.
+        
+        This may discard the least recently used values to keep within max_size. '''
+        
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if (key, field) in self.results:
+            self.size -= len(self.results.pop((key, field)))
+        self.results[(key, field)] = data
+        self.size += len(data)
+        
+        while self.size > self.max_size and self.results:
+            _, old_data = self.results.popitem(last=False)
+            self.size -= len(old_data)
+    
+    def fields(self, key):
+        ''' Return the dictionary of all values stored for the given key. '''
+        
+        return dict((field, pickle.loads(data)) for (key2, field), data in self.results.items() if key2 == key)
+    
+    def clear(self):
+        ''' Remove every value from this cache. '''
+        
+        self.results.clear()
+        self.size = 0
+
+def active_caches():
+    ''' Return the list of ResultCaches that are currently installed. '''
+    
+    return list(ACTIVE_CACHES)
+
+def record(encoding, field, value):
+    ''' Store value under field for the given mapping class in every installed ResultCache. '''
+    
+    if ACTIVE_CACHES and encoding.is_mapping_class():
+        key = ResultCache.key(encoding)
+        for cache in ACTIVE_CACHES:
+            cache.store(key, field, value)
+
@@ -4,6 +4,8 @@
 import inspect
 from decorator import decorator
 
+import flipper
+
 @decorator
 def memoize(function, *args, **kwargs):
     ''' A decorator that memoizes a function. '''
@@ -28,3 +30,33 @@ def memoize(function, *args, **kwargs):
     else:
         return result
 
+
+def persistent(field, dump=None, load=None):
+    ''' Return a decorator that stores the result of a method of a mapping class in the installed ResultCaches.
+    
+    The result is recorded under field. Results which cannot be pickled
+    directly can be converted using dump(self, result) before storing and
+    load(self, data) after retrieving. '''
+    
+    @decorator
+    def persist(function, self, *args, **kwargs):
+        caches = flipper.kernel.cache.active_caches()
+        if not caches or args or kwargs or not self.is_mapping_class():
+            return function(self, *args, **kwargs)
+        
+        key = flipper.kernel.ResultCache.key(self)
+        for cache in caches:
+            try:
+                data = cache.lookup(key, field)
+            except KeyError:
+                pass
+            else:
+                return data if load is None else load(self, data)
+        
+        result = function(self, *args, **kwargs)
+        flipper.kernel.cache.record(self, field, result if dump is None else dump(self, result))
+        
+        return result
+    
+    return persist
+
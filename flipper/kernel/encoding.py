@@ -3,15 +3,61 @@
 
 Provides one class: Encoding. '''
 
-from itertools import product
-
 import flipper
-from flipper.kernel.decorators import memoize  # Special import needed for decorating.
+from flipper.kernel.decorators import memoize, persistent  # Special import needed for decorating.
 
 NT_TYPE_PERIODIC = 'Periodic'
 NT_TYPE_REDUCIBLE = 'Reducible'  # Strictly this  means "reducible and not periodic".
 NT_TYPE_PSEUDO_ANOSOV = 'Pseudo-Anosov'
 
+# The primes, and base, used to hash the image of the fingerprint curve, see Encoding.fingerprint().
+FINGERPRINT_PRIMES = (1000000007, 998244353, 2147483647)
+FINGERPRINT_BASE = 1000003
+
+def fingerprint_hash(vector, prime):
+    ''' Return the polynomial hash of the given list of integers modulo prime. '''
+    
+    value = 0
+    for entry in vector:
+        value = (value * FINGERPRINT_BASE + entry) % prime
+    return value
+
+# Helpers for converting results into a form that a ResultCache can store and back again.
+def _dump_pml_fixedpoint(_encoding, result):
+    dilatation, lamination = result
+    return {
+        'dilatation': dilatation,
+        'minpoly': str(dilatation.minpoly()),
+        'approximation': str(dilatation),
+        'lamination': (lamination.geometric, lamination.algebraic),
+        }
+
+def _load_pml_fixedpoint(encoding, data):
+    geometric, algebraic = data['lamination']
+    return data['dilatation'], encoding.source_triangulation.lamination(geometric, algebraic, remove_peripheral=False)
+
+def _dump_splitting_sequence(_encoding, result):
+    return {
+        'preperiodic': result.preperiodic.package(),
+        'mapping_class': result.mapping_class.package(),
+        'dilatation': result.dilatation,
+        'lamination': (result.lamination.geometric, result.lamination.algebraic),
+        }
+
+def _dump_canonical(_encoding, result):
+    return (result.source_triangulation.package(), result.package())
+
+def _load_canonical(_encoding, data):
+    triangulation, sequence = data
+    return flipper.kernel.create_triangulation(*triangulation).encode(sequence)
+
+def _load_splitting_sequence(encoding, data):
+    preperiodic = encoding.source_triangulation.encode(data['preperiodic'])
+    triangulation = preperiodic.target_triangulation
+    mapping_class = triangulation.encode(data['mapping_class'])
+    geometric, algebraic = data['lamination']
+    return flipper.kernel.SplittingSequence(preperiodic, mapping_class, data['dilatation'], triangulation.lamination(geometric, algebraic, remove_peripheral=False))
+
 class Encoding:
     ''' This represents a map between two Triagulations.
     
@@ -35,6 +81,7 @@ class Encoding:
         self.zeta = self.source_triangulation.zeta
         
         self._cache = {'name': ''} if _cache is None else _cache  # For caching hard to compute results.
+        self._inverse = None  # This is kept out of self._cache as that is pickled.
     
     def without_cache(self):
         ''' Return this Encoding but with an empty cache. '''
@@ -86,6 +133,62 @@ class Encoding:
         else:
             return NotImplemented
     
+    def apply_geometric(self, vector):
+        ''' Return the list of geometric intersection numbers corresponding to the image of the given lamination under self. '''
+        
+        for item in reversed(self.sequence):
+            vector = item.apply_geometric(vector)
+        
+        return vector
+    
+    def apply_algebraic(self, vector):
+        ''' Return the list of algebraic intersection numbers corresponding to the image of the given lamination under self. '''
+        
+        for item in reversed(self.sequence):
+            vector = item.apply_algebraic(vector)
+        
+        return vector
+    
+    @memoize
+    def homology_matrix(self):
+        ''' Return the Matrix describing the action of this encoding on H_1.
+        
+        Its columns are the images of the classes of the source_triangulation.homology_section()
+        written in terms of the classes of the target_triangulation.homology_section(),
+        see Triangulation.homology_projection(). So for mapping classes this is an
+        integer matrix and (f * g).homology_matrix() == f.homology_matrix() * g.homology_matrix().
+        
+        When the target_triangulation is equal to the source_triangulation the classes of
+        the source_triangulation are used for both. Otherwise an equal copy of it, such as
+        the target of a pickled mapping class, whose vertices are labelled differently
+        would give this matrix in a different basis. '''
+        
+        # Equal triangulations have the same edges, so a cycle on one is also a cycle on the other.
+        target = self.source_triangulation if self.target_triangulation == self.source_triangulation else self.target_triangulation
+        projection = target.homology_projection()
+        return flipper.kernel.Matrix([projection(self.apply_algebraic(cycle)) for cycle in self.source_triangulation.homology_section()]).transpose()
+    
+    @memoize
+    def quick_invariants(self):
+        ''' Return a tuple of conjugacy invariants of this mapping class that are cheap to compute.
+        
+        These come from the action on H_1, see self.homology_matrix(). They
+        are its trace, its characteristic polynomial and the Lefschetz numbers
+        of its first few powers. So if two mapping classes have different
+        quick_invariants then they are not conjugate.
+        
+        This encoding must be a mapping class. '''
+        
+        assert self.is_mapping_class()
+        
+        M = self.homology_matrix()
+        # The Lefschetz number of f^k is trace(f^k | H_0) - trace(f^k | H_1) + trace(f^k | H_2). Here f acts trivially
+        # on H_0 = Z and, as it preserves orientation, on H_2 which is Z if every vertex is filled and 0 otherwise.
+        # Currently a Triangulation always has an unfilled vertex but this does not rely on that.
+        euler_terms = 2 if self.source_triangulation.num_unfilled_vertices == 0 else 1
+        lefschetz_numbers = tuple(euler_terms - (M**k).trace() for k in range(1, 4))
+        return (M.trace(), tuple(M.char_poly()), lefschetz_numbers)
+    
     def identify(self):
         ''' Return a tuple of integers which uniquely determines this map.
         
@@ -99,16 +202,59 @@ class Encoding:
         
         return self._cache['__identify__']
     
+    def fingerprint(self):
+        ''' Return a small tuple of integers which is the same for equal maps.
+        
+        This is the image of source_triangulation.fingerprint_curve() under
+        this map, hashed modulo a few primes. So it is much cheaper to compute
+        than self.identify() but different maps may still have the same
+        fingerprint. '''
+        
+        if '__fingerprint__' not in self._cache:
+            image = self.apply_geometric(self.source_triangulation.fingerprint_curve().geometric)
+            self._cache['__fingerprint__'] = tuple(fingerprint_hash(image, prime) for prime in FINGERPRINT_PRIMES)
+        
+        return self._cache['__fingerprint__']
+    
+    def _agrees_with(self, other=None):
+        ''' Return if this encoding and other act in the same way on the key curves.
+        
+        If other is None then this is compared against the identity map.
+        The geometric intersection numbers of the images of all of the key
+        curves are compared before any of the algebraic ones and we stop at
+        the first difference. A curve which shows that the maps differ is moved
+        to the front of source_triangulation.key_curve_order() so that it is
+        tested first next time. '''
+        
+        curves = self.source_triangulation.key_curves()
+        order = self.source_triangulation.key_curve_order()
+        
+        for apply in ['apply_geometric', 'apply_algebraic']:
+            for position, index in enumerate(order):
+                vector = curves[index].geometric if apply == 'apply_geometric' else curves[index].algebraic
+                image = getattr(self, apply)(vector)
+                other_image = vector if other is None else getattr(other, apply)(vector)
+                if image != other_image:
+                    order.insert(0, order.pop(position))
+                    return False
+        
+        return True
+    
     def __eq__(self, other):
         if isinstance(other, Encoding):
             if self.source_triangulation != other.source_triangulation or self.target_triangulation != other.target_triangulation:
                 raise ValueError('Cannot compare Encodings between different triangulations.')
             
-            return self.identify() == other.identify()
+            if self.fingerprint() != other.fingerprint():
+                return False
+            if '__identify__' in self._cache and '__identify__' in other._cache:
+                return self.identify() == other.identify()
+            
+            return self._agrees_with(other)
         else:
             return NotImplemented
     def __hash__(self):
-        return hash(self.identify())
+        return hash(self.fingerprint())
     def is_homologous_to(self, other):
         ''' Return if this encoding is homologous to other.
         
@@ -119,7 +265,7 @@ class Encoding:
             if self.source_triangulation != other.source_triangulation or self.target_triangulation != other.target_triangulation:
                 raise ValueError('Cannot compare Encodings between different triangulations.')
             
-            return all(self(curve).is_homologous_to(other(curve)) for curve in self.source_triangulation.key_curves())
+            return self.homology_matrix() == other.homology_matrix()
         else:
             return NotImplemented
     
@@ -128,14 +274,8 @@ class Encoding:
             if self.source_triangulation != other.triangulation:
                 raise ValueError('Cannot apply an Encoding to a Lamination on a triangulation other than source_triangulation.')
             
-            geometric = other.geometric
-            algebraic = other.algebraic
-            
-            for item in reversed(self.sequence):
-                geometric = item.apply_geometric(geometric)
-                algebraic = item.apply_algebraic(algebraic)
-            
-            return self.target_triangulation.lamination(geometric, algebraic, remove_peripheral=False)
+            # The algebraic intersection numbers are only pushed forward if they are needed.
+            return flipper.kernel.Lamination(self.target_triangulation, self.apply_geometric(other.geometric), pushforward=(self, other))
         else:
             return NotImplemented
     def __mul__(self, other):
@@ -157,12 +297,74 @@ class Encoding:
             return self.inverse()**abs(k)
     
     def inverse(self):
-        ''' Return the inverse of this encoding. '''
+        ''' Return the inverse of this encoding.
+        
+        This is only built the first time that it is needed and is then shared. '''
+        
+        if self._inverse is None:
+            self._inverse = Encoding([item.inverse() for item in reversed(self.sequence)], _cache=dict() if 'name' not in self._cache else {'name': f'({self._cache["name"]})^-1'})
+            self._inverse._inverse = self
         
-        return Encoding([item.inverse() for item in reversed(self.sequence)], _cache=dict() if 'name' not in self._cache else {'name': f'({self._cache["name"]})^-1'})
+        return self._inverse
     def __invert__(self):
         return self.inverse()
     
+    def simplify(self):
+        ''' Return an encoding of the same map as this one but with a sequence that is no longer.
+        
+        Isometries are moved towards the end of the sequence, past any
+        EdgeFlips, where they are composed together and dropped if they
+        combine to give the identity. Along the way, consecutive EdgeFlips
+        of the same edge either cancel or are replaced by an isometry.
+        LinearTransformations are left where they are and isometries are not
+        moved past them.
+        
+        The result has the same source_triangulation and target_triangulation
+        as this encoding. '''
+        
+        moves = []  # The moves of the result, in the order in which they are applied.
+        pending = None  # An Isometry that still needs to be applied after moves.
+        for item in reversed(self.sequence):
+            if isinstance(item, flipper.kernel.Isometry):
+                pending = item if pending is None else item * pending
+            elif isinstance(item, flipper.kernel.EdgeFlip):
+                if pending is None:
+                    edge_label = item.edge_label
+                    label_map = None  # The identity.
+                else:
+                    # Commute pending past this flip by flipping the corresponding edge before it.
+                    edge_label = pending.inverse_label_map[item.edge_label]
+                    label_map = dict(pending.label_map)
+                    # A flip always gives the new edge the label norm(edge_label) with the same orientation.
+                    label_map[flipper.kernel.norm(edge_label)] = flipper.kernel.norm(item.edge_label)
+                    label_map[~flipper.kernel.norm(edge_label)] = ~flipper.kernel.norm(item.edge_label)
+                
+                if moves and isinstance(moves[-1], flipper.kernel.EdgeFlip) and moves[-1].edge_index == flipper.kernel.norm(edge_label):
+                    # Flipping an edge twice either undoes the first flip or just reverses the orientation of the edge.
+                    previous = moves.pop()
+                    if label_map is None:
+                        label_map = dict((i, i) for i in previous.source_triangulation.labels)
+                    if previous.edge_label == edge_label:
+                        label_map[edge_label], label_map[~edge_label] = label_map[~edge_label], label_map[edge_label]
+                    pending = flipper.kernel.Isometry(previous.source_triangulation, item.target_triangulation, label_map)
+                elif pending is None:
+                    moves.append(item)
+                else:
+                    moves.append(flipper.kernel.EdgeFlip(pending.source_triangulation, pending.source_triangulation.flip_edge(edge_label), edge_label))
+                    pending = flipper.kernel.Isometry(moves[-1].target_triangulation, item.target_triangulation, label_map)
+            else:
+                if pending is not None and not pending.is_identity():
+                    moves.append(pending)
+                pending = None
+                moves.append(item)
+        
+        if pending is not None and (not pending.is_identity() or not moves):
+            moves.append(pending)
+        elif not moves:  # Everything cancelled.
+            moves.append(self.source_triangulation.id_isometry())
+        
+        return Encoding(moves[::-1], _cache=dict() if 'name' not in self._cache else {'name': self._cache['name']})
+    
     def closing_isometries(self):
         ''' Return all the possible isometries from self.target_triangulation to self.source_triangulation.
         
@@ -170,6 +372,8 @@ class Encoding:
         
         return self.target_triangulation.isometries_to(self.source_triangulation)
     
+    @memoize
+    @persistent('order')
     def order(self):
         ''' Return the order of this mapping class.
         
@@ -183,23 +387,50 @@ class Encoding:
         # for i in range(1, self.source_triangulation.max_order + 1):
         #    if self**i == self.source_triangulation.id_encoding():
         #        return i
-        # But this is quadratic in the order so instead we do:
-        curves = self.source_triangulation.key_curves()
-        possible_orders = set(range(1, self.source_triangulation.max_order+1))
-        for curve in curves:
-            curve_image = curve
+        # But this is quadratic in the order so instead we iterate the images of the key_curves.
+        
+        # If self^i == id then self^i must act trivially on H_1. This is cheap to check and
+        # usually rules out every possible order.
+        M = self.homology_matrix()
+        identity = flipper.kernel.id_matrix(M.width)
+        possible_orders = []
+        power = identity
+        for i in range(1, self.source_triangulation.max_order+1):
+            power = M * power
+            if power == identity:
+                possible_orders.append(i)
+        
+        if not possible_orders: return 0  # No finite orders remain so we are infinite order.
+        
+        # Now check the remaining orders against each of the key_curves. Rather than building a
+        # Lamination at every step we iterate its vector of geometric intersection numbers and only
+        # bring the algebraic ones up to date when the geometric ones return to where they started.
+        possible_orders = set(possible_orders)
+        for curve in self.source_triangulation.key_curves():
+            geometric, algebraic, algebraic_step = curve.geometric, curve.algebraic, 0
             for i in range(1, max(possible_orders)+1):
-                curve_image = self(curve_image)
-                if curve_image != curve:
-                    possible_orders.discard(i)
-                    if not possible_orders: return 0  # No finite orders remain so we are infinite order.
+                geometric = self.apply_geometric(geometric)
+                if i in possible_orders:
+                    if geometric == curve.geometric:
+                        for _ in range(algebraic_step, i):
+                            algebraic = self.apply_algebraic(algebraic)
+                        algebraic_step = i
+                    if geometric != curve.geometric or algebraic != curve.algebraic:
+                        possible_orders.discard(i)
+                        if not possible_orders: return 0  # No finite orders remain so we are infinite order.
         
         return min(possible_orders)
     
     def is_identity(self):
         ''' Return if this encoding is the identity map. '''
         
-        return self.is_mapping_class() and all(self(curve) == curve for curve in self.source_triangulation.key_curves())
+        if not self.is_mapping_class():
+            return False
+        
+        if self.fingerprint() != tuple(fingerprint_hash(self.source_triangulation.fingerprint_curve().geometric, prime) for prime in FINGERPRINT_PRIMES):
+            return False
+        
+        return self._agrees_with(None)
     
     def is_periodic(self):
         ''' Return if this encoding has finite order.
@@ -238,21 +469,77 @@ class Encoding:
         
         return As, Cs
     
-    def pl_action(self):
+    def _pl_children(self, cell):
+        ''' Return the list of non-empty cells obtained by applying the next move of self to the given cell.
+        
+        A cell is a tuple (position, action, conditions, witness) which records
+        that the first position moves of self have been applied (in the order
+        that they act), action is the action matrix so far, conditions is the
+        list of condition rows so far and witness is a vector which lies in the
+        interior of the cell of ML that these define. '''
+        
+        position, action, conditions, witness = cell
+        item = self.sequence[len(self.sequence) - position - 1]
+        
+        children = []
+        for index in range(len(item)):
+            new_action, C = item.pl_action(index, action=action)
+            new_rows = [row for row in C if any(row)]
+            if not new_rows:
+                # This move is linear on the whole cell so it does not split it.
+                return [(position + 1, new_action, conditions + list(C), witness)]
+            
+            new_conditions = conditions + list(C)
+            # The witness of this cell often lies in the interior of this piece of it too.
+            # Otherwise we need to solve a linear program to find out whether the piece is empty.
+            # Starting this from the witness, which satisfies all but the new conditions, makes it much faster.
+            new_witness = witness if all(flipper.kernel.matrix.dot(row, witness) > 0 for row in new_rows) else \
+                self.source_triangulation.lamination_cone().join(flipper.kernel.Matrix([row for row in new_conditions if any(row)])).interior_point(hint=witness)
+            if new_witness is not None:
+                children.append((position + 1, new_action, new_conditions, new_witness))
+        
+        return children
+    
+    def _pl_cells(self, cell):
+        ''' Yield the (action, condition) matrix pairs of the non-empty maximal cells of self which lie inside the given cell. '''
+        
+        # A depth first search, so that we only hold a path of cells in memory.
+        stack = [cell]
+        while stack:
+            cell = stack.pop()
+            if cell[0] == len(self.sequence):
+                yield (cell[1], flipper.kernel.zero_matrix(self.zeta, 1).join(flipper.kernel.Matrix(cell[2])))
+            else:
+                stack.extend(reversed(self._pl_children(cell)))
+    
+    def pl_action(self, cores=None):
         ''' Yield each of the action, condition matrix pairs describing the action of this Encoding
-        on ML. '''
+        on ML.
+        
+        Only the cells which are maximal and non-empty, that is, which meet ML in a
+        set with non-empty interior, are returned. These are found by a depth first
+        search which abandons a branch as soon as its cell becomes empty.
         
-        for sequence in product(*[range(len(item)) for item in self]):
-            As = flipper.kernel.id_matrix(self.zeta)
-            Cs = flipper.kernel.zero_matrix(self.zeta, 1)
-            for item, index in reversed(list(zip(self, sequence))):
-                # This now uses the improved sparse matrix representation.
-                As, C = item.pl_action(index, action=As)
-                Cs = Cs.join(C)
+        If cores is given then the cells are split into branches that are searched by
+        that many processes. The cells are then yielded in no particular order. '''
         
-            yield (As, Cs)
+        root = (0, flipper.kernel.id_matrix(self.zeta), [], self.source_triangulation.lamination_cone().interior_point())
+        if cores is None:
+            yield from self._pl_cells(root)
+        else:
+            # Split into enough branches to keep all of the processes busy.
+            cells = [root]
+            while len(cells) < 4 * cores and any(cell[0] < len(self.sequence) for cell in cells):
+                cells = [child for cell in cells for child in (self._pl_children(cell) if cell[0] < len(self.sequence) else [cell])]
+            
+            # Only needed when working in parallel.
+            import multiprocessing  # pylint: disable=import-outside-toplevel
+            with multiprocessing.Pool(cores) as pool:
+                for result in pool.imap_unordered(_pl_cells_worker, [(self, cell) for cell in cells]):
+                    yield from result
     
     @memoize
+    @persistent('pml_fixedpoint', dump=_dump_pml_fixedpoint, load=_load_pml_fixedpoint)
     def pml_fixedpoint(self):
         ''' Return a rescaling constant and projectively invariant lamination.
         
@@ -276,7 +563,8 @@ class Encoding:
             # The result of Margalit--Strenner--Yurtas say that this is a sufficient number of iterations to find a fixed point.
             # See https://www.youtube.com/watch?v=-GO0AvUGjH4
             for n in range(bound):
-                curve = self(curve)
+                # Only the geometric intersection numbers are needed, so do not keep a chain back to the starting curve.
+                curve = flipper.kernel.Lamination(self.target_triangulation, self.apply_geometric(curve.geometric))
                 
                 if n & (n-1) == 0 or n == bound-1:  # if n is a power of two or we have reached the bound.
                     try:
@@ -303,6 +591,7 @@ class Encoding:
         _, lamination = self.pml_fixedpoint()
         return lamination
     
+    @persistent('dilatation')
     def dilatation(self):
         ''' Return the dilatation of this mapping class.
         
@@ -332,6 +621,7 @@ class Encoding:
         
         return splittings
     
+    @persistent('splitting_sequence', dump=_dump_splitting_sequence, load=_load_splitting_sequence)
     def splitting_sequence(self):
         ''' Return the splitting sequence associated to this mapping class.
         
@@ -362,11 +652,13 @@ class Encoding:
         else:  # len(homology_splittings) > 1:
             raise flipper.FatalError('Mapping class is homologous to multiple splitting sequences.')
     
+    @persistent('canonical', dump=_dump_canonical, load=_load_canonical)
     def canonical(self):
         ''' Return the canonical form of this mapping class. '''
         
         return self.splitting_sequence().mapping_class
     
+    @persistent('nielsen_thurston_type')
     def nielsen_thurston_type(self):
         ''' Return the Nielsen--Thurston type of this encoding.
         
@@ -417,6 +709,10 @@ class Encoding:
         
         assert isinstance(other, Encoding)
         
+        # The action on homology gives conjugacy invariants that are much cheaper than the ones below.
+        if self.quick_invariants() != other.quick_invariants():
+            return False
+        
         # Nielsen-Thurston type is a conjugacy invariant.
         if self.nielsen_thurston_type() != other.nielsen_thurston_type():
             return False
@@ -425,8 +721,6 @@ class Encoding:
             if self.order() != other.order():
                 return False
             
-            # We could also use action on H_1(S) as a conjugacy invaraiant.
-            
             raise flipper.AssumptionError('Mapping class is periodic.')
         elif self.nielsen_thurston_type() == NT_TYPE_REDUCIBLE:
             # There's more to do here.
@@ -452,6 +746,7 @@ class Encoding:
             
             return False
     
+    @persistent('stratum')
     def stratum(self):
         ''' Return a dictionary mapping each singularity to its stratum order.
         
@@ -526,8 +821,7 @@ class Encoding:
         triangulation = self.source_triangulation
         
         if veering:
-            # This can fail with an flipper.AssumptionError if self is not pseudo-Anosov.
-            return self.canonical().bundle(veering=False, _safety=False)
+            return self._veering_bundle()
         
         if _safety:
             # We should add enough flips to ensure the triangulation is a manifold.
@@ -550,79 +844,20 @@ class Encoding:
             
             return safe_encoding.bundle(veering=False, _safety=False)
         
-        id_perm3 = flipper.kernel.Permutation((0, 1, 2))
-        lower_triangulation, upper_triangulation = triangulation, triangulation
-        
-        triangulation3 = flipper.kernel.Triangulation3(self.flip_length())
-        # These are maps taking triangles of lower (respectively upper) triangulation to either:
-        #  - A pair (triangle, permutation) where triangle is in upper (resp. lower) triangulation, or
-        #  - A pair (tetrahedron, permutation) of triangulation3.
-        # We start with no tetrahedra, so these maps are just the identity map between the two triangulations.
-        lower_map = dict((triangleA, (triangleB, id_perm3)) for triangleA, triangleB in zip(lower_triangulation, upper_triangulation))
-        upper_map = dict((triangleB, (triangleA, id_perm3)) for triangleA, triangleB in zip(lower_triangulation, upper_triangulation))
-        
-        # We also use these two functions to quickly tell what a triangle maps to.
-        maps_to_triangle = lambda X: isinstance(X[0], flipper.kernel.Triangle)
-        maps_to_tetrahedron = lambda X: not maps_to_triangle(X)
-        
-        tetra_count = 0
-        for item in reversed(self.sequence):
-            assert item.source_triangulation == upper_triangulation
-            
-            try:
-                tetra_count, upper_triangulation, upper_map, lower_map = \
-                    item.extend_bundle(triangulation3, tetra_count, upper_triangulation, lower_triangulation, upper_map, lower_map)
-            except AttributeError as err:
-                # We have no way to handle any other type that appears.
-                # Currently this means there was a LinearTransform and so this is not a mapping class.
-                raise flipper.FatalError(f'Unknown move {item} encountered while building bundle.') from err
-        
-        # We're now back to the starting triangulation.
-        assert lower_triangulation == upper_triangulation
-        
-        # This is a map which send each triangle of upper_triangulation via isometry to a pair:
-        #    (triangle, permutation)
-        # where triangle in lower_triangulation and maps_to_tetrahedron(lower_map[triangle]).
-        full_forwards = dict()
-        for source_triangle in upper_triangulation:
-            target_triangle, perm = source_triangle, id_perm3
-            
-            c = 0
-            while maps_to_triangle(lower_map[target_triangle]):
-                target_triangle, new_perm = lower_map[target_triangle]
-                perm = new_perm * perm
-                
-                c += 1
-                assert c <= 3 * upper_triangulation.zeta
-            full_forwards[source_triangle] = (target_triangle, perm)
-        
-        # Now close the bundle up.
-        for source_triangle in upper_triangulation:
-            if maps_to_tetrahedron(upper_map[source_triangle]):
-                A, perm_A = upper_map[source_triangle]
-                target_triangle, perm = full_forwards[source_triangle]
-                B, perm_B = lower_map[target_triangle]
-                A.glue(perm_A(3), B, perm_B * perm.embed(4) * perm_A.inverse())
-        
-        # There are now no unglued faces.
-        assert triangulation3.is_closed()
-        
-        # Install longitudes and meridians. This also calls Triangulation3.assign_cusp_indices().
-        triangulation3.install_peripheral_curves()
-        
-        # Construct an immersion of the fibre surface into the closed bundle.
-        fibre_immersion = dict()
-        for source_triangle in lower_triangulation:
-            if maps_to_triangle(lower_map[source_triangle]):
-                upper_triangle, upper_perm = lower_map[source_triangle]
-                target_triangle, perm = full_forwards[upper_triangle]
-                B, perm_B = lower_map[target_triangle]
-                fibre_immersion[source_triangle] = (B, perm_B * (perm * upper_perm).embed(4))
-            else:
-                B, perm_B = lower_map[source_triangle]
-                fibre_immersion[source_triangle] = lower_map[source_triangle]
+        # Stack a tetrahedron onto the surface for each flip and then glue the top to the bottom.
+        layered = flipper.kernel.LayeredTriangulation(triangulation)
+        layered.extend(reversed(self.sequence))
+        return layered.close()
+    
+    @persistent('veering_bundle')
+    def _veering_bundle(self):
+        ''' Return the veering bundle associated to this mapping class, see self.bundle(). '''
         
-        return flipper.kernel.Bundle(lower_triangulation, triangulation3, fibre_immersion)
+        # This can fail with an flipper.AssumptionError if self is not pseudo-Anosov.
+        bundle = self.canonical().bundle(veering=False, _safety=False)
+        if flipper.kernel.cache.active_caches():
+            flipper.kernel.cache.record(self, 'bundle', bundle.triangulation3.snappy_string())
+        return bundle
     
     def __snappy__(self):
         return self.bundle(veering=False).snappy_string()
@@ -666,6 +901,14 @@ class Encoding:
         
         return flipper.kernel.FlatStructure(periodic_triangulation, edge_vectors)
 
+def _pl_cells_worker(data):
+    ''' Return the list of cells of the given encoding which lie inside the given cell.
+    
+    This is a module level function so that it can be pickled for multiprocessing. '''
+    
+    encoding, cell = data
+    return list(encoding._pl_cells(cell))
+
 def create_encoding(source_triangulation, sequence, _cache=None):
     ''' Return the encoding defined by sequence starting at source_triangulation.
     
@@ -674,5 +917,19 @@ def create_encoding(source_triangulation, sequence, _cache=None):
     
     assert isinstance(source_triangulation, flipper.kernel.Triangulation)
     
+    # A packaged isometry records only its label map. When this is the identity it packages to
+    # None and so the vertex permutation of, for example, a half twist is lost. Rebuilding the
+    # final isometry directly would then end on an equal copy of source_triangulation with
+    # different vertex labels and so, for example, a different homology basis. Hence if the
+    # final isometry lands on a triangulation equal to source_triangulation then we make it an
+    # isometry back onto source_triangulation itself, as the original encoding was.
+    if sequence and (sequence[0] is None or isinstance(sequence[0], dict)):
+        h = source_triangulation.encode(sequence[1:]) if len(sequence) > 1 else source_triangulation.id_encoding()
+        label_map = dict((label, label) for label in h.target_triangulation.labels) if sequence[0] is None else sequence[0]
+        if all(i in label_map or ~i in label_map for i in source_triangulation.indices) and h.target_triangulation.relabel_edges(label_map) == source_triangulation:
+            h = h.target_triangulation.find_isometry(source_triangulation, label_map).encode() * h
+            if _cache is not None: h._cache = _cache
+            return h
+    
     return source_triangulation.encode(sequence, _cache=_cache)
 
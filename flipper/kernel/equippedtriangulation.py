@@ -3,13 +3,16 @@
 
 Provides one class: EquippedTriangulation. '''
 
+from collections import OrderedDict, namedtuple
+from functools import partial
 from itertools import product
+from operator import getitem
 from random import choice
-import multiprocessing
-import re
 
 import flipper
 
+WordCacheInfo = namedtuple('WordCacheInfo', ['hits', 'misses', 'max_size', 'size'])
+
 def inverse(word):
     ''' Return the inverse of a word by reversing and swapcasing it. '''
     
@@ -27,6 +30,9 @@ def generate_ordering(letters):
 
 ##########################################################################
 # A helper function  that can be pickled for multiprocessing.
+class _WorkerDone:
+    ''' Put by a worker once it has finished. Unlike None, this cannot be confused with a value returned by an apply function. '''
+
 def _worker_thread_word(Q, A):
     while True:
         data = Q.get()
@@ -37,7 +43,7 @@ def _worker_thread_word(Q, A):
         options['order'] = generate_ordering(options['letters'])
         for output in surface._all_words_joined(length, prefix, **options):
             A.put(output)
-    A.put(None)
+    A.put(_WorkerDone())
 
 def _worker_thread_mapping_class(Q, A):
     while True:
@@ -49,18 +55,68 @@ def _worker_thread_mapping_class(Q, A):
         options['order'] = generate_ordering(options['letters'])
         for output in surface._all_mapping_classes(length, prefix, **options):
             A.put(output)
-    A.put(None)
+    A.put(_WorkerDone())
+
+def _inverse_of(mapping_classes, name):
+    ''' Return the inverse of mapping_classes[name], this can be pickled as the thunk of a LazyDict. '''
+    
+    return mapping_classes[name].inverse()
+
+class _DilatationEstimator:
+    ''' A function, that can be pickled for multiprocessing, which cheaply estimates the dilatation of a word.
+    
+    Calling it on a word returns a triple (estimate, lower_bound, word) or None if the
+    word is quickly shown not to be pseudo-Anosov. Here estimate is a float approximation
+    to the dilatation and lower_bound is a float which the dilatation is at least. '''
+    def __init__(self, surface, iterations):
+        self.surface = surface
+        self.iterations = iterations
+    
+    def __call__(self, word):
+        h = self.surface.mapping_class(word)
+        if h.is_periodic():
+            return None
+        
+        # The dilatation of a pseudo-Anosov is at least the spectral radius of its action on homology.
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        M = h.homology_matrix()
+        lower_bound = max(abs(eigenvalue) for eigenvalue in np.linalg.eigvals(np.array(M.rows, dtype=float))) if M.width > 0 else 1.0
+        
+        # Estimate the growth rate by iterating a curve. If it ever returns then h is reducible.
+        curve = h.source_triangulation.fingerprint_curve().geometric
+        vector = curve
+        weights = [sum(vector)]
+        for _ in range(self.iterations):
+            vector = h.apply_geometric(vector)
+            if vector == curve:
+                return None
+            weights.append(sum(vector))
+        
+        half = self.iterations // 2
+        estimate = (weights[-1] / weights[half]) ** (1.0 / (self.iterations - half))
+        return (max(estimate, lower_bound), lower_bound, word)
 
 
 class EquippedTriangulation:
     ''' This represents a triangulation along with a collection of named laminations and mapping classes on it.
     
     Most importantly this object can construct a mapping class from a string descriptor.
-    See self.mapping_class for additional information. '''
-    def __init__(self, triangulation, laminations, mapping_classes):
+    See self.mapping_class for additional information.
+    
+    If auto_simplify is True then the mapping classes that this object
+    constructs are passed through Encoding.simplify() first. This takes
+    a little time but makes them cheaper to use.
+    
+    The Encodings of recently used powers and parenthesised subwords are
+    kept, up to a total of word_cache_size moves, so that they do not need
+    to be rebuilt when they are used again. See self.word_cache_info().
+    
+    The mapping classes may also be given as a LazyDict, in which case
+    each one, and its inverse, is only built when it is first used. '''
+    def __init__(self, triangulation, laminations, mapping_classes, auto_simplify=False, word_cache_size=2**20):
         assert isinstance(triangulation, flipper.kernel.Triangulation)
         assert isinstance(laminations, (dict, list, tuple))
-        assert isinstance(mapping_classes, (dict, list, tuple))
+        assert isinstance(mapping_classes, (dict, flipper.kernel.utilities.LazyDict, list, tuple))
         
         self.triangulation = triangulation
         if isinstance(laminations, dict):
@@ -83,6 +139,17 @@ class EquippedTriangulation:
             self.pos_mapping_classes = dict(mapping_classes)
             self.neg_mapping_classes = dict((name.swapcase(), self.pos_mapping_classes[name].inverse()) for name in self.pos_mapping_classes)
             self.mapping_classes = dict(list(self.pos_mapping_classes.items()) + list(self.neg_mapping_classes.items()))
+        elif isinstance(mapping_classes, flipper.kernel.utilities.LazyDict):
+            # Only check the mapping classes that have already been built, the others will be built when they are first used.
+            assert all(isinstance(key, str) for key in mapping_classes)
+            assert all(isinstance(mapping_classes[key], flipper.kernel.Encoding) for key in mapping_classes if mapping_classes.is_resolved(key))
+            assert all(key.swapcase() not in mapping_classes for key in mapping_classes)
+            
+            self.pos_mapping_classes = mapping_classes.copy()
+            self.neg_mapping_classes = flipper.kernel.utilities.LazyDict(thunks=dict((name.swapcase(), partial(_inverse_of, self.pos_mapping_classes, name)) for name in self.pos_mapping_classes))
+            self.mapping_classes = flipper.kernel.utilities.LazyDict(thunks=dict(
+                (name, partial(getitem, mapping, name)) for mapping in [self.pos_mapping_classes, self.neg_mapping_classes] for name in mapping
+                ))
         else:
             assert all(isinstance(mapping_class, flipper.kernel.Encoding) for mapping_class in mapping_classes)
             assert all(mapping_class.source_triangulation == self.triangulation for mapping_class in mapping_classes)
@@ -93,6 +160,14 @@ class EquippedTriangulation:
             self.mapping_classes = dict(list(self.pos_mapping_classes.items()) + list(self.neg_mapping_classes.items()))
         
         self.zeta = self.triangulation.zeta
+        self.auto_simplify = auto_simplify
+        self.word_cache_size = word_cache_size
+        self._letters = None  # A copy of self.mapping_classes when self._trie was built.
+        self._trie = None  # A trie of the keys of self.mapping_classes, built by self._letter_trie().
+        self._word_cache = OrderedDict()  # Mapping parsed (sub)words to their Encodings, or None for the identity.
+        self._word_cache_moves = 0  # The total number of moves in the Encodings of self._word_cache.
+        self._word_cache_hits = 0
+        self._word_cache_misses = 0
     
     @classmethod
     def from_tuple(cls, objects):
@@ -168,6 +243,18 @@ class EquippedTriangulation:
     
     def __repr__(self):
         return str(self)
+    def __getstate__(self):
+        # Pickle everything but the caches, which are rebuilt when they are needed.
+        state = dict(self.__dict__)
+        for key in ['_letters', '_trie', '_word_cache', '_word_cache_moves', '_word_cache_hits', '_word_cache_misses']:
+            state.pop(key, None)
+        return state
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._letters = None
+        self._trie = None
+        self._word_cache = OrderedDict()
+        self.clear_word_cache()
     def __str__(self):
         lam_keys = sorted(self.laminations.keys())
         pos_keys = sorted(self.pos_mapping_classes.keys())
@@ -383,6 +470,8 @@ class EquippedTriangulation:
             else:
                 prefixes = []
             
+            # Only needed when working in parallel.
+            import multiprocessing  # pylint: disable=import-outside-toplevel
             Q = multiprocessing.Queue()
             A = multiprocessing.Queue()
             P = [multiprocessing.Process(target=_worker_thread_word, args=(Q, A)) for i in range(options['cores'])]
@@ -399,7 +488,7 @@ class EquippedTriangulation:
             num_completed_cores = 0
             while num_completed_cores < options['cores']:
                 result = A.get()
-                if result is None:
+                if isinstance(result, _WorkerDone):
                     num_completed_cores += 1
                 else:
                     yield result
@@ -497,6 +586,8 @@ class EquippedTriangulation:
             else:
                 prefixes = []
             
+            # Only needed when working in parallel.
+            import multiprocessing  # pylint: disable=import-outside-toplevel
             Q = multiprocessing.Queue()
             A = multiprocessing.Queue()
             P = [multiprocessing.Process(target=_worker_thread_mapping_class, args=(Q, A)) for i in range(options['cores'])]
@@ -513,41 +604,235 @@ class EquippedTriangulation:
             num_completed_cores = 0
             while num_completed_cores < options['cores']:
                 result = A.get()
-                if result is None:
+                if isinstance(result, _WorkerDone):
                     num_completed_cores += 1
                 else:
                     yield result
             
             for p in P: p.terminate()
     
+    def minimal_dilatation(self, length, k=1, tolerance=0.05, iterations=30, **options):
+        ''' Return a list of the k smallest (dilatation, word) pairs of pseudo-Anosov mapping classes given by words of at most the specified length.
+        
+        The words are enumerated by self.all_words(length, **options), so this
+        accepts the same options, including prefilter, filter, equivalence and cores.
+        However the apply option is used to cheaply discard periodic and some reducible
+        mapping classes and to estimate the dilatations of the rest. The survivors are
+        then checked in order of estimated dilatation using the exact, but expensive,
+        Encoding.dilatation().
+        
+        A candidate is skipped if the dilatation of its action on homology, which is a
+        lower bound for its dilatation, exceeds the current kth smallest dilatation.
+        The search stops once the estimates exceed this by more than a factor of
+        1 + tolerance. If tolerance is None then only the homology bound is used to skip
+        candidates, which is slower but guarantees the correct answer. '''
+        
+        options['apply'] = _DilatationEstimator(self, iterations)
+        candidates = sorted(candidate for candidate in self.all_words(length, **options) if candidate is not None)
+        
+        best = []  # The k smallest (dilatation, word) pairs found so far, in order.
+        for estimate, lower_bound, word in candidates:
+            if len(best) == k:
+                threshold = float(best[-1][0])
+                if tolerance is not None and estimate > threshold * (1 + tolerance):
+                    break
+                if lower_bound > threshold:
+                    continue
+            
+            h = self.mapping_class(word)
+            if not h.is_pseudo_anosov():
+                continue
+            
+            dilatation = h.dilatation()
+            if len(best) < k or dilatation < best[-1][0]:
+                best.append((dilatation, word))
+                best.sort(key=lambda pair: pair[0])
+                del best[k:]
+        
+        return best
+    
+    def _letter_trie(self):
+        ''' Return a trie of the keys of self.mapping_classes.
+        
+        This is a nested dictionary in which the key None marks the end of a letter.
+        It is rebuilt, and the word cache cleared, whenever self.mapping_classes changes. '''
+        
+        # Compare the raw values, so that this does not force any unbuilt mapping classes of a LazyDict to be built.
+        letters = dict(self.mapping_classes.raw_items() if isinstance(self.mapping_classes, flipper.kernel.utilities.LazyDict) else self.mapping_classes.items())
+        if self._letters is None or len(self._letters) != len(letters) or any(letters.get(letter) is not h for letter, h in self._letters.items()):
+            self._trie = dict()
+            for letter in self.mapping_classes:
+                node = self._trie
+                for character in letter:
+                    node = node.setdefault(character, dict())
+                node[None] = letter
+            self._letters = letters
+            self.clear_word_cache()
+        
+        return self._trie
+    
+    def word_cache_info(self):
+        ''' Return a WordCacheInfo of the hits and misses of the word cache, its max_size and its current size.
+        
+        Sizes are measured in moves. '''
+        
+        return WordCacheInfo(self._word_cache_hits, self._word_cache_misses, self.word_cache_size, self._word_cache_moves)
+    
+    def clear_word_cache(self):
+        ''' Discard the Encodings of all words and subwords and reset the statistics of the word cache. '''
+        
+        self._word_cache.clear()
+        self._word_cache_moves = 0
+        self._word_cache_hits = 0
+        self._word_cache_misses = 0
+    
+    def _parse_word(self, word):
+        ''' Return an expression tree of the given word.
+        
+        The nodes of this tree are tuples which are either:
+            - ('letter', letter) for a key of self.mapping_classes,
+            - ('power', node, k) for the kth power of a node, or
+            - ('product', nodes) for the composition of a tuple of nodes.
+        
+        So equal trees describe the same mapping class.
+        
+        Whitespace is ignored, parentheses group subwords, periods separate
+        letters and ^k raises the previous letter or parenthesised group to the
+        power k. Letters are extracted greedily, that is, each is the longest key
+        of self.mapping_classes that appears at that point.
+        
+        Raises a TypeError, reporting the position in word, if it cannot be parsed. '''
+        
+        assert isinstance(word, str)
+        
+        positions = [index for index, character in enumerate(word) if character != ' ']
+        stripped = ''.join(word[index] for index in positions)
+        positions.append(len(word))
+        trie = self._letter_trie()
+        index = 0
+        
+        def error(message):
+            ''' Return a TypeError describing what went wrong at the current point. '''
+            
+            position = positions[index]
+            return TypeError(f'Cannot parse word at position {position} ({word[position:position+10]!r}): {message}.')
+        
+        def parse_product(depth):
+            ''' Parse a sequence of letters and groups, up to a closing parenthesis if depth > 0. '''
+            
+            nonlocal index
+            nodes = []
+            while index < len(stripped) and stripped[index] != ')':
+                character = stripped[index]
+                if character == '.':
+                    index += 1
+                    continue
+                
+                if character == '(':
+                    index += 1
+                    node = parse_product(depth + 1)
+                    if index == len(stripped):
+                        raise error('unbalanced parentheses')
+                    index += 1
+                elif character == '^':
+                    raise error('power without a letter or parenthesised group to apply it to')
+                else:
+                    # Walk down the trie, remembering the longest letter seen.
+                    trie_node, letter, end = trie, None, index
+                    for position in range(index, len(stripped)):
+                        trie_node = trie_node.get(stripped[position])
+                        if trie_node is None:
+                            break
+                        if None in trie_node:
+                            letter, end = trie_node[None], position + 1
+                    if letter is None:
+                        raise error('no mapping class name starts here')
+                    node = ('letter', letter)
+                    index = end
+                
+                while index < len(stripped) and stripped[index] == '^':
+                    index += 1
+                    start = index
+                    if index < len(stripped) and stripped[index] == '-':
+                        index += 1
+                    while index < len(stripped) and stripped[index].isdigit():
+                        index += 1
+                    if not stripped[start:index].lstrip('-'):
+                        raise error('expected an integer power')
+                    node = ('power', node, int(stripped[start:index]))
+                
+                nodes.append(node)
+            
+            if depth == 0 and index < len(stripped):
+                raise error('unbalanced parentheses')
+            
+            return ('product', tuple(nodes))
+        
+        return parse_product(0)
+    
+    def _word_encoding(self, node):
+        ''' Return the Encoding given by an expression tree built by self._parse_word, or None if it is the identity.
+        
+        The Encodings of powers and products are kept in the word cache, with
+        the least recently used being discarded once there are more than
+        self.word_cache_size moves in it. '''
+        
+        if node[0] == 'letter':
+            return self.mapping_classes[node[1]]
+        
+        if node in self._word_cache:
+            self._word_cache_hits += 1
+            self._word_cache.move_to_end(node)
+            return self._word_cache[node]
+        
+        self._word_cache_misses += 1
+        if node[0] == 'power':
+            h = self._word_encoding(node[1])
+            sequence = [] if h is None else h.sequence if node[2] > 0 else h.inverse().sequence
+            # Repeating the list only repeats references to the same moves.
+            sequence = sequence * abs(node[2])
+        else:  # node[0] == 'product'.
+            sequence = [item for child in node[1] for item in self._word_encoding_sequence(child)]
+        
+        h = flipper.kernel.Encoding(sequence) if sequence else None
+        self._word_cache[node] = h
+        self._word_cache_moves += len(sequence)
+        while self._word_cache_moves > self.word_cache_size and self._word_cache:
+            _, old = self._word_cache.popitem(last=False)
+            self._word_cache_moves -= 0 if old is None else len(old)
+        
+        return h
+    
+    def _word_encoding_sequence(self, node):
+        ''' Return the sequence of moves given by an expression tree built by self._parse_word. '''
+        
+        h = self._word_encoding(node)
+        return [] if h is None else h.sequence
+    
     def decompose_word(self, word):
         ''' Return a list of mapping_classes keys whose concatenation is word and the keys are chosen greedly.
         
-        Raises a KeyError if the greedy decomposition fails. '''
+        Periods can be used to separate keys and whitespace is ignored.
+        
+        Raises a TypeError if the greedy decomposition fails. '''
         
         assert isinstance(word, str)
         
-        # By sorting the available keys, longest first, we ensure that any time we
-        # get a match it is as long as possible.
-        available_letters = sorted(self.mapping_classes, key=len, reverse=True)
-        decomposition = []
-        for subword in word.split('.'):
-            while subword:
-                for letter in available_letters:
-                    if subword.startswith(letter):
-                        decomposition.append(letter)
-                        subword = subword[len(letter):]
-                        break
-                else:
-                    raise TypeError(f'After extracting {decomposition}, the remaining {word} cannot be greedly decomposed as a concatination of self.mapping_classes')
+        tree = self._parse_word(word)
+        if any(node[0] != 'letter' for node in tree[1]):
+            raise TypeError(f'{word!r} is not a concatenation of self.mapping_classes.')
         
-        return decomposition
+        return [node[1] for node in tree[1]]
     
     def mapping_class(self, word):
         ''' Return the mapping class corresponding to the given word or a random one of given length if given an integer.
         
-        The given word is decomposed using self.decompose_word and the composition
-        of the mapping classes involved is returned.
+        The given word is parsed using self._parse_word and the composition
+        of the mapping classes involved is returned. Powers are built by repeating
+        the moves of the mapping class that they apply to rather than by expanding
+        out the word and so can be large. The moves of powers and parenthesised
+        subwords are kept in the word cache and so, for example, the conjugates
+        x.(w).X only need to build w once.
         
         Raises a TypeError if the word does not correspond to a mapping class. '''
         
@@ -556,48 +841,18 @@ class EquippedTriangulation:
         if isinstance(word, flipper.IntegerType):
             word = self.random_word(word)
         
-        name = word  # Record the current word so we can use it later to name the mapping class.
-        
-        # Remove any whitespace.
-        word = word.replace(' ', '')
-        
-        # Check for balanced parentheses.
-        counter = 0
-        for letter in word:
-            if letter == '(': counter += 1
-            if letter == ')': counter -= 1
-            if counter < 0: raise TypeError('Unbalanced parentheses.')
-        if counter != 0: raise TypeError('Unbalanced parentheses.')
-        
-        # Expand out parenthesis powers.
         # This can fail with a TypeError.
-        old_word = None
-        while word != old_word:  # While a change was made.
-            old_word = word
-            for subword, power in re.findall(r'(\([\w_\.]*\))\^(-?\d+)', word):
-                decompose = self.decompose_word(subword[1:-1])
-                int_power = int(power)
-                if int_power > 0:
-                    replacement = '.'.join(decompose) * int_power
-                else:
-                    replacement = '.'.join(letter.swapcase() for letter in decompose[::-1]) * abs(int_power)
-                word = word.replace(subword + '^' + power, replacement)
-        
-        # Remove any remaining parenthesis, these do not have a power and are treated as ^1
-        word = word.replace('(', '').replace(')', '')
-        
-        # Expand out powers without parenthesis. Here we use a greedy algorithm and take the
-        # longest mapping class occuring before the power. Note that we only do one pass and so
-        # only all pure powers to be expanded once, that is 'aBBB^2^3' is not recognised.
-        available_letters = sorted(self.mapping_classes, key=len, reverse=True)
-        for letter in available_letters:
-            for subword, power in re.findall(rf'({letter})\^(-?\d+)', word):
-                int_power = int(power)
-                word = word.replace(subword + '^' + power, (letter if int_power > 0 else letter.swapcase()) * abs(int_power))
+        tree = self._parse_word(word)
+        # Most words are only asked for once, so we do not cache the word itself, only its parts.
+        if len(tree[1]) == 1:  # Encodings do not modify their sequences so this can be shared.
+            sequence = self._word_encoding_sequence(tree[1][0])
+        else:
+            sequence = [item for child in tree[1] for item in self._word_encoding_sequence(child)]
+        if not sequence:
+            return self.triangulation.id_encoding()
         
-        # This can fail with a TypeError.
-        sequence = [item for letter in self.decompose_word(word) for item in self.mapping_classes[letter]]
-        return flipper.kernel.Encoding(sequence, _cache={'name': name}) if sequence else self.triangulation.id_encoding()
+        h = flipper.kernel.Encoding(sequence, _cache={'name': word})
+        return h.simplify() if self.auto_simplify else h
     
     def lamination(self, name):
         ''' Return the lamination given by name. '''
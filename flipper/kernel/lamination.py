@@ -11,6 +11,8 @@ import flipper
 from flipper.kernel.decorators import memoize  # Special import needed for decorating.
 
 HASH_DENOMINATOR = 30
+# The most pushforwards that may be waiting to be applied to get the algebraic intersection numbers of a lamination.
+MAX_PUSHFORWARD_DEPTH = 64
 
 class Lamination:
     ''' This represents a lamination on an triangulation.
@@ -30,23 +32,99 @@ class Lamination:
     when the lamination is a curve, its algebraic intersection computed
     automatically.
     
+    As computing them can be expensive, the algebraic intersection numbers
+    are only found when they are first needed. If algebraic is None then
+    either pushforward is a pair (map, lamination) and they are given by
+    map.apply_algebraic(lamination.algebraic) or, when this lamination is a
+    twistable curve, they are those of one of its orientations and
+    otherwise they are all zero. So that repeatedly applying a map does not
+    keep every intermediate lamination alive, they are found as soon as
+    more than MAX_PUSHFORWARD_DEPTH pushforwards are waiting.
+    
     If remove_peripheral is True then the Lamination is allowed to rescale
     its weights (by a factor of 2) in order to remove any peripheral
     components / satifsy the triangle inequalities. '''
-    def __init__(self, triangulation, geometric, algebraic):
+    def __init__(self, triangulation, geometric, algebraic=None, pushforward=None):
         assert isinstance(triangulation, flipper.kernel.Triangulation)
         assert isinstance(geometric, (list, tuple))
-        assert isinstance(algebraic, (list, tuple))
+        assert algebraic is None or isinstance(algebraic, (list, tuple))
+        assert pushforward is None or (algebraic is None and isinstance(pushforward[1], Lamination))
         # We should check that geometric / algebraic satisfies reasonable relations.
         
         self.triangulation = triangulation
         self.zeta = self.triangulation.zeta
         self.geometric = list(geometric)
-        self.algebraic = list(algebraic)
         assert len(self.geometric) == self.zeta
-        assert len(self.algebraic) == self.zeta
+        # These are None until the algebraic intersection numbers are needed.
+        self._algebraic = list(algebraic) if algebraic is not None else None
+        self._pushforward = pushforward
+        assert self._algebraic is None or len(self._algebraic) == self.zeta
         
         self._cache = {}  # For caching hard to compute results.
+        
+        # The number of pushforwards that must be applied to get the algebraic intersection numbers.
+        self._depth = pushforward[1]._depth + 1 if pushforward is not None else 0
+        if self._depth > MAX_PUSHFORWARD_DEPTH:
+            _ = self.algebraic  # Finding these frees the chain of pushforwards.
+    
+    @property
+    def algebraic(self):
+        ''' The list of algebraic intersection numbers of this lamination. '''
+        
+        if self._algebraic is None:
+            # Walk back to the first lamination whose algebraic intersection numbers we can get directly.
+            # We do this iteratively as repeatedly applying a map can build a very long chain.
+            chain = []
+            lamination = self
+            while lamination._algebraic is None and lamination._pushforward is not None:
+                chain.append(lamination)
+                lamination = lamination._pushforward[1]
+            
+            if lamination._algebraic is None:
+                lamination._algebraic = lamination._curve_algebraic()
+            
+            for lamination in reversed(chain):
+                mapping, source = lamination._pushforward
+                lamination._algebraic = mapping.apply_algebraic(source._algebraic)
+                lamination._pushforward = None  # So that source can be garbage collected.
+                lamination._depth = 0
+                assert len(lamination._algebraic) == lamination.zeta
+        
+        return self._algebraic
+    
+    def _curve_algebraic(self):
+        ''' Return the algebraic intersection numbers of this lamination when it is only given by its geometric ones.
+        
+        If this lamination is a twistable curve then these are the algebraic
+        intersection numbers of one of its orientations, otherwise they are
+        all zero. '''
+        
+        # Note that if the curve is not twistable then its algebraic intersection numbers
+        # are all zero and so we can just return those.
+        if not self.is_curve() or not self.is_twistable():
+            return [0] * self.zeta
+        
+        conjugation = self.conjugate_short()
+        short_lamination = conjugation(self)
+        triangulation = short_lamination.triangulation
+        
+        # Grab the indices of the two edges we meet.
+        e1, e2 = [edge_index for edge_index in range(short_lamination.zeta) if short_lamination(edge_index) > 0]
+        
+        a, b, c, d = triangulation.square_about_edge(e1)
+        # If the curve is going vertically through the square then ...
+        if short_lamination(a) == 1 and short_lamination(c) == 1:
+            # swap the labels round so it goes horizontally.
+            e1, e2 = e2, e1
+            a, b, c, d = triangulation.square_about_edge(e1)
+        elif short_lamination(b) == 1 and short_lamination(d) == 1:
+            pass
+        
+        # We never look at short_lamination.algebraic, which would bring us back here.
+        # Instead we give it the correct algebraic intersection numbers and pull them back.
+        algebraic = [1 if i == e1 else -b.sign() if i == b.index else 0 for i in range(self.zeta)]
+        
+        return conjugation.inverse().apply_algebraic(algebraic)
     
     def __repr__(self):
         return str(self)
@@ -80,6 +158,9 @@ class Lamination:
     def __hash__(self):
         # This should be done better.
         return hash(tuple(self.geometric) + tuple(self.algebraic))
+    def __reduce__(self):
+        # The algebraic intersection numbers may still be a function, which cannot be pickled.
+        return (self.__class__, (self.triangulation, self.geometric, self.algebraic))
     
     def __add__(self, other):
         if isinstance(other, Lamination):
@@ -162,7 +243,9 @@ class Lamination:
     def is_multicurve(self):
         ''' Return if this lamination is a multicurve. '''
         
-        if self == self.triangulation.empty_lamination(): return False
+        # Note that we cannot compare with self.triangulation.empty_lamination() as
+        # that would need the algebraic intersection numbers, which may need this.
+        if self.is_empty(): return False
         
         # This isn't quite right. We should allow NumberFieldElements too.
         if not all(isinstance(entry, flipper.IntegerType) for entry in self): return False
@@ -175,10 +258,12 @@ class Lamination:
         
         return True
     
+    @memoize
     def conjugate_short(self):
         ''' Return an encoding which maps this lamination to a lamination with as little weight as possible.
         
-        This lamination must be a multicurve. '''
+        This lamination must be a multicurve. The result is cached so that
+        is_curve, is_twistable, encode_twist and so on can share it. '''
         
         # Repeatedly flip to reduce the weight of this lamination as much as possible.
         # Let [v_i] := f(self), where f is the encoding returned by this method.
@@ -193,44 +278,69 @@ class Lamination:
         
         assert self.is_multicurve()
         
-        lamination = self
-        best_conjugation = conjugation = lamination.triangulation.id_encoding()
+        # Rather than building a Lamination and a Triangulation after each flip we work with a buffer
+        # of weights and the labels of the triangles, both of which we update in place. The weight
+        # change of flipping each edge is kept in an IndexedHeap. Flipping an edge only changes its
+        # own weight and the squares about the four edges around it, so only these entries need
+        # updating. The Encoding is only assembled at the end, for the best prefix of flips.
+        weights = list(self.geometric)
+        # Map each label to the labels of its triangle, read anticlockwise starting from it.
+        corners = dict((corner.label, tuple(corner.labels)) for corner in self.triangulation.corners)
+        
+        def square_about_edge(edge_index):
+            ''' Return the labels of the four edges around the given edge, as in Triangulation.square_about_edge. '''
+            
+            return corners[edge_index][1:] + corners[~edge_index][1:]
         
-        def weight_change(lamination, edge_index):
+        def weight_change(edge_index):
             ''' Return how much the weight would change by if this flip was done. '''
             
-            if lamination(edge_index) == 0 or not lamination.triangulation.is_flippable(edge_index): return inf
-            a, b, c, d = lamination.triangulation.square_about_edge(edge_index)
-            return max(lamination(a) + lamination(c), lamination(b) + lamination(d)) - 2 * lamination(edge_index)
+            # An edge is flippable if and only if it lies in two distinct triangles.
+            if weights[edge_index] == 0 or edge_index in corners[~edge_index]: return inf
+            a, b, c, d = [flipper.kernel.norm(label) for label in square_about_edge(edge_index)]
+            return max(weights[a] + weights[c], weights[b] + weights[d]) - 2 * weights[edge_index]
         
+        flips = []
+        best_length = 0
         time_since_last_weight_loss = 0
-        old_weight = lamination.weight()
-        possible_edges = lamination.triangulation.indices
-        drops = sorted([(weight_change(lamination, i), i) for i in possible_edges])
+        old_weight = sum(weights)
+        drops = flipper.kernel.utilities.IndexedHeap((weight_change(i), i) for i in self.triangulation.indices)
         # If we ever fail to make progress more than once then the curve is as short as it's going to get.
         while time_since_last_weight_loss < 2 < old_weight:
             # Find the edge which decreases our weight the most.
             # If none exist then it doesn't matter which edge we flip, so long as it meets the curve.
-            _, edge_index = drops[0]
+            _, edge_index = drops.peek()
             
-            forwards = lamination.triangulation.encode_flip(edge_index)
-            conjugation = forwards * conjugation
-            old_lamination, lamination = lamination, forwards(lamination)
-            new_weight = lamination.weight()
+            square = square_about_edge(edge_index)
+            a, b, c, d = [flipper.kernel.norm(label) for label in square]
+            weights[edge_index] = max(weights[a] + weights[c], weights[b] + weights[d]) - weights[edge_index]
+            # This matches the triangles A2 and B2 built by Triangulation.flip_edge.
+            for triangle in [(edge_index, square[3], square[0]), (~edge_index, square[1], square[2])]:
+                for i in range(3):
+                    corners[triangle[i]] = triangle[i:] + triangle[:i]
+            flips.append(edge_index)
+            new_weight = sum(weights)
             
             # Update new neighbours.
-            indices = sorted(set([e.index for e in old_lamination.triangulation.square_about_edge(edge_index)] + [edge_index]))
-            drops = sorted([(d, i) if i not in indices else (weight_change(lamination, i), i) for (d, i) in drops])  # This should be lightning fast since the list was basically sorted already.
-            # If performance really becomes an issue then we could look at using heapq.
+            for index in set([a, b, c, d, edge_index]):
+                drops[index] = weight_change(index)
             
             if new_weight < old_weight:
                 time_since_last_weight_loss = 0
                 old_weight = new_weight
-                best_conjugation = conjugation
+                best_length = len(flips)
             else:
                 time_since_last_weight_loss += 1
         
-        return best_conjugation
+        # As before, the conjugation starts with the identity.
+        conjugation = self.triangulation.id_encoding().sequence
+        triangulation = self.triangulation
+        for edge_index in flips[:best_length]:
+            new_triangulation = triangulation.flip_edge(edge_index)
+            conjugation.insert(0, flipper.kernel.EdgeFlip(triangulation, new_triangulation, edge_index))
+            triangulation = new_triangulation
+        
+        return flipper.kernel.Encoding(conjugation)
     
     def is_curve(self):
         ''' Return if this lamination is a curve. '''
@@ -357,7 +467,7 @@ class Lamination:
     def puncture_tripods(self):
         ''' Return the encoding corresponding to puncturing the tripods of this lamination. '''
         
-        to_puncture = self.tripod_regions()
+        to_puncture = set(self.tripod_regions())
         geometric = 2 * flipper.kernel.id_matrix(self.zeta)
         algebraic = flipper.kernel.id_matrix(self.zeta)
         
@@ -506,7 +616,11 @@ class Lamination:
         T = flipper.kernel.Triangulation(new_triangles)
         
         bad_edges = [a, b, c, d, e, ~e]  # These are the edges for which edge_map is not defined.
-        geometric = [[self(edge) for edge in self.triangulation.edges if edge not in bad_edges and edge_map[edge].index == i][0] for i in range(edge_count)]
+        # Each new edge gets the weight of the first old edge that maps to it.
+        geometric = [None] * edge_count
+        for edge in self.triangulation.edges:
+            if edge not in bad_edges and geometric[edge_map[edge].index] is None:
+                geometric[edge_map[edge].index] = self(edge)
         algebraic = [0] * edge_count
         lamination = Lamination(T, geometric, algebraic)
         
@@ -854,36 +968,7 @@ class Lamination:
         assert isinstance(other, Lamination)
         assert self.triangulation == other.triangulation
         
-        matrix = flipper.kernel.id_matrix(self.zeta)
-        
-        triangulation = self.triangulation
-        tree, dual_tree = triangulation.tree_and_dual_tree(not relative_boundary)
-        vertices_used = dict((vertex, False) for vertex in triangulation.vertices)
-        # Get some starting vertices.
-        for vertex in triangulation.vertices:
-            if not vertex.filled:
-                vertices_used[vertex] = True
-                if relative_boundary:  # Stop as soon as we've marked one.
-                    break
-        
-        while True:
-            for edge in triangulation.edges:
-                if tree[edge.index]:
-                    source, target = edge.source_vertex, edge.target_vertex
-                    if vertices_used[source] and not vertices_used[target]:  # This implies edge goes between distinct vertices.
-                        vertices_used[target] = True
-                        for edge2 in triangulation.edges:
-                            # We have to skip the edge2 == ~edge case at this point as we are still
-                            # removing it from various places.
-                            if edge2.source_vertex == target and edge2 != ~edge:
-                                matrix = matrix.elementary(edge2.index, edge.index, +1 if edge2.is_positive() == edge.is_positive() else -1)
-                        # Don't forget to go back and do edge which we skipped before.
-                        matrix = matrix.elementary(edge.index, edge.index, -1)
-                        break
-            else:
-                break  # If there are no more to add then we've dealt with every edge.
-        
-        M = flipper.kernel.Matrix([matrix[i] for i in range(self.zeta) if not tree[i] and not dual_tree[i]])
+        M = self.triangulation.homology_projection(relative_boundary)
         return M(self.algebraic) == M(other.algebraic)
     
     def is_orientable(self):
@@ -0,0 +1,170 @@
+
+''' A module for building layered triangulations of mapping tori one move at a time.
+
+Provides one class: LayeredTriangulation. '''
+
+import flipper
+
+class LayeredTriangulation:
+    ''' This represents a layered triangulation which is still being built.
+    
+    It starts as the product of a triangulation and an interval, which has
+    no tetrahedra. Moves are then stacked on to its upper boundary using
+    self.extend() and, once the upper boundary is back to the lower one,
+    self.close() glues the two together and returns the resulting Bundle.
+    
+    The upper boundary is stored as an array of slots, one per triangle.
+    Slot i holds upper_triangles[i], which is a triangle of the current upper
+    triangulation, and upper_images[i], which is a pair (target, permutation)
+    where target is either:
+     - the Tetrahedron that this triangle is a face of, or
+     - the triangle of the lower boundary which it is still equal to.
+    To keep this fast, permutation is the integer code of a permutation in
+    Sym(4), respectively Sym(3), see flipper.kernel.permutation.S4.
+    An EdgeFlip only touches the two slots of the triangles that it replaces,
+    so building a bundle takes time proportional to the number of moves. '''
+    def __init__(self, triangulation):
+        assert isinstance(triangulation, flipper.kernel.Triangulation)
+        
+        id_perm3 = flipper.kernel.permutation.S3_INDEX[(0, 1, 2)]
+        self.lower_triangulation = triangulation
+        self.upper_triangulation = triangulation
+        self.triangulation3 = flipper.kernel.Triangulation3(0)
+        
+        self.upper_triangles = list(triangulation)
+        self.upper_images = [(triangle, id_perm3) for triangle in triangulation]
+        self.slot_lookup = dict((label, slot) for slot, triangle in enumerate(self.upper_triangles) for label in triangle.labels)
+        # Each triangle of the lower boundary is either still exposed, in which case we
+        # record the slot that it is in, or has had a tetrahedron stacked onto it.
+        self.exposed = dict((triangle, slot) for slot, triangle in enumerate(self.upper_triangles))
+        self.lower_images = dict()
+    
+    def __repr__(self):
+        return str(self)
+    def __str__(self):
+        return f'Layered triangulation with {self.triangulation3.num_tetrahedra} tetrahedra'
+    
+    def upper_image(self, triangle):
+        ''' Return the (target, permutation) pair that the given triangle of the upper boundary maps to. '''
+        
+        return self.upper_images[self.slot_lookup[triangle.labels[0]]]
+    
+    def lower_image(self, triangle):
+        ''' Return the (target, permutation) pair that the given triangle of the lower boundary maps to.
+        
+        Here target is either a Tetrahedron or a triangle of the upper boundary. '''
+        
+        if triangle in self.lower_images:
+            return self.lower_images[triangle]
+        
+        slot = self.exposed[triangle]
+        _, perm = self.upper_images[slot]
+        return (self.upper_triangles[slot], flipper.kernel.permutation.S3_INVERSE[perm])
+    
+    def cover_lower(self, triangle, tetrahedron, permutation):
+        ''' Record that the given face of tetrahedron has been stacked onto triangle of the lower boundary. '''
+        
+        del self.exposed[triangle]
+        self.lower_images[triangle] = (tetrahedron, permutation)
+    
+    def replace_upper(self, old_triangles, new_images, target_triangulation):
+        ''' Replace some triangles of the upper boundary, moving it to target_triangulation.
+        
+        The new triangles, given by the (triangle, image) pairs in new_images, reuse the slots of old_triangles. '''
+        
+        slots = [self.slot_lookup[triangle.labels[0]] for triangle in old_triangles]
+        for triangle in old_triangles:
+            for label in triangle.labels:
+                del self.slot_lookup[label]
+        
+        for slot, (triangle, image) in zip(slots, new_images):
+            self.upper_triangles[slot] = triangle
+            self.upper_images[slot] = image
+            for label in triangle.labels:
+                self.slot_lookup[label] = slot
+        
+        self.upper_triangulation = target_triangulation
+    
+    def relabel_upper(self, new_triangles, new_images, target_triangulation):
+        ''' Replace every triangle of the upper boundary, moving it to target_triangulation.
+        
+        The triangle in slot i becomes new_triangles[i] and maps to new_images[i]. '''
+        
+        self.upper_triangles = list(new_triangles)
+        self.upper_images = list(new_images)
+        self.slot_lookup = dict((label, slot) for slot, triangle in enumerate(self.upper_triangles) for label in triangle.labels)
+        self.upper_triangulation = target_triangulation
+    
+    def extend(self, moves):
+        ''' Stack each of the given moves, in order, onto the upper boundary.
+        
+        moves may be any iterable so very long sequences can be streamed in. '''
+        
+        for move in moves:
+            assert move.source_triangulation == self.upper_triangulation
+            
+            try:
+                move.extend_bundle(self)
+            except AttributeError as err:
+                # We have no way to handle any other type that appears.
+                # Currently this means there was a LinearTransform and so this is not a mapping class.
+                raise flipper.FatalError(f'Unknown move {move} encountered while building bundle.') from err
+    
+    def close(self):
+        ''' Return the Bundle obtained by gluing the upper boundary to the lower one.
+        
+        The upper boundary must currently be the same triangulation as the lower boundary. '''
+        
+        assert self.lower_triangulation == self.upper_triangulation
+        
+        S4 = flipper.kernel.permutation.S4
+        compose3, compose4 = flipper.kernel.permutation.S3_COMPOSE, flipper.kernel.permutation.S4_COMPOSE
+        embed, inverse4 = flipper.kernel.permutation.S3_EMBED, flipper.kernel.permutation.S4_INVERSE
+        id_perm3 = flipper.kernel.permutation.S3_INDEX[(0, 1, 2)]
+        maps_to_triangle = lambda X: isinstance(X[0], flipper.kernel.Triangle)
+        maps_to_tetrahedron = lambda X: not maps_to_triangle(X)
+        
+        # This is a map which send each triangle of upper_triangulation via isometry to a pair:
+        #    (triangle, permutation)
+        # where triangle in lower_triangulation and maps_to_tetrahedron(self.lower_image(triangle)).
+        full_forwards = dict()
+        for source_triangle in self.upper_triangulation:
+            target_triangle, perm = source_triangle, id_perm3
+            
+            c = 0
+            while maps_to_triangle(self.lower_image(target_triangle)):
+                target_triangle, new_perm = self.lower_image(target_triangle)
+                perm = compose3[new_perm][perm]
+                
+                c += 1
+                assert c <= 3 * self.upper_triangulation.zeta
+            full_forwards[source_triangle] = (target_triangle, perm)
+        
+        # Now close the bundle up.
+        for source_triangle in self.upper_triangulation:
+            if maps_to_tetrahedron(self.upper_image(source_triangle)):
+                A, perm_A = self.upper_image(source_triangle)
+                target_triangle, perm = full_forwards[source_triangle]
+                B, perm_B = self.lower_image(target_triangle)
+                self.triangulation3.glue(A.index, S4[perm_A][3], B.index, compose4[compose4[perm_B][embed[perm]]][inverse4[perm_A]])
+        
+        # There are now no unglued faces.
+        assert self.triangulation3.is_closed()
+        
+        # Install longitudes and meridians. This also calls Triangulation3.assign_cusp_indices().
+        self.triangulation3.install_peripheral_curves()
+        
+        # Construct an immersion of the fibre surface into the closed bundle.
+        fibre_immersion = dict()
+        for source_triangle in self.lower_triangulation:
+            if maps_to_triangle(self.lower_image(source_triangle)):
+                upper_triangle, upper_perm = self.lower_image(source_triangle)
+                target_triangle, perm = full_forwards[upper_triangle]
+                B, perm_B = self.lower_image(target_triangle)
+                fibre_immersion[source_triangle] = (B, flipper.kernel.Permutation(S4[compose4[perm_B][embed[compose3[perm][upper_perm]]]]))
+            else:
+                B, perm_B = self.lower_image(source_triangle)
+                fibre_immersion[source_triangle] = (B, flipper.kernel.Permutation(S4[perm_B]))
+        
+        return flipper.kernel.Bundle(self.lower_triangulation, self.triangulation3, fibre_immersion)
+
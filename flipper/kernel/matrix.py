@@ -5,8 +5,9 @@ Provides one class: Matrix.
 
 There are also helper functions: id_matrix and zero_matrix. '''
 
-import numpy as np
-import realalg
+from fractions import Fraction
+from functools import reduce
+from math import gcd
 
 import flipper
 
@@ -143,6 +144,142 @@ class Matrix:
         
         return Matrix([self[n] if n != i else [x+k*y for x, y in zip(self[i], self[j])] for n in range(self.height)])
     
+    def trace(self):
+        ''' Return the trace of this matrix. '''
+        
+        assert self.is_square()
+        
+        return sum(self[i][i] for i in range(self.width))
+    
+    def char_poly(self):
+        ''' Return the coefficients of the characteristic polynomial det(xI - self) of this integer matrix.
+        
+        These are listed starting from the leading coefficient, which is 1. '''
+        
+        assert self.is_square()
+        
+        # We use the Faddeev--LeVerrier algorithm. All of its divisions are exact over the integers.
+        n = self.width
+        coefficients = [1]
+        M = zero_matrix(n)
+        for k in range(1, n+1):
+            M = self * M + id_matrix(n) * coefficients[-1]
+            coefficients.append(-(self * M).trace() // k)
+        
+        return coefficients
+    
+    def inverse(self):
+        ''' Return the inverse of this matrix, which must be a square matrix of integers or Fractions.
+        
+        Entries of the inverse that are integers are returned as ints.
+        Raises a ValueError if this matrix is singular. '''
+        
+        assert self.is_square()
+        
+        # Gauss--Jordan elimination on (self | I).
+        n = self.width
+        rows = [[Fraction(x) for x in row] + [Fraction(int(i == j)) for j in range(n)] for i, row in enumerate(self)]
+        for column in range(n):
+            pivot = next((i for i in range(column, n) if rows[i][column] != 0), None)
+            if pivot is None:
+                raise ValueError('Matrix is singular.')
+            rows[column], rows[pivot] = rows[pivot], rows[column]
+            scale = rows[column][column]
+            rows[column] = [x / scale for x in rows[column]]
+            for i in range(n):
+                if i != column and rows[i][column] != 0:
+                    k = rows[i][column]
+                    rows[i] = [x - k * y for x, y in zip(rows[i], rows[column])]
+        
+        return Matrix([[int(x) if x.denominator == 1 else x for x in row[n:]] for row in rows])
+    
+    def interior_point(self, hint=None):
+        ''' Return an integer vector v such that every entry of self(v) is strictly positive, or None if there is no such vector.
+        
+        So this determines whether the cone {v : self(v) >= 0} has non-empty interior.
+        If given, hint should be an integer vector such that most entries of self(hint)
+        are already positive as the search then starts from it and so is much faster.
+        
+        This is done exactly by using the simplex method, with Bland's rule, to
+        look for a v with self(v) >= 1. To avoid slow Fraction arithmetic, each
+        row of the tableau is only stored up to a positive multiple. '''
+        
+        m, n = self.height, self.width
+        if m == 0:
+            return [0] * n
+        if hint is None:
+            hint = [0] * n
+        
+        # Write v = hint + p - q with p, q >= 0 and add surplus variables s so that the constraints become:
+        #   self(p) - self(q) - s = 1 - self(hint).
+        # When the right hand side of a row is positive we also add an artificial variable to it so that
+        # there is an obvious feasible starting point, otherwise we negate the row and start with s basic.
+        # Once an artificial variable leaves the basis it never needs to return, so we do not store
+        # their columns. Instead the artificial variable of row i is labelled num_columns + i.
+        num_columns = 2 * n + m
+        tableau, basis, artificial = [], [], []
+        for i, row in enumerate(self):
+            target = 1 - dot(row, hint)
+            if target > 0:
+                tableau.append(list(row) + [-x for x in row] + [-int(i == j) for j in range(m)] + [target])
+                basis.append(num_columns + i)
+                artificial.append(tableau[-1])
+            else:
+                tableau.append([-x for x in row] + list(row) + [int(i == j) for j in range(m)] + [-target])
+                basis.append(2 * n + i)
+        
+        # The reduced costs of minimising the sum of the artificial variables.
+        # The final entry is minus the current value of this sum.
+        costs = [-sum(entries) for entries in zip(*artificial)] if artificial else [0] * (num_columns + 1)
+        
+        def normalise(row):
+            ''' Divide row through by the gcd of its entries. '''
+            
+            divisor = reduce(gcd, row)
+            return [x // divisor for x in row] if divisor > 1 else row
+        
+        while True:
+            entering = next((j for j in range(num_columns) if costs[j] < 0), None)
+            if entering is None:
+                break
+            
+            # The sum of the artificial variables is bounded below so some row must limit the entering variable.
+            leaving = None
+            for i in range(m):
+                if tableau[i][entering] > 0:
+                    if leaving is None:
+                        leaving = i
+                    else:
+                        # Compare the ratios rhs / entry by cross multiplying, breaking ties by the index of the basic variable.
+                        difference = tableau[i][-1] * tableau[leaving][entering] - tableau[leaving][-1] * tableau[i][entering]
+                        if difference < 0 or (difference == 0 and basis[i] < basis[leaving]):
+                            leaving = i
+            
+            pivot_row = tableau[leaving]
+            pivot = pivot_row[entering]
+            for i in range(m):
+                if i != leaving and tableau[i][entering] != 0:
+                    k = tableau[i][entering]
+                    tableau[i] = normalise([pivot * x - k * y for x, y in zip(tableau[i], pivot_row)])
+            k = costs[entering]
+            costs = normalise([pivot * x - k * y for x, y in zip(costs, pivot_row)])
+            basis[leaving] = entering
+        
+        if costs[-1] != 0:  # The artificial variables cannot all be made zero.
+            return None
+        
+        values = [Fraction(0)] * num_columns
+        for i, j in enumerate(basis):
+            if j < num_columns:
+                values[j] = Fraction(tableau[i][-1], tableau[i][j])
+        v = [x + values[j] - values[n + j] for j, x in enumerate(hint)]
+        
+        # Clear denominators.
+        denominator = 1
+        for x in v:
+            denominator = denominator * x.denominator // gcd(denominator, x.denominator)
+        return [int(x * denominator) for x in v]
+    
     def nonnegative_image(self, v):
         ''' Return if self * v >= 0. '''
         
@@ -156,6 +293,10 @@ class Matrix:
         Raises a ComputationError if it cannot find an interesting vectors in C.
         Assumes that C contains at most one interesting eigenvector. '''
         
+        # These are slow to import so we only do so when they are actually needed.
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        import realalg  # pylint: disable=import-outside-toplevel
+        
         M = np.array(self.rows, dtype=object)
         for eigenvalue, eigenvector in realalg.eigenvectors(M):
             if condition_matrix.nonnegative_image(eigenvector):
@@ -26,10 +26,8 @@ class Move:
             if other.triangulation != self.source_triangulation:
                 raise TypeError('Cannot apply Isometry to a lamination not on the source triangulation.')
             
-            return self.target_triangulation.lamination(
-                self.apply_geometric(other.geometric),
-                self.apply_algebraic(other.algebraic),
-                remove_peripheral=False)
+            # The algebraic intersection numbers are only pushed forward if they are needed.
+            return flipper.kernel.Lamination(self.target_triangulation, self.apply_geometric(other.geometric), pushforward=(self, other))
         else:
             return NotImplemented
     
@@ -71,11 +69,19 @@ class Isometry(Move):
             if i not in self.label_map:
                 raise flipper.AssumptionError(f'This label_map not defined on edge {i}')
         
-        self.index_map = dict((i, flipper.kernel.norm(self.label_map[i])) for i in self.source_triangulation.indices)
-        # Store the inverses too while we're at it.
-        self.inverse_label_map = dict((self.label_map[i], i) for i in self.source_triangulation.labels)
-        self.inverse_index_map = dict((i, flipper.kernel.norm(self.inverse_label_map[i])) for i in self.source_triangulation.indices)
-        self.inverse_signs = dict((i, +1 if self.inverse_index_map[i] == self.inverse_label_map[i] else -1) for i in self.source_triangulation.indices)
+        # These only depend on the labels, so they are built once and then shared between all
+        # isometries from source_triangulation with this label_map.
+        key = ('__isometry__', tuple(self.label_map[i] for i in self.source_triangulation.labels))
+        if key not in self.source_triangulation._cache:
+            index_map = [flipper.kernel.norm(self.label_map[i]) for i in self.source_triangulation.indices]
+            # Store the inverses too while we're at it.
+            inverse_label_map = dict((self.label_map[i], i) for i in self.source_triangulation.labels)
+            inverse_index_map = [flipper.kernel.norm(inverse_label_map[i]) for i in self.source_triangulation.indices]
+            inverse_signs = [+1 if inverse_index_map[i] == inverse_label_map[i] else -1 for i in self.source_triangulation.indices]
+            self.source_triangulation._cache[key] = (index_map, inverse_label_map, inverse_index_map, inverse_signs)
+        
+        self.index_map, self.inverse_label_map, self.inverse_index_map, self.inverse_signs = self.source_triangulation._cache[key]
+        self._inverse = None
     
     def __str__(self):
         return 'Isometry ' + str([self.target_triangulation.edge_lookup[self.label_map[i]] for i in self.source_triangulation.indices])
@@ -92,16 +98,35 @@ class Isometry(Move):
             return None
     
     def apply_geometric(self, vector):
-        return [vector[self.inverse_index_map[i]] for i in range(self.zeta)]
+        return [vector[index] for index in self.inverse_index_map]
     
     def apply_algebraic(self, vector):
-        return [vector[self.inverse_index_map[i]] * self.inverse_signs[i] for i in range(self.zeta)]
+        return [vector[index] * sign for index, sign in zip(self.inverse_index_map, self.inverse_signs)]
+    
+    def __mul__(self, other):
+        if isinstance(other, Isometry):
+            if self.source_triangulation != other.target_triangulation:
+                raise ValueError('Cannot compose Isometries over different triangulations.')
+            
+            return Isometry(other.source_triangulation, self.target_triangulation, dict((i, self.label_map[other.label_map[i]]) for i in other.source_triangulation.labels))
+        else:
+            return NotImplemented
+    
+    def is_identity(self):
+        ''' Return if this isometry is the identity map. '''
+        
+        return self.source_triangulation == self.target_triangulation and all(self.label_map[i] == i for i in self.source_triangulation.indices)
     
     def inverse(self):
-        ''' Return the inverse of this isometry. '''
+        ''' Return the inverse of this isometry.
         
-        # inverse_corner_map = dict((self(corner), corner) for corner in self.corner_map)
-        return Isometry(self.target_triangulation, self.source_triangulation, self.inverse_label_map)
+        This is only built the first time that it is needed. '''
+        
+        if self._inverse is None:
+            self._inverse = Isometry(self.target_triangulation, self.source_triangulation, self.inverse_label_map)
+            self._inverse._inverse = self
+        
+        return self._inverse
     
     def applied_geometric(self, lamination, action):
         ''' Return the action and condition matrices describing the PL map
@@ -111,7 +136,7 @@ class Isometry(Move):
         assert isinstance(lamination, flipper.kernel.Lamination)
         assert isinstance(action, flipper.kernel.Matrix)
         
-        return flipper.kernel.Matrix([action[self.inverse_index_map[i]] for i in range(self.zeta)]), flipper.kernel.zero_matrix(0)
+        return flipper.kernel.Matrix([action[index] for index in self.inverse_index_map]), flipper.kernel.zero_matrix(0)
     
     def pl_action(self, index, action):
         ''' Return the action and condition matrices describing the PL map
@@ -121,36 +146,32 @@ class Isometry(Move):
         assert isinstance(index, flipper.IntegerType)
         assert isinstance(action, flipper.kernel.Matrix)
         
-        return (flipper.kernel.Matrix([action[self.inverse_index_map[i]] for i in range(self.zeta)]), flipper.kernel.zero_matrix(0))
+        return (flipper.kernel.Matrix([action[index] for index in self.inverse_index_map]), flipper.kernel.zero_matrix(0))
     
-    def extend_bundle(self, triangulation3, tetra_count, upper_triangulation, lower_triangulation, upper_map, lower_map):  # pylint: disable=unused-argument, too-many-arguments
-        ''' Modify triangulation3 to extend the embedding of upper_triangulation via upper_map under this move. '''
+    def extend_bundle(self, layered):
+        ''' Extend the given LayeredTriangulation by relabelling its upper boundary under this move. '''
         
         maps_to_triangle = lambda X: isinstance(X[0], flipper.kernel.Triangle)
-        
-        # These are the new maps onto the upper and lower boundary that we will build.
-        new_upper_map = dict()
-        new_lower_map = dict()  # We are allowed to leave blanks in new_lower_map.
-        
-        for triangle in upper_triangulation:
+        # Permutations are coded as integers, see flipper.kernel.permutation.S3.
+        compose3, compose4 = flipper.kernel.permutation.S3_COMPOSE, flipper.kernel.permutation.S4_COMPOSE
+        embed, inverse3 = flipper.kernel.permutation.S3_EMBED, flipper.kernel.permutation.S3_INVERSE
+        cyclic = flipper.kernel.permutation.S3_CYCLIC
+        
+        # Every triangle keeps its slot but gets a new label. Lower triangles that are still
+        # exposed refer to their slot so they do not need updating.
+        new_triangles, new_images = [], []
+        for triangle, (old_target, old_perm) in zip(layered.upper_triangles, layered.upper_images):
             new_triangle = self.target_triangulation.triangle_lookup[self.label_map[triangle.labels[0]]]
             new_corner = self.target_triangulation.corner_lookup[self.label_map[triangle.corners[0].label]]
-            perm = flipper.kernel.permutation.cyclic_permutation(new_corner.side - 0, 3)
-            old_target, old_perm = upper_map[triangle]
+            perm_inverse = inverse3[cyclic[new_corner.side]]
             
-            if maps_to_triangle(upper_map[triangle]):
-                new_upper_map[new_triangle] = (old_target, old_perm * perm.inverse())
-                # Don't forget to update the lower_map too.
-                new_lower_map[old_target] = (new_triangle, perm * old_perm.inverse())
+            new_triangles.append(new_triangle)
+            if maps_to_triangle((old_target, old_perm)):
+                new_images.append((old_target, compose3[old_perm][perm_inverse]))
             else:
-                new_upper_map[new_triangle] = (old_target, old_perm * perm.inverse().embed(4))
-        
-        # Remember to rebuild the rest of lower_map, which hasn't changed.
-        for triangle in lower_triangulation:
-            if triangle not in new_lower_map:
-                new_lower_map[triangle] = lower_map[triangle]
+                new_images.append((old_target, compose4[old_perm][embed[perm_inverse]]))
         
-        return tetra_count, self.target_triangulation, new_upper_map, new_lower_map
+        layered.relabel_upper(new_triangles, new_images, self.target_triangulation)
 
 class EdgeFlip(Move):
     ''' Represents the change to a lamination caused by flipping an edge. '''
@@ -165,6 +186,7 @@ class EdgeFlip(Move):
         assert self.source_triangulation.is_flippable(self.edge_index)
         
         self.square = self.source_triangulation.square_about_edge(self.edge_label)
+        self._inverse = None
     
     def __str__(self):
         return f'Flip {"" if self.edge_index == self.edge_label else "~"}{self.edge_index}'
@@ -188,9 +210,15 @@ class EdgeFlip(Move):
         return [vector[i] if i != self.edge_index else m for i in range(self.zeta)]
     
     def inverse(self):
-        ''' Return the inverse of this map. '''
+        ''' Return the inverse of this map.
+        
+        This is only built the first time that it is needed. '''
+        
+        if self._inverse is None:
+            self._inverse = EdgeFlip(self.target_triangulation, self.source_triangulation, ~self.edge_label)
+            self._inverse._inverse = self
         
-        return EdgeFlip(self.target_triangulation, self.source_triangulation, ~self.edge_label)
+        return self._inverse
     
     def applied_geometric(self, lamination, action):
         ''' Return the action and condition matrices describing the PL map
@@ -232,26 +260,26 @@ class EdgeFlip(Move):
             raise IndexError('Index out of range.')
         return flipper.kernel.Matrix(rows), Cs
     
-    def extend_bundle(self, triangulation3, tetra_count, upper_triangulation, lower_triangulation, upper_map, lower_map):  # pylint: disable=too-many-arguments
-        
-        ''' Modify triangulation3 to extend the embedding of upper_triangulation via upper_map under this move. '''
+    def extend_bundle(self, layered):
+        ''' Extend the given LayeredTriangulation by stacking a flat tetrahedron realising this flip onto its upper boundary. '''
         
+        upper_triangulation = layered.upper_triangulation
         assert upper_triangulation == self.source_triangulation
         
         # We use these two functions to quickly tell what a triangle maps to.
         maps_to_triangle = lambda X: isinstance(X[0], flipper.kernel.Triangle)
         maps_to_tetrahedron = lambda X: not maps_to_triangle(X)
+        # Permutations are coded as integers, see flipper.kernel.permutation.S3 and S4.
+        S3, S4 = flipper.kernel.permutation.S3, flipper.kernel.permutation.S4
+        compose4, embed = flipper.kernel.permutation.S4_COMPOSE, flipper.kernel.permutation.S3_EMBED
+        inverse3, cyclic = flipper.kernel.permutation.S3_INVERSE, flipper.kernel.permutation.S3_CYCLIC
+        from_pair = flipper.kernel.permutation.S4_FROM_PAIR
         
-        # These are the new maps onto the upper and lower boundary that we will build.
-        new_upper_map = dict()
-        new_lower_map = dict()
-        # We are allowed to leave blanks in new_lower_map.
-        # These will be filled in at the end using lower_map.
         new_upper_triangulation = self.target_triangulation
         VEERING_LEFT, VEERING_RIGHT = flipper.kernel.triangulation3.VEERING_LEFT, flipper.kernel.triangulation3.VEERING_RIGHT
         
         # Get the next tetrahedra to add.
-        tetrahedron = triangulation3.tetrahedra[tetra_count]
+        tetrahedron = layered.triangulation3.create_tetrahedron()
         
         # Setup the next tetrahedron.
         tetrahedron.edge_labels[(0, 1)] = VEERING_RIGHT
@@ -270,47 +298,32 @@ class EdgeFlip(Move):
         if edge_label != self.edge_index: cornerA, cornerB = cornerB, cornerA
         
         (A, side_A), (B, side_B) = (cornerA.triangle, cornerA.side), (cornerB.triangle, cornerB.side)
-        if maps_to_tetrahedron(upper_map[A]):
-            tetra, perm = upper_map[A]
-            tetrahedron.glue(2, tetra, flipper.kernel.permutation.permutation_from_pair(0, perm(side_A), 2, perm(3)))
+        if maps_to_tetrahedron(layered.upper_image(A)):
+            tetra, perm = layered.upper_image(A)
+            layered.triangulation3.glue(tetrahedron.index, 2, tetra.index, from_pair[(0, S4[perm][side_A], 2, S4[perm][3])])
         else:
-            tri, perm = upper_map[A]
-            new_lower_map[tri] = (tetrahedron, flipper.kernel.permutation.permutation_from_pair(perm(side_A), 0, 3, 2))
+            tri, perm = layered.upper_image(A)
+            layered.cover_lower(tri, tetrahedron, from_pair[(S3[perm][side_A], 0, 3, 2)])
         
-        if maps_to_tetrahedron(upper_map[B]):
-            tetra, perm = upper_map[B]
+        if maps_to_tetrahedron(layered.upper_image(B)):
+            tetra, perm = layered.upper_image(B)
             # The permutation needs to: 2 |--> perm(3), 0 |--> perm(side_A), and be odd.
-            tetrahedron.glue(0, tetra, flipper.kernel.permutation.permutation_from_pair(2, perm(side_B), 0, perm(3)))
+            layered.triangulation3.glue(tetrahedron.index, 0, tetra.index, from_pair[(2, S4[perm][side_B], 0, S4[perm][3])])
         else:
-            tri, perm = upper_map[B]
-            new_lower_map[tri] = (tetrahedron, flipper.kernel.permutation.permutation_from_pair(perm(side_B), 2, 3, 0))
+            tri, perm = layered.upper_image(B)
+            layered.cover_lower(tri, tetrahedron, from_pair[(S3[perm][side_B], 2, 3, 0)])
         
-        # Rebuild the upper_map.
+        # Most of the triangles have stayed the same so only the slots of A and B need updating.
+        # This relies on knowing how the upper_triangulation.flip_edge() function works.
         new_cornerA = new_upper_triangulation.corner_of_edge(edge_label)
         new_cornerB = new_upper_triangulation.corner_of_edge(~edge_label)
         new_A, new_B = new_cornerA.triangle, new_cornerB.triangle
-        # Most of the triangles have stayed the same.
-        # This relies on knowing how the upper_triangulation.flip_edge() function works.
-        old_fixed_triangles = [triangle for triangle in upper_triangulation if triangle not in (A, B)]
-        new_fixed_triangles = [triangle for triangle in new_upper_triangulation if triangle not in (new_A, new_B)]
-        for old_triangle, new_triangle in zip(old_fixed_triangles, new_fixed_triangles):
-            new_upper_map[new_triangle] = upper_map[old_triangle]
-            if maps_to_triangle(upper_map[old_triangle]):  # Don't forget to update the lower_map too.
-                target_triangle, perm = upper_map[old_triangle]
-                new_lower_map[target_triangle] = (new_triangle, perm.inverse())
-        
-        # This relies on knowing how the upper_triangulation.flip_edge() function works.
-        perm_A = flipper.kernel.permutation.cyclic_permutation(new_upper_triangulation.corner_of_edge(edge_label).side, 3)
-        perm_B = flipper.kernel.permutation.cyclic_permutation(new_upper_triangulation.corner_of_edge(~edge_label).side, 3)
-        new_upper_map[new_A] = (tetrahedron, flipper.kernel.Permutation((3, 0, 2, 1)) * perm_A.embed(4).inverse())
-        new_upper_map[new_B] = (tetrahedron, flipper.kernel.Permutation((1, 2, 0, 3)) * perm_B.embed(4).inverse())
-        
-        # Remember to rebuild the rest of lower_map, which hasn't changed.
-        for triangle in lower_triangulation:
-            if triangle not in new_lower_map:
-                new_lower_map[triangle] = lower_map[triangle]
-        
-        return tetra_count+1, self.target_triangulation, new_upper_map, new_lower_map
+        perm_A_inverse = embed[inverse3[cyclic[new_cornerA.side]]]
+        perm_B_inverse = embed[inverse3[cyclic[new_cornerB.side]]]
+        layered.replace_upper([A, B], [
+            (new_A, (tetrahedron, compose4[flipper.kernel.permutation.S4_INDEX[(3, 0, 2, 1)]][perm_A_inverse])),
+            (new_B, (tetrahedron, compose4[flipper.kernel.permutation.S4_INDEX[(1, 2, 0, 3)]][perm_B_inverse]))
+            ], new_upper_triangulation)
 
 class LinearTransformation(Move):
     ''' Represents the change to a lamination caused by a linear map. '''
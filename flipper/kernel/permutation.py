@@ -3,7 +3,12 @@
 
 Provides one class: Permutation.
 
-There are also two helper functions: Id_permutation and cyclic_permutation. '''
+There are also two helper functions: Id_permutation and cyclic_permutation.
+
+Bundle construction and isomorphism signatures spend most of their time
+composing permutations of Sym(3) and Sym(4). So these can also be coded as
+small integers, namely their index in the lexicographically ordered lists S3
+and S4, and this module provides lookup tables for working with these codes. '''
 
 from itertools import permutations, combinations
 
@@ -141,3 +146,24 @@ TRANSITION_PERM3_LOOKUP = {
     (2, 2): Permutation([1, 0, 2])
 }
 
+# Permutations of Sym(3) and Sym(4) coded as integers.
+# S3[i] (respectively S4[i]) is the tuple of images of the permutation with code i.
+# So S4[i][j] is where permutation i sends j. In both cases the identity has code 0.
+S3 = list(permutations(range(3)))
+S4 = list(permutations(range(4)))
+S3_INDEX = dict((perm, index) for index, perm in enumerate(S3))
+S4_INDEX = dict((perm, index) for index, perm in enumerate(S4))
+# S3_COMPOSE[i][j] is the code of S3[i] o S3[j], that is, S3[j] followed by S3[i].
+S3_COMPOSE = [[S3_INDEX[tuple(a[b[k]] for k in range(3))] for b in S3] for a in S3]
+S4_COMPOSE = [[S4_INDEX[tuple(a[b[k]] for k in range(4))] for b in S4] for a in S4]
+S3_INVERSE = [row.index(0) for row in S3_COMPOSE]
+S4_INVERSE = [row.index(0) for row in S4_COMPOSE]
+S4_EVEN = [len([(i, j) for i, j in combinations(range(4), 2) if perm[i] > perm[j]]) % 2 == 0 for perm in S4]
+# S3_EMBED[i] is the code of the inclusion of S3[i] into Sym(4).
+S3_EMBED = [S4_INDEX[perm + (3,)] for perm in S3]
+# S3_CYCLIC[i] is the code of cyclic_permutation(i, 3).
+S3_CYCLIC = [S3_INDEX[tuple((i + k) % 3 for k in range(3))] for i in range(3)]
+# S4_FROM_PAIR[(a, to_a, b, to_b)] is the code of permutation_from_pair(a, to_a, b, to_b).
+S4_FROM_PAIR = dict(((a, perm[a], b, perm[b]), index) for index, perm in enumerate(S4) if not S4_EVEN[index] for a in range(4) for b in range(4) if a != b)
+# TRANSITION_S3[key] is the code of TRANSITION_PERM3_LOOKUP[key].
+TRANSITION_S3 = dict((key, S3_INDEX[tuple(perm)]) for key, perm in TRANSITION_PERM3_LOOKUP.items())
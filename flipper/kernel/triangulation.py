@@ -7,15 +7,16 @@ Provides five classes: Vertex, Edge, Triangle, Corner and Triangulation.
     A Corner is a Triangle with a chosen side.
     A Triangulation is a collection of Triangles. '''
 
+from bisect import bisect_left
+from heapq import heappop, heappush
 from itertools import groupby
 from math import log, inf
 from queue import Queue
-from random import choice
+from random import choice, Random
 import string
 
-import networkx as nx
-
 import flipper
+from flipper.kernel.decorators import memoize  # Special import needed for decorating.
 
 def norm(value):
     ''' A map taking an edges label to its index.
@@ -198,6 +199,27 @@ class Corner:
         # Having __slots__ means we need to pickle manually.
         return (self.__class__, (self.triangle, self.side))
 
+# This appears to be one of the slowest bits when there is a high degree vertex.
+def order_corner_class(corner_class):
+    ''' Return the given corner_class but reorderd so that corners occur anti-clockwise about the vertex. '''
+    
+    corner_class = list(corner_class)
+    lookup = dict((corner.edges[2], corner) for corner in corner_class)
+    ordered_class = [None] * len(corner_class)
+    ordered_class[0] = corner_class[0]  # Get one corner to start at.
+    # Perhaps this should be chosen in some canonical way. Smallest labelled one?
+    # This isn't totally safe: it doesn't check that there aren't multiple cycles.
+    for i in range(len(corner_class)-1):
+        try:
+            ordered_class[i+1] = lookup[~ordered_class[i].edges[1]]
+        except KeyError as err:
+            raise ValueError('Corners do not close up about vertex.') from err
+    
+    if ordered_class[0].edges[2] != ~ordered_class[-1].edges[1]:
+        raise ValueError('Corners do not close up about vertex.')
+    
+    return ordered_class
+
 # Remark: In other places in the code you will often see L(triangulation). This is the space
 # of laminations on triangulation with the coordinate system induced by the triangulation.
 
@@ -238,27 +260,6 @@ class Triangulation:
         self.corner_lookup = dict((corner.label, corner) for corner in self.corners)
         self.vertex_lookup = dict((corner.label, corner.vertex) for corner in self.corners)
         
-        # This appears to be one of the slowest bits when there is a high degree vertex.
-        def order_corner_class(corner_class):
-            ''' Return the given corner_class but reorderd so that corners occur anti-clockwise about the vertex. '''
-            
-            corner_class = list(corner_class)
-            lookup = dict((corner.edges[2], corner) for corner in corner_class)
-            ordered_class = [None] * len(corner_class)
-            ordered_class[0] = corner_class[0]  # Get one corner to start at.
-            # Perhaps this should be chosen in some canonical way. Smallest labelled one?
-            # This isn't totally safe: it doesn't check that there aren't multiple cycles.
-            for i in range(len(corner_class)-1):
-                try:
-                    ordered_class[i+1] = lookup[~ordered_class[i].edges[1]]
-                except KeyError as err:
-                    raise ValueError('Corners do not close up about vertex.') from err
-            
-            if ordered_class[0].edges[2] != ~ordered_class[-1].edges[1]:
-                raise ValueError('Corners do not close up about vertex.')
-            
-            return ordered_class
-        
         # We want to sort by the vertices so groupby will gather them but this would require adding
         # orderings to the Vertex class so we'll just sort / group by the vertex label. This should
         # uniquely determine the vertex.
@@ -283,6 +284,67 @@ class Triangulation:
         
         # Two triangualtions are the same if and only if they have the same signature.
         self.signature = [e.label for t in self for e in t]
+        
+        self._cache = {}  # For caching hard to compute results.
+    
+    @classmethod
+    def _from_parent(cls, parent, triangles, lookups, corner_classes):
+        ''' Return the Triangulation made from the given triangles, without any of the checks of __init__.
+        
+        This is for building a triangulation from parent when only a few of its triangles have changed.
+        The new triangulation must have the same vertices, as objects, and edge labels as parent and
+        triangles must already be sorted into the canonical order used by __init__.
+        
+        Here lookups is the tuple (triangle_lookup, edge_lookup, corner_lookup, vertex_lookup) for the
+        new triangulation and corner_classes is a dictionary taking the label of each vertex to the
+        cyclically ordered list of its corners or to None if it should be worked out again. The result
+        is the same as calling Triangulation(triangles). '''
+        
+        self = cls.__new__(cls)
+        self.triangles = triangles
+        self.edges = [edge for triangle in self for edge in triangle.edges]
+        self.positive_edges = [edge for edge in self.edges if edge.is_positive()]
+        self.labels = parent.labels
+        self.indices = parent.indices
+        self.vertices = parent.vertices
+        self.corners = [corner for triangle in self for corner in triangle.corners]
+        
+        self.num_triangles = parent.num_triangles
+        self.zeta = parent.zeta
+        self.num_vertices = parent.num_vertices
+        self.num_filled_vertices = parent.num_filled_vertices
+        self.num_unfilled_vertices = parent.num_unfilled_vertices
+        
+        self.triangle_lookup, self.edge_lookup, self.corner_lookup, self.vertex_lookup = lookups
+        
+        # __init__ starts each corner class at the first of its corners in self.corners.
+        # So we rotate the classes that we were given to start there too.
+        first = dict()
+        missing = dict((label, []) for label in corner_classes if corner_classes[label] is None)
+        for corner in self.corners:
+            label = corner.vertex.label
+            if label not in first:
+                first[label] = corner
+            if label in missing:
+                missing[label].append(corner)
+        self.corner_classes = []
+        for vertex in self.vertices:
+            corner_class = corner_classes[vertex.label]
+            if corner_class is None:
+                self.corner_classes.append(order_corner_class(missing[vertex.label]))
+            else:
+                start = corner_class.index(first[vertex.label])
+                self.corner_classes.append(corner_class[start:] + corner_class[:start])
+        
+        self.euler_characteristic = parent.euler_characteristic
+        self.genus = parent.genus
+        self.max_order = parent.max_order
+        
+        self.signature = [label for triangle in self for label in triangle.labels]
+        
+        self._cache = {}  # For caching hard to compute results.
+        
+        return self
     
     @classmethod
     def from_tuple(cls, edge_labels, vertex_labels=None, vertex_states=None):
@@ -337,16 +399,24 @@ class Triangulation:
         
         # Group the edges into vertex classes. Here two edges are in the same
         # class iff they have the same tail.
+        # We keep unused in order, so that vertices are always built in the same order, along with
+        # a set of the labels that are still unused. Labels are only removed from the list when they
+        # reach its end, which avoids the linear cost of searching for and removing them from it.
         unused = [i for i in range(zeta)] + [~i for i in range(zeta)]  # pylint: disable=unnecessary-comprehension
+        remaining = set(unused)
         vertex_classes = []
-        while unused:
-            new_vertex = [unused.pop()]
+        while remaining:
+            start = unused.pop()
+            if start not in remaining:
+                continue
+            remaining.remove(start)
+            new_vertex = [start]
             while True:
                 label, side = label_lookup[new_vertex[-1]]
                 neighbour = ~label[(side+2) % 3]
-                if neighbour in unused:
+                if neighbour in remaining:
                     new_vertex.append(neighbour)
-                    unused.remove(neighbour)
+                    remaining.remove(neighbour)
                 else:
                     break
             
@@ -425,7 +495,7 @@ class Triangulation:
         
         char = string.ascii_lowercase + string.ascii_uppercase + string.digits + '+-'
         char_lookup = dict((letter, index) for index, letter in enumerate(char))
-        perm_lookup = flipper.kernel.permutation.all_permutations(3)
+        perm_lookup = flipper.kernel.permutation.S3
         
         def debase(digits, base=64):
             ''' Return the decimal corresponding to a base64 sequence of digits. '''
@@ -476,7 +546,7 @@ class Triangulation:
                             # We cannot yet handle triangulations with boundary.
                             raise ValueError('Triangulations must be closed and so gluing must not be type 0.')
                         elif type_sequence[type_index] == 1:
-                            target, gluing = num_tri_used, perm_lookup[0]
+                            target, gluing = num_tri_used, perm_lookup[0]  # The identity permutation.
                             triangle_reversed[target] = not triangle_reversed[i]
                             
                             num_tri_used += 1
@@ -492,7 +562,7 @@ class Triangulation:
                     type_index += 1
                     
                     edge_labels[i][j] = zeta
-                    edge_labels[target][gluing(j)] = ~zeta
+                    edge_labels[target][gluing[j]] = ~zeta
                     zeta += 1
         
         if num_tri_used != num_tri:
@@ -598,10 +668,12 @@ class Triangulation:
         best = ([inf], [inf], [inf])
         skip = set() if skip is None else set(skip)
         
-        perm_inverse = flipper.kernel.permutation.PERM3_INVERSE
-        perm_lookup = flipper.kernel.permutation.PERM3_LOOKUP
-        transition_perm_lookup = flipper.kernel.permutation.TRANSITION_PERM3_LOOKUP
-        perm_reverse = flipper.kernel.Permutation([0, 2, 1])
+        # Permutations are coded as integers, see flipper.kernel.permutation.S3.
+        S3 = flipper.kernel.permutation.S3
+        perm_compose = flipper.kernel.permutation.S3_COMPOSE
+        perm_inverse = flipper.kernel.permutation.S3_INVERSE
+        transition_perm_lookup = flipper.kernel.permutation.TRANSITION_S3
+        perm_reverse = flipper.kernel.permutation.S3_INDEX[(0, 2, 1)]
         
         # Set up the starting points.
         if start_points is None:
@@ -617,9 +689,9 @@ class Triangulation:
             start_triangle = start_corner.triangle
             
             if not all(label in skip for label in start_triangle.labels):
-                start_perm = flipper.kernel.permutation.cyclic_permutation(start_corner.side, 3).inverse()
+                start_perm = perm_inverse[flipper.kernel.permutation.S3_CYCLIC[start_corner.side]]
                 if not start_orientation:
-                    start_perm = start_perm * perm_reverse
+                    start_perm = perm_compose[start_perm][perm_reverse]
                 
                 type_sequence = []
                 target_sequence = []
@@ -637,7 +709,7 @@ class Triangulation:
                     perm_inv = perm_inverse[perm]
                     
                     for j in range(3):
-                        side = perm_inv(j)
+                        side = S3[perm_inv][j]
                         target_corner = self.corner_of_edge(~triangle.labels[side])
                         target_triangle = target_corner.triangle
                         target_side = target_corner.side
@@ -645,7 +717,7 @@ class Triangulation:
                             # This edge was really a boundary edge.
                             type_sequence.append(0)
                         elif target_triangle not in triangle_labels:
-                            target_perm = perm * transition_perm_lookup[(target_side, side)]
+                            target_perm = perm_compose[perm][transition_perm_lookup[(target_side, side)]]
                             triangle_labels[target_triangle] = (num_triangles_seen, target_perm)
                             queue.put(target_triangle)
                             num_triangles_seen += 1
@@ -657,14 +729,14 @@ class Triangulation:
                         else:
                             triangle_index, _ = triangle_labels[triangle]
                             target_index, target_perm = triangle_labels[target_triangle]
-                            k = target_perm(target_side)
+                            k = S3[target_perm][target_side]
                             if target_index > triangle_index or (target_index == triangle_index and k > j):
                                 # We've not done this gluing yet.
-                                transition_perm = target_perm * transition_perm_lookup[(side, target_side)] * perm_inv
+                                transition_perm = perm_compose[perm_compose[target_perm][transition_perm_lookup[(side, target_side)]]][perm_inv]
                                 
                                 type_sequence.append(2)
                                 target_sequence.append(target_index)
-                                permutation_sequence.append(perm_lookup[transition_perm])
+                                permutation_sequence.append(transition_perm)
                         # We can give up early if we've built something bigger than best.
                         if type_sequence > best[0]:
                             good = False
@@ -765,26 +837,37 @@ class Triangulation:
         # V/    c     |     |          V|
         # #---------->#     #-----------#
         
-        vertex_map = dict()
-        for vertex in self.vertices:
-            vertex_map[vertex] = flipper.kernel.Vertex(vertex.label, filled=vertex.filled)
-        
-        edge_map = dict()
-        # Far away edges should go to an exact copy of themselves.
-        for edge in self.positive_edges:
-            edge_map[edge] = flipper.kernel.Edge(vertex_map[edge.source_vertex], vertex_map[edge.target_vertex], edge.label)
-            edge_map[~edge] = ~edge_map[edge]
-        
+        # Far away vertices, edges, triangles and corners are unchanged and so are shared with this triangulation.
         a, b, c, d = self.square_about_edge(edge_label)
         # We need to label new_edge with norm(edge_label) so that self.flip_edge(i).flip_edge(~i) == self.
-        new_edge = Edge(vertex_map[a.target_vertex], vertex_map[c.target_vertex], norm(edge_label))
-        
-        triangle_A2 = Triangle([new_edge, edge_map[d], edge_map[a]])
-        triangle_B2 = Triangle([~new_edge, edge_map[b], edge_map[c]])
-        
-        triangles = [flipper.kernel.Triangle([edge_map[edge] for edge in triangle]) for triangle in self if edge_label not in triangle.labels and ~edge_label not in triangle]
-        
-        return Triangulation(triangles + [triangle_A2, triangle_B2])
+        new_edge = Edge(a.target_vertex, c.target_vertex, norm(edge_label))
+        
+        triangle_A, triangle_B = self.triangle_lookup[edge_label], self.triangle_lookup[~edge_label]
+        triangle_A2 = Triangle([new_edge, d, a])
+        triangle_B2 = Triangle([~new_edge, b, c])
+        
+        triangles = [triangle for triangle in self if triangle is not triangle_A and triangle is not triangle_B]
+        # The triangles are kept sorted by their labels. We insert by hand as insort only takes a key from Python 3.10.
+        keys = [triangle.labels for triangle in triangles]
+        for triangle in (triangle_A2, triangle_B2):
+            index = bisect_left(keys, triangle.labels)
+            keys.insert(index, triangle.labels)
+            triangles.insert(index, triangle)
+        
+        triangle_lookup, edge_lookup, corner_lookup, vertex_lookup = dict(self.triangle_lookup), dict(self.edge_lookup), dict(self.corner_lookup), dict(self.vertex_lookup)
+        edge_lookup[new_edge.label] = new_edge
+        edge_lookup[~new_edge.label] = ~new_edge
+        for triangle in (triangle_A2, triangle_B2):
+            for corner in triangle.corners:
+                triangle_lookup[corner.label] = triangle
+                corner_lookup[corner.label] = corner
+                vertex_lookup[corner.label] = corner.vertex
+        
+        # Only the vertices of the two triangles that changed have new corners.
+        changed = set(vertex.label for vertex in triangle_A.vertices + triangle_B.vertices)
+        corner_classes = dict((corner_class[0].vertex.label, None if corner_class[0].vertex.label in changed else corner_class) for corner_class in self.corner_classes)
+        
+        return Triangulation._from_parent(self, triangles, (triangle_lookup, edge_lookup, corner_lookup, vertex_lookup), corner_classes)
     
     def relabel_edges(self, label_map):
         ''' Return a new triangulation obtained by relabelling the edges according to label_map. '''
@@ -805,29 +888,61 @@ class Triangulation:
             else:
                 raise flipper.AssumptionError(f'Missing new label for {i}.')
         
-        vertex_map = dict()
-        for vertex in self.vertices:
-            vertex_map[vertex] = flipper.kernel.Vertex(vertex.label, filled=vertex.filled)
-        
+        # The vertices are unchanged and so are shared with this triangulation.
         edge_map = dict()
-        # Far away edges should go to an exact copy of themselves.
         for edge in self.positive_edges:
-            edge_map[edge] = flipper.kernel.Edge(vertex_map[edge.source_vertex], vertex_map[edge.target_vertex], label_map[edge.label])
-            edge_map[~edge] = ~edge_map[edge]
+            new_edge = Edge(edge.source_vertex, edge.target_vertex, label_map[edge.label])
+            edge_map[edge.label] = new_edge
+            edge_map[~edge.label] = ~new_edge
+        
+        triangles = sorted([Triangle([edge_map[label] for label in triangle.labels]) for triangle in self], key=lambda t: t.labels)
+        corners = [corner for triangle in triangles for corner in triangle.corners]
+        triangle_lookup = dict((corner.label, corner.triangle) for corner in corners)
+        edge_lookup = dict((edge.label, edge) for edge in edge_map.values())
+        corner_lookup = dict((corner.label, corner) for corner in corners)
+        vertex_lookup = dict((corner.label, corner.vertex) for corner in corners)
         
-        triangles = [flipper.kernel.Triangle([edge_map[edge] for edge in triangle]) for triangle in self]
-        return Triangulation(triangles)
+        # Relabelling does not change the cyclic order of the corners about each vertex.
+        corner_classes = dict((corner_class[0].vertex.label, [corner_lookup[label_map[corner.label]] for corner in corner_class]) for corner_class in self.corner_classes)
+        
+        return Triangulation._from_parent(self, triangles, (triangle_lookup, edge_lookup, corner_lookup, vertex_lookup), corner_classes)
     
+    @memoize
     def tree_and_dual_tree(self, respect_fillings=False):
         ''' Return a maximal tree in the 1--skeleton of this triangulation and a
         maximal tree in 1--skeleton of the dual of this triangulation.
         
         These are given as lists of Booleans signaling if each edge is in the tree.
         No edge is used in both the tree and the dual tree. Note that when this surface
-        is disconnected this tree is actually a forest. '''
+        is disconnected this tree is actually a forest.
+        
+        The result is cached so it must not be modified. '''
         
         components = self.components()
         
+        def grow(tree, used, neighbours, available):
+            ''' Grow the forest tree, whose nodes are marked in used, until it is maximal.
+            
+            At each step this adds the available edge of smallest index which leaves the forest. '''
+            
+            # The heap contains every available edge meeting the forest. An edge that
+            # stops leaving the forest never starts again so it can then be discarded.
+            heap = []
+            for node in used:
+                if used[node]:
+                    for edge_index, _ in neighbours[node]:
+                        heappush(heap, edge_index)
+            
+            while heap:
+                edge_index = heappop(heap)
+                a, b = ends[edge_index]
+                if not tree[edge_index] and available(edge_index) and used[a] != used[b]:
+                    tree[edge_index] = True
+                    new = b if used[a] else a
+                    used[new] = True
+                    for edge_index2, _ in neighbours[new]:
+                        heappush(heap, edge_index2)
+        
         tree = [False] * self.zeta
         vertices_used = dict((vertex, False) for vertex in self.vertices)
         # Get some starting vertices.
@@ -843,44 +958,37 @@ class Triangulation:
                         vertices_used[vertex] = True
                         break
         
-        while True:
-            for edge_index in range(self.zeta):
-                if not tree[edge_index]:
-                    a, b = self.vertices_of_edge(edge_index)
-                    if vertices_used[a] != vertices_used[b]:
-                        tree[edge_index] = True
-                        vertices_used[a] = True
-                        vertices_used[b] = True
-                        break
-            else:
-                break  # If there are no more to add then our tree is maximal.
+        ends = [self.vertices_of_edge(edge_index) for edge_index in range(self.zeta)]
+        neighbours = dict((vertex, []) for vertex in self.vertices)
+        for edge_index, (a, b) in enumerate(ends):
+            neighbours[a].append((edge_index, b))
+            neighbours[b].append((edge_index, a))
+        grow(tree, vertices_used, neighbours, lambda edge_index: True)
         
         dual_tree = [False] * self.zeta
         faces_used = dict((triangle, False) for triangle in self.triangles)
         for component in components:
             faces_used[self.triangle_lookup[component[0]]] = True
         
-        while True:
-            for edge_index in range(self.zeta):
-                if not tree[edge_index] and not dual_tree[edge_index]:
-                    a, b = self.triangles_of_edge(edge_index)
-                    if faces_used[a] != faces_used[b]:
-                        dual_tree[edge_index] = True
-                        faces_used[a] = True
-                        faces_used[b] = True
-                        break
-            else:
-                break  # If there are no more to add then our dual tree is maximal.
+        ends = [self.triangles_of_edge(edge_index) for edge_index in range(self.zeta)]
+        neighbours = dict((triangle, []) for triangle in self.triangles)
+        for edge_index, (a, b) in enumerate(ends):
+            neighbours[a].append((edge_index, b))
+            neighbours[b].append((edge_index, a))
+        grow(dual_tree, faces_used, neighbours, lambda edge_index: not tree[edge_index])
         
         return tree, dual_tree
     
+    @memoize
     def homology_basis(self):
         ''' Return a basis for H_1 of the underlying punctured surface.
         
         Each element is given as a path in the dual 1--skeleton and corrsponds
         to a good curve. Each path will meet each edge at most once.
         
-        Each pair of paths is guaranteed to meet at most once. '''
+        Each pair of paths is guaranteed to meet at most once.
+        
+        The result is cached so it must not be modified. '''
         
         # Construct a maximal spanning tree in the 1--skeleton of the triangulation.
         # and a maximal spanning tree in the complement of the tree in the 1--skeleton of the dual triangulation.
@@ -889,23 +997,124 @@ class Triangulation:
         # Generators are given by edges not in the tree or the dual tree (along with some segment
         # in the dual tree to make it into a loop).
         
-        homology_generators = []
-        G = nx.DiGraph()
+        # Root each component of the dual tree. For each triangle we record its depth and the
+        # pair (parent, label) where label is the edge of the parent that leads to the triangle.
+        parents = dict()
+        depths = dict()
         for triangle in self:
-            for edge in triangle:
-                if dual_tree[edge.index]:
-                    G.add_edge(triangle, edge)
-                    G.add_edge(~edge, triangle)
+            if triangle not in depths:
+                parents[triangle] = None
+                depths[triangle] = 0
+                to_process = [triangle]
+                while to_process:
+                    current = to_process.pop()
+                    for edge in current:
+                        if dual_tree[edge.index]:
+                            child = self.triangle_lookup[~edge.label]
+                            if child not in depths:
+                                parents[child] = (current, edge.label)
+                                depths[child] = depths[current] + 1
+                                to_process.append(child)
         
+        homology_generators = []
         for edge_index in range(self.zeta):
             if not tree[edge_index] and not dual_tree[edge_index]:
                 target, source = self.triangles_of_edge(edge_index)
-                path = nx.shortest_path(G, source, target)
-                generator = [edge_index] + [edge.label for edge in reversed(path[1::2])]
-                homology_generators.append(generator)
+                # Walk up from both ends to their common ancestor. The path from source
+                # to target leaves each triangle below source's side by ~label and enters
+                # each triangle on target's side by label. We record it backwards.
+                up, down = [], []
+                while source != target:
+                    if depths[source] >= depths[target]:
+                        source, label = parents[source]
+                        up.append(~label)
+                    else:
+                        target, label = parents[target]
+                        down.append(label)
+                homology_generators.append([edge_index] + down + up[::-1])
         
         return homology_generators
     
+    @memoize
+    def homology_section(self):
+        ''' Return a list of the algebraic intersection numbers of some cycles whose classes form a basis of H_1.
+        
+        Here H_1 is the first homology of the surface obtained by removing
+        the unfilled vertices. The cycles are the paths of self.homology_basis()
+        followed by loops about all but the first unfilled vertex.
+        
+        The result is cached so it must not be modified. '''
+        
+        cycles = []
+        for path in self.homology_basis():
+            algebraic = [0] * self.zeta
+            for step in path:
+                algebraic[norm(step)] += +1 if norm(step) == step else -1
+            cycles.append(algebraic)
+        
+        for vertex in [vertex for vertex in self.vertices if not vertex.filled][1:]:
+            algebraic = [0] * self.zeta
+            for corner in self.corner_class_of_vertex(vertex):
+                index = corner.indices[2]
+                algebraic[index] += 1 if index == corner.labels[2] else -1
+            cycles.append(algebraic)
+        
+        return cycles
+    
+    @memoize
+    def homology_projection(self, relative_boundary=False):
+        ''' Return the Matrix taking the algebraic intersection numbers of a cycle to its class in H_1.
+        
+        The homology class is computed relative to the filled punctures,
+        unless relative_boundary is set to True in which case it is done
+        relative to all vertices. When relative_boundary is False the
+        coordinates are chosen so that self.homology_section()[i] maps to
+        the i-th standard basis vector.
+        
+        The result is cached so it must not be modified. '''
+        
+        tree, dual_tree = self.tree_and_dual_tree(not relative_boundary)
+        vertices_used = dict((vertex, False) for vertex in self.vertices)
+        # Get some starting vertices.
+        for vertex in self.vertices:
+            if not vertex.filled:
+                vertices_used[vertex] = True
+                if relative_boundary:  # Stop as soon as we've marked one.
+                    break
+        
+        outgoing = dict((vertex, []) for vertex in self.vertices)
+        for edge in self.edges:
+            outgoing[edge.source_vertex].append(edge)
+        
+        # We push each edge of the tree into the other edges meeting its far vertex.
+        # Each step is an elementary row operation, which we do in place.
+        rows = [[1 if i == j else 0 for j in range(self.zeta)] for i in range(self.zeta)]
+        while True:
+            for edge in self.edges:
+                if tree[edge.index]:
+                    source, target = edge.source_vertex, edge.target_vertex
+                    if vertices_used[source] and not vertices_used[target]:  # This implies edge goes between distinct vertices.
+                        vertices_used[target] = True
+                        for edge2 in outgoing[target]:
+                            # We have to skip the edge2 == ~edge case at this point as we are still
+                            # removing it from various places.
+                            if edge2 != ~edge:
+                                k = +1 if edge2.is_positive() == edge.is_positive() else -1
+                                rows[edge2.index] = [x + k * y for x, y in zip(rows[edge2.index], rows[edge.index])]
+                        # Don't forget to go back and do edge which we skipped before.
+                        rows[edge.index] = [0] * self.zeta
+                        break
+            else:
+                break  # If there are no more to add then we've dealt with every edge.
+        
+        M = flipper.kernel.Matrix([rows[i] for i in range(self.zeta) if not tree[i] and not dual_tree[i]])
+        if not relative_boundary:
+            # Change coordinates so that the section maps to the standard basis.
+            B = flipper.kernel.Matrix([M(cycle) for cycle in self.homology_section()]).transpose()
+            M = B.inverse() * M
+        
+        return M
+    
     def find_isometry(self, other, label_map, respect_fillings=True):
         ''' Return the isometry from this triangulation to other defined by label_map.
         
@@ -990,7 +1199,10 @@ class Triangulation:
     
     # Laminations we can build on this triangulation.
     def lamination(self, geometric, algebraic=None, remove_peripheral=True):
-        ''' Return a new lamination on this surface assigning the specified weight to each edge. '''
+        ''' Return a new lamination on this surface assigning the specified weight to each edge.
+        
+        If algebraic is None and the lamination is a curve then its algebraic
+        intersection numbers are computed automatically when first needed. '''
         
         if remove_peripheral:
             # Compute how much peripheral component there is on each corner class.
@@ -1009,61 +1221,51 @@ class Triangulation:
                 if all(entry % 2 == 0 for entry in geometric):
                     geometric = [entry // 2 for entry in geometric]
         
-        if algebraic is not None:
-            return flipper.kernel.Lamination(self, geometric, algebraic)
-        else:
-            lamination = flipper.kernel.Lamination(self, geometric, [0] * self.zeta)
-            # If we have a curve we should compute the algebraic intersection numbers.
-            # Note that if the curve is not twistable then its algebraic intersection numbers
-            # are all zero and so we can just return lamination.
-            if lamination.is_curve() and lamination.is_twistable():
-                conjugation = lamination.conjugate_short()
-                short_lamination = conjugation(lamination)
-                triangulation = short_lamination.triangulation
-                
-                # Grab the indices of the two edges we meet.
-                e1, e2 = [edge_index for edge_index in range(short_lamination.zeta) if short_lamination(edge_index) > 0]
-                
-                a, b, c, d = triangulation.square_about_edge(e1)
-                # If the curve is going vertically through the square then ...
-                if short_lamination(a) == 1 and short_lamination(c) == 1:
-                    # swap the labels round so it goes horizontally.
-                    e1, e2 = e2, e1
-                    a, b, c, d = triangulation.square_about_edge(e1)
-                elif short_lamination(b) == 1 and short_lamination(d) == 1:
-                    pass
-                
-                # Currently short_lamination.algebraic == [0, 0, ..., 0].
-                # So we need to build a new short_lamination with the correct algebraic intersection numbers.
-                geometric = short_lamination.geometric
-                algebraic = [1 if i == e1 else -b.sign() if i == b.index else 0 for i in range(self.zeta)]
-                
-                new_short_lamination = flipper.kernel.Lamination(triangulation, geometric, algebraic)
-                return conjugation.inverse()(new_short_lamination)
-            else:
-                return lamination
+        return flipper.kernel.Lamination(self, geometric, algebraic)
+    
+    @memoize
+    def lamination_cone(self):
+        ''' Return the Matrix C such that the geometric intersection numbers v of a measured lamination are exactly the vectors with C(v) >= 0.
+        
+        Its rows are the triangle inequalities, one for each corner of each triangle. '''
+        
+        rows = []
+        for corner in self.corners:
+            row = [0] * self.zeta
+            row[corner.indices[1]] += 1
+            row[corner.indices[2]] += 1
+            row[corner.indices[0]] -= 1
+            rows.append(row)
+        
+        return flipper.kernel.Matrix(rows)
     
     def empty_lamination(self):
         ''' Return an empty lamination on this surface. '''
         
         return self.lamination([0] * self.zeta, [0] * self.zeta)
     
-    def random_curve(self, num_flips):
-        ''' Return a random curve on this surface. '''
+    def random_curve(self, num_flips, seed=None):
+        ''' Return a random curve on this surface.
+        
+        If a seed is given then the same curve is returned every time. '''
         
+        chooser = choice if seed is None else Random(seed).choice
         h = self.id_encoding()
         for _ in range(num_flips):
             T = h.target_triangulation
-            h = T.encode_flip(choice(T.flippable_edges())) * h
+            h = T.encode_flip(chooser(T.flippable_edges())) * h
         
         c = h.target_triangulation.key_curves()[0]
         return h.inverse()(c)
     
+    @memoize
     def key_curves(self):
         ''' Return a list of curves which fill the underlying surface and include a basis for H_1(S).
         
         As these fill, by Alexander's trick a mapping class is the identity
-        if and only if it fixes all of them, including orientation. '''
+        if and only if it fixes all of them, including orientation.
+        
+        The result is cached so it must not be modified. '''
         
         curves = []
         
@@ -1118,6 +1320,26 @@ class Triangulation:
         # Filter out any empty laminations that we get.
         return [curve for curve in curves if not curve.is_empty()]
     
+    @memoize
+    def key_curve_order(self):
+        ''' Return the list of indices of self.key_curves() in the order in which Encodings should test them.
+        
+        Encodings reorder this list in place, moving a curve to the front
+        whenever it distinguishes two maps, so that the curves which most
+        often tell maps apart are tested first. '''
+        
+        return list(range(len(self.key_curves())))
+    
+    @memoize
+    def fingerprint_curve(self):
+        ''' Return a fixed pseudo-random curve on this surface.
+        
+        Encodings use the image of this curve as a cheap hash, see
+        Encoding.fingerprint(). It is generated from a fixed seed so equal
+        triangulations have the same fingerprint curve. '''
+        
+        return self.random_curve(2 * self.zeta, seed=0)
+    
     def id_isometry(self):
         ''' Return the isometry representing the identity map. '''
         
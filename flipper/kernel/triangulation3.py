@@ -8,14 +8,18 @@ Provides two classes: Tetrahedron and Triangulation3. '''
 # We follow the orientation conventions in SnapPy/headers/kernel_typedefs.h L:154
 # and SnapPy/kernel/peripheral_curves.c.
 
-from itertools import combinations, product
-
-import networkx as nx
+from array import array
+from collections.abc import Mapping, Sequence
+from itertools import combinations
+import string
 
 import flipper
 
 # Edge veerings:
 VEERING_UNKNOWN, VEERING_LEFT, VEERING_RIGHT = 'Unknown', 'Left', 'Right'
+# These are stored as small integers, namely their index in this list.
+VEERINGS = [VEERING_UNKNOWN, VEERING_LEFT, VEERING_RIGHT]
+VEERING_CODES = dict((veering, code) for code, veering in enumerate(VEERINGS))
 # Peripheral curve types:
 LONGITUDES, MERIDIANS, TEMPS = 0, 1, 2  # These are used for indexing so need to be integers.
 PERIPHERAL_TYPES = [LONGITUDES, MERIDIANS, TEMPS]
@@ -36,23 +40,154 @@ EXIT_CUSP_RIGHT = {
     (2, 0): 1, (2, 1): 3, (2, 3): 0,
     (3, 0): 2, (3, 1): 0, (3, 2): 1
     }
+# The edge (a) -- (b) of a tetrahedron is stored at position EDGE_INDEX[(a, b)].
+EDGE_PAIRS = list(combinations(range(4), 2))
+EDGE_INDEX = dict(((a, b), index) for index, pair in enumerate(EDGE_PAIRS) for a, b in [pair, pair[::-1]])
+# Isomorphism signatures:
+# These are the characters used by isomorphism signatures, in order.
+SIG_CHARS = string.ascii_lowercase + string.ascii_uppercase + string.digits + '+-'
+# Gluing permutations are coded as integers, see flipper.kernel.permutation.S4. Fortunately, their
+# lexicographic order is also the one used by isomorphism signatures.
+
+def _encode_integer(value, num_chars):
+    ''' Return value written using num_chars characters of SIG_CHARS, least significant first. '''
+    
+    return ''.join(SIG_CHARS[(value >> (6 * i)) % 64] for i in range(num_chars))
+
+def _component_iso_sig(gluings, component):
+    ''' Return the isomorphism signature of the given connected component.
+    
+    Here gluings[i][side] is either None or the pair (target index, permutation code)
+    describing how that side of tetrahedron i is glued and component is the list of
+    the indices of the tetrahedra in this component. '''
+    
+    S4, compose, inverse = flipper.kernel.permutation.S4, flipper.kernel.permutation.S4_COMPOSE, flipper.kernel.permutation.S4_INVERSE
+    
+    num_tetrahedra = len(component)
+    if num_tetrahedra < 63:
+        num_chars = 1
+        char_start = SIG_CHARS[num_tetrahedra]
+    else:
+        num_chars = 0
+        while num_tetrahedra >> (6 * num_chars): num_chars += 1
+        char_start = SIG_CHARS[63] + SIG_CHARS[num_chars] + _encode_integer(num_tetrahedra, num_chars)
+    
+    best, best_actions = None, ''
+    for start in component:
+        for start_map in range(len(S4)):
+            # We relabel the tetrahedra in the order that they are found and map
+            # the vertices of each tetrahedron via its entry of vertex_map.
+            image = {start: 0}
+            preimage = [start]
+            vertex_map = {start: start_map}
+            done = [False] * (4 * num_tetrahedra)
+            actions, targets, perms = [], [], []
+            action_chars = []
+            smaller = best is None  # Whether we are already known to beat best.
+            
+            for position in range(4 * num_tetrahedra):
+                if done[position]: continue
+                done[position] = True
+                
+                source_index, source_side = divmod(position, 4)
+                source = preimage[source_index]
+                side = S4[inverse[vertex_map[source]]][source_side]
+                if gluings[source][side] is None:
+                    actions.append(0)
+                else:
+                    target, gluing = gluings[source][side]
+                    if target in image:
+                        actions.append(2)
+                        targets.append(image[target])
+                        perms.append(compose[compose[vertex_map[target]][gluing]][inverse[vertex_map[source]]])
+                    else:
+                        actions.append(1)
+                        image[target] = len(preimage)
+                        preimage.append(target)
+                        vertex_map[target] = compose[vertex_map[source]][inverse[gluing]]
+                    done[4 * image[target] + S4[vertex_map[target]][S4[gluing][side]]] = True
+                
+                # We can give up early if our actions are already bigger than best.
+                if len(actions) % 3 == 0:
+                    action_chars.append(SIG_CHARS[actions[-3] + 4 * actions[-2] + 16 * actions[-1]])
+                    if not smaller:
+                        if action_chars[-1] > best_actions[len(action_chars) - 1]:
+                            break
+                        if action_chars[-1] < best_actions[len(action_chars) - 1]:
+                            smaller = True
+            else:
+                padded = actions[len(action_chars) * 3:] + [0, 0]
+                if len(padded) > 2:
+                    action_chars.append(SIG_CHARS[padded[0] + 4 * padded[1] + 16 * padded[2]])
+                signature_actions = ''.join(action_chars)
+                signature = char_start + signature_actions + ''.join(_encode_integer(target, num_chars) for target in targets) + ''.join(SIG_CHARS[perm] for perm in perms)
+                if best is None or signature < best:
+                    best, best_actions = signature, signature_actions
+    
+    return best
 
 class Tetrahedron:
-    ''' This represents a tetrahedron. '''
-    def __init__(self, label):
+    ''' This represents a tetrahedron.
+    
+    This is a view onto the Triangulation3 that it belongs to, which stores the
+    gluings, edge veerings, cusp indices and peripheral curves of all of its
+    tetrahedra in flat arrays. The attributes below are looked up in these arrays
+    every time that they are used so they always reflect the current state and
+    writing to cusp_indices, edge_labels or peripheral_curves writes to them.
+    
+    If no triangulation3 is given then the tetrahedron is placed on its own in
+    a new one, where its index (its position in the arrays) is 0 whatever its
+    label. Tetrahedra can only be glued to others in the same triangulation, so
+    these are usually made with Triangulation3.create_tetrahedron(). '''
+    
+    # Warning: This needs to be updated if the interals of this class ever change.
+    __slots__ = ['label', 'index', 'triangulation3', 'vertex_labels']
+    
+    def __init__(self, label, triangulation3=None):
         assert isinstance(label, flipper.IntegerType)
+        assert triangulation3 is None or isinstance(triangulation3, Triangulation3)
+        
+        if triangulation3 is None:
+            triangulation3 = Triangulation3(1)
+            triangulation3.tetrahedra[0] = self
+            self.index = 0
+        else:
+            self.index = label
         
         self.label = label
-        self.glued_to = [None] * 4  # Each entry is either: None or (Tetrahedron, permutation).
-        self.cusp_indices = [-1, -1, -1, -1]
-        self.peripheral_curves = [[[0, 0, 0, 0] for _ in range(4)] for _ in PERIPHERAL_TYPES]
-        self.edge_labels = dict((vertex_pair, VEERING_UNKNOWN) for vertex_pair in combinations(range(4), r=2))
+        self.triangulation3 = triangulation3
         self.vertex_labels = [None, None, None, None]
     
     def __repr__(self):
         return str(self)
     def __str__(self):
-        return '%s --> %s' % (self.label, ', '.join(f'{x[0].label}: {x[1]}' if x is not None else 'X' for x in self.glued_to))  # pylint: disable=unsubscriptable-object, consider-using-f-string
+        return '%s --> %s' % (self.label, ', '.join(f'{x[0].label}: {x[1]}' if x is not None else 'X' for x in self.glued_to))  # pylint: disable=consider-using-f-string
+    
+    @property
+    def glued_to(self):
+        ''' What each side is glued to. Each entry is either None or a pair (Tetrahedron, Permutation).
+        
+        This cannot be written to, use self.glue() instead. '''
+        
+        return GluingView(self)
+    
+    @property
+    def cusp_indices(self):
+        ''' The cusp index of each vertex of this tetrahedron. '''
+        
+        return ArrayView(self.triangulation3.corner_cusps, 4 * self.index, 4)
+    
+    @property
+    def peripheral_curves(self):
+        ''' The array of peripheral curves of this tetrahedron, indexed by [type][side][other]. '''
+        
+        return self.triangulation3.peripheral_array()[self.index]
+    
+    @property
+    def edge_labels(self):
+        ''' The mapping from each vertex pair (a, b), with a < b, of this tetrahedron to its edge label. '''
+        
+        return EdgeLabelView(self)
     
     def glue(self, side, target, permutation):
         ''' Glue the given side of this tetrahedron to target via the given permutation.
@@ -60,48 +195,36 @@ class Tetrahedron:
         You are not supposed to unglue tetrahedra as they automatically install a lot
         of additional structure.'''
         
-        if self.glued_to[side] is None:
-            assert self.glued_to[side] is None
-            assert target.glued_to[permutation(side)] is None
-            assert not permutation.is_even()
-            
-            self.glued_to[side] = (target, permutation)
-            target.glued_to[permutation(side)] = (self, permutation.inverse())
-            
-            # Move across the edge veerings too, is possible.
-            for a, b in combinations(VERTICES_MEETING[side], 2):
-                x, y = permutation(a), permutation(b)
-                my_edge_veering = self.get_edge_label(a, b)
-                his_edge_veering = target.get_edge_label(x, y)
-                if my_edge_veering == VEERING_UNKNOWN and his_edge_veering != VEERING_UNKNOWN:
-                    self.set_edge_label(a, b, his_edge_veering)
-                elif my_edge_veering != VEERING_UNKNOWN and his_edge_veering == VEERING_UNKNOWN:
-                    target.set_edge_label(x, y, my_edge_veering)
-        else:
-            assert (target, permutation) == self.glued_to[side]
+        if target.triangulation3 is not self.triangulation3:
+            raise ValueError('Can only glue tetrahedra in the same Triangulation3.')
+        
+        self.triangulation3.glue(self.index, side, target.index, flipper.kernel.permutation.S4_INDEX[tuple(permutation)])
     
     def get_edge_label(self, a, b):
         ''' Return the label on edge (a) -- (b) of this tetrahedron. '''
         
-        a, b = min(a, b), max(a, b)
-        return self.edge_labels[(a, b)]
+        return VEERINGS[self.triangulation3.edge_veerings[6 * self.index + EDGE_INDEX[(a, b)]]]
     
     def set_edge_label(self, a, b, value):
         ''' Set the label on edge (a) -- (b) of this tetrahedron. '''
         
-        a, b = min(a, b), max(a, b)
-        self.edge_labels[(a, b)] = value
+        self.triangulation3.edge_veerings[6 * self.index + EDGE_INDEX[(a, b)]] = VEERING_CODES[value]
     
     def snappy_string(self):
         ''' Return the SnapPy string describing this tetrahedron. '''
         
+        S4 = flipper.kernel.permutation.S4
+        triangulation3 = self.triangulation3
+        corners = range(4 * self.index, 4 * self.index + 4)
+        peripheral_curves = self.peripheral_curves.tolist()
+        
         strn = ''
-        strn += '%4d %4d %4d %4d \n' % tuple(tetrahedra.label for tetrahedra, gluing in self.glued_to)  # pylint: disable=consider-using-f-string
-        strn += ' %4s %4s %4s %4s\n' % tuple(gluing.compressed_string() for tetrahedra, gluing in self.glued_to)  # pylint: disable=consider-using-f-string
-        strn += '%4d %4d %4d %4d \n' % tuple(self.cusp_indices)  # pylint: disable=consider-using-f-string
-        strn += ' %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d\n' % tuple(cusp for meridian in self.peripheral_curves[MERIDIANS] for cusp in meridian)  # pylint: disable=consider-using-f-string
+        strn += '%4d %4d %4d %4d \n' % tuple(triangulation3.gluing_targets[corner] for corner in corners)  # pylint: disable=consider-using-f-string
+        strn += ' %4s %4s %4s %4s\n' % tuple(''.join(str(image) for image in S4[triangulation3.gluing_perms[corner]]) for corner in corners)  # pylint: disable=consider-using-f-string
+        strn += '%4d %4d %4d %4d \n' % tuple(triangulation3.corner_cusps[corner] for corner in corners)  # pylint: disable=consider-using-f-string
+        strn += ' %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d\n' % tuple(cusp for meridian in peripheral_curves[MERIDIANS] for cusp in meridian)  # pylint: disable=consider-using-f-string
         strn += '  0  0  0  0  0  0  0  0  0  0  0  0  0  0  0  0\n'
-        strn += ' %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d\n' % tuple(cusp for longitude in self.peripheral_curves[LONGITUDES] for cusp in longitude)  # pylint: disable=consider-using-f-string
+        strn += ' %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d %2d\n' % tuple(cusp for longitude in peripheral_curves[LONGITUDES] for cusp in longitude)  # pylint: disable=consider-using-f-string
         strn += '  0  0  0  0  0  0  0  0  0  0  0  0  0  0  0  0\n'
         strn += '  0.000000000000 0.000000000000\n'
         return strn
@@ -109,16 +232,256 @@ class Tetrahedron:
     def __snappy__(self):
         return self.snappy_string()
 
+class ArrayView:
+    ''' This represents a window onto part of an array.
+    
+    Reading and writing entries of the view reads and writes the underlying array. '''
+    
+    __slots__ = ['data', 'start', 'length']
+    
+    def __init__(self, data, start, length):
+        self.data = data
+        self.start = start
+        self.length = length
+    
+    def __repr__(self):
+        return str(self)
+    def __str__(self):
+        return str(list(self))
+    def __len__(self):
+        return self.length
+    def __iter__(self):
+        return iter(self.data[self.start:self.start + self.length])
+    def __getitem__(self, index):
+        if not 0 <= index < self.length: raise IndexError('Index out of range.')
+        return self.data[self.start + index]
+    def __setitem__(self, index, value):
+        if not 0 <= index < self.length: raise IndexError('Index out of range.')
+        self.data[self.start + index] = value
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+class GluingView(Sequence):
+    ''' This represents what each side of a tetrahedron is glued to.
+    
+    Each entry is either None or a pair (Tetrahedron, Permutation) and is read
+    from the gluing arrays of the triangulation. It cannot be written to. '''
+    
+    __slots__ = ['tetrahedron']
+    
+    def __init__(self, tetrahedron):
+        self.tetrahedron = tetrahedron
+    
+    def __repr__(self):
+        return str(self)
+    def __str__(self):
+        return str(list(self))
+    def __len__(self):
+        return 4
+    def __getitem__(self, side):
+        if isinstance(side, slice): return [self[index] for index in range(4)[side]]
+        if not 0 <= side < 4: raise IndexError('Index out of range.')
+        triangulation3 = self.tetrahedron.triangulation3
+        corner = 4 * self.tetrahedron.index + side
+        target = triangulation3.gluing_targets[corner]
+        if target < 0:
+            return None
+        
+        return (triangulation3.tetrahedra[target], flipper.kernel.Permutation(flipper.kernel.permutation.S4[triangulation3.gluing_perms[corner]]))
+    def __setitem__(self, side, value):
+        raise TypeError('Gluings cannot be assigned, use Tetrahedron.glue() instead.')
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+class EdgeLabelView(Mapping):
+    ''' This represents the edge labels of a tetrahedron, keyed by the vertex pairs (a, b) with a < b.
+    
+    Reading and writing entries of the view reads and writes the edge veerings of the triangulation. '''
+    
+    __slots__ = ['tetrahedron']
+    
+    def __init__(self, tetrahedron):
+        self.tetrahedron = tetrahedron
+    
+    def __repr__(self):
+        return str(self)
+    def __str__(self):
+        return str(dict(self))
+    def __len__(self):
+        return len(EDGE_PAIRS)
+    def __iter__(self):
+        return iter(EDGE_PAIRS)
+    def __getitem__(self, vertex_pair):
+        if vertex_pair not in EDGE_PAIRS: raise KeyError(vertex_pair)
+        return self.tetrahedron.get_edge_label(*vertex_pair)
+    def __setitem__(self, vertex_pair, value):
+        if vertex_pair not in EDGE_PAIRS: raise KeyError(vertex_pair)
+        self.tetrahedron.set_edge_label(*vertex_pair, value)
+
 class Triangulation3:
-    ''' This represents triangulation, that is a collection of tetrahedra. '''
+    ''' This represents triangulation, that is a collection of tetrahedra.
+    
+    The data of the tetrahedra is stored in flat arrays, indexed by
+    4 * tetrahedron.index + side for each corner of a tetrahedron and by
+    6 * tetrahedron.index + EDGE_INDEX[(a, b)] for each of its edges:
+     - gluing_targets[corner] is the index of the tetrahedron that this side is glued to, or -1,
+     - gluing_perms[corner] is the code of the gluing permutation, see flipper.kernel.permutation.S4, or -1,
+     - edge_veerings[edge] is the index in VEERINGS of the veering of this edge, and
+     - corner_cusps[corner] is the index of the cusp that this vertex lies in, or -1.
+    The peripheral curves are stored in a NumPy array of shape
+    (num_tetrahedra, len(PERIPHERAL_TYPES), 4, 4) which is only allocated once
+    it is needed, see self.peripheral_array().
+    
+    The Tetrahedra of this triangulation are views onto these arrays. '''
     def __init__(self, num_tetrahedra):
         assert isinstance(num_tetrahedra, flipper.IntegerType)
         
         self.num_tetrahedra = num_tetrahedra
-        self.tetrahedra = [Tetrahedron(i) for i in range(self.num_tetrahedra)]
+        self.gluing_targets = array('i', [-1] * (4 * num_tetrahedra))
+        self.gluing_perms = array('b', [-1] * (4 * num_tetrahedra))
+        self.edge_veerings = array('b', [VEERING_CODES[VEERING_UNKNOWN]] * (6 * num_tetrahedra))
+        self.corner_cusps = array('i', [-1] * (4 * num_tetrahedra))
+        self.peripheral_curves = None
+        self.tetrahedra = [Tetrahedron(i, self) for i in range(self.num_tetrahedra)]
         self.cusps = None
         self.num_cusps = -1
     
+    @classmethod
+    def from_iso_sig(cls, signature):
+        ''' Return the triangulation described by the given isomorphism signature.
+        
+        This is the inverse of self.iso_sig(). As the tetrahedra of a
+        Triangulation3 are oriented, the triangulation described must be
+        orientable. The tetrahedra are relabelled so that every gluing is
+        orientation reversing. '''
+        
+        assert isinstance(signature, str)
+        
+        S4, compose, inverse, even = flipper.kernel.permutation.S4, flipper.kernel.permutation.S4_COMPOSE, flipper.kernel.permutation.S4_INVERSE, flipper.kernel.permutation.S4_EVEN
+        char_lookup = dict((letter, index) for index, letter in enumerate(SIG_CHARS))
+        
+        def debase(digits):
+            ''' Return the integer corresponding to a base64 sequence of digits. '''
+            
+            return sum(digit << (6 * index) for index, digit in enumerate(digits))
+        
+        try:
+            values = [char_lookup[letter] for letter in signature]
+        except KeyError as err:
+            raise ValueError('Signature must be a string matching [a-zA-Z0-9+-]*') from err
+        
+        if not values:
+            raise ValueError('Signature must not be empty.')
+        
+        # The signature is a concatenation of the signatures of the components.
+        gluings = []
+        position = 0
+        try:
+            while position < len(values):
+                if values[position] < 63:
+                    num_chars, num_tetrahedra = 1, values[position]
+                    position += 1
+                else:
+                    num_chars = values[position+1]
+                    num_tetrahedra = debase(values[position+2:position+2+num_chars])
+                    position += 2 + num_chars
+                    if num_chars == 0:
+                        raise ValueError('Signature must specify a character length > 0.')
+                
+                if num_tetrahedra == 0:
+                    continue
+                
+                # Read the actions. A boundary face accounts for one side and a gluing accounts for two.
+                actions = []
+                num_sides, num_joins = 0, 0
+                while num_sides < 4 * num_tetrahedra:
+                    value = values[position]
+                    position += 1
+                    for action in [value % 4, (value // 4) % 4, (value // 16) % 4]:
+                        if num_sides == 4 * num_tetrahedra: break
+                        if action not in (0, 1, 2):
+                            raise ValueError('Each action must be type 0, 1 or 2.')
+                        actions.append(action)
+                        num_sides += 1 if action == 0 else 2
+                        num_joins += 1 if action == 2 else 0
+                if num_sides != 4 * num_tetrahedra:
+                    raise ValueError('Actions do not account for every side.')
+                
+                targets = [debase(values[position+i*num_chars:position+(i+1)*num_chars]) for i in range(num_joins)]
+                position += num_joins * num_chars
+                perms = [values[position+i] for i in range(num_joins)]
+                if any(perm >= len(S4) for perm in perms):
+                    raise ValueError('Gluing is not a permutation.')
+                position += num_joins
+                if position > len(values):
+                    raise ValueError('Signature is too short.')
+                
+                # Now replay the actions to rebuild the gluings.
+                offset = len(gluings)
+                component = [[None] * 4 for _ in range(num_tetrahedra)]
+                done = [[False] * 4 for _ in range(num_tetrahedra)]
+                actions, targets, perms = iter(actions), iter(targets), iter(perms)
+                num_used = 1
+                for tetrahedron in range(num_tetrahedra):
+                    for side in range(4):
+                        if done[tetrahedron][side]: continue
+                        done[tetrahedron][side] = True
+                        
+                        action = next(actions)
+                        if action == 0: continue
+                        
+                        if action == 1:
+                            target, gluing = num_used, 0  # The identity permutation.
+                            num_used += 1
+                        else:  # action == 2.
+                            target, gluing = next(targets), next(perms)
+                        target_side = S4[gluing][side]
+                        if target >= num_tetrahedra or done[target][target_side]:
+                            raise ValueError('Gluing does not match an unglued side.')
+                        
+                        component[tetrahedron][side] = (offset + target, gluing)
+                        component[target][target_side] = (offset + tetrahedron, inverse[gluing])
+                        done[target][target_side] = True
+                
+                if num_used != num_tetrahedra:
+                    raise ValueError('Unused tetrahedra. String does not correspond to a isomorphism signature.')
+                gluings.extend(component)
+        except (IndexError, StopIteration) as err:
+            raise ValueError('String does not correspond to a isomorphism signature.') from err
+        
+        # Orient the tetrahedra so that every gluing is odd.
+        reverse = [None] * len(gluings)
+        for root in range(len(gluings)):
+            if reverse[root] is not None: continue
+            reverse[root] = False
+            stack = [root]
+            while stack:
+                source = stack.pop()
+                for gluing in gluings[source]:
+                    if gluing is not None:
+                        target, perm = gluing
+                        target_reverse = reverse[source] != even[perm]
+                        if reverse[target] is None:
+                            reverse[target] = target_reverse
+                            stack.append(target)
+                        elif reverse[target] != target_reverse:
+                            raise flipper.AssumptionError('Triangulation is not orientable.')
+        
+        # We reverse a tetrahedron by swapping its vertices 0 and 1.
+        swap = flipper.kernel.permutation.S4_INDEX[(1, 0, 2, 3)]
+        triangulation3 = cls(len(gluings))
+        for source, source_gluings in enumerate(gluings):
+            for side in range(4):
+                if source_gluings[side] is not None:
+                    target, perm = source_gluings[side]
+                    new_side = S4[swap][side] if reverse[source] else side
+                    if reverse[source]: perm = compose[perm][swap]
+                    if reverse[target]: perm = compose[swap][perm]
+                    if triangulation3.gluing_targets[4 * source + new_side] < 0:
+                        triangulation3.glue(source, new_side, target, perm)
+        
+        return triangulation3
+    
     def __repr__(self):
         return str(self)
     def __str__(self):
@@ -127,29 +490,123 @@ class Triangulation3:
     def __iter__(self):
         return iter(self.tetrahedra)
     
-    def clear_temp_peripheral_structure(self):
-        ''' Remove all TEMP peripheral curves. '''
+    def create_tetrahedron(self):
+        ''' Return a new, unglued tetrahedron which has been added to this triangulation. '''
+        
+        tetrahedron = Tetrahedron(self.num_tetrahedra, self)
+        self.tetrahedra.append(tetrahedron)
+        self.num_tetrahedra += 1
+        self.gluing_targets.extend([-1] * 4)
+        self.gluing_perms.extend([-1] * 4)
+        self.edge_veerings.extend([VEERING_CODES[VEERING_UNKNOWN]] * 6)
+        self.corner_cusps.extend([-1] * 4)
+        return tetrahedron
+    
+    def peripheral_array(self):
+        ''' Return the NumPy array of peripheral curves of this triangulation, allocating it if needed.
+        
+        Entry [label][type][side][other] is the number of times that the peripheral
+        curve of the given type enters the corner (label, side) through its other side.
+        This array is reallocated when new tetrahedra are created. '''
+        
+        # This is slow to import so we only do so when needed.
+        import numpy as np  # pylint: disable=import-outside-toplevel
         
-        for tetrahedron in self:
-            tetrahedron.peripheral_curves[TEMPS] = [[0, 0, 0, 0] for _ in range(4)]
+        if self.peripheral_curves is None:
+            self.peripheral_curves = np.zeros((self.num_tetrahedra, len(PERIPHERAL_TYPES), 4, 4), dtype=np.int64)
+        elif len(self.peripheral_curves) < self.num_tetrahedra:
+            extra = np.zeros((self.num_tetrahedra - len(self.peripheral_curves), len(PERIPHERAL_TYPES), 4, 4), dtype=np.int64)
+            self.peripheral_curves = np.concatenate([self.peripheral_curves, extra])
+        
+        return self.peripheral_curves
+    
+    def glue(self, label, side, target, perm):
+        ''' Glue the given side of tetrahedron label to tetrahedron target via the permutation with code perm.
+        
+        This is the array level version of Tetrahedron.glue(). '''
+        
+        corner = 4 * label + side
+        permutation = flipper.kernel.permutation.S4[perm]
+        if self.gluing_targets[corner] < 0:
+            target_corner = 4 * target + permutation[side]
+            assert self.gluing_targets[target_corner] < 0
+            assert not flipper.kernel.permutation.S4_EVEN[perm]
+            
+            self.gluing_targets[corner], self.gluing_perms[corner] = target, perm
+            self.gluing_targets[target_corner], self.gluing_perms[target_corner] = label, flipper.kernel.permutation.S4_INVERSE[perm]
+            
+            # Move across the edge veerings too, is possible.
+            unknown = VEERING_CODES[VEERING_UNKNOWN]
+            for a, b in combinations(VERTICES_MEETING[side], 2):
+                mine, his = 6 * label + EDGE_INDEX[(a, b)], 6 * target + EDGE_INDEX[(permutation[a], permutation[b])]
+                if self.edge_veerings[mine] == unknown and self.edge_veerings[his] != unknown:
+                    self.edge_veerings[mine] = self.edge_veerings[his]
+                elif self.edge_veerings[mine] != unknown and self.edge_veerings[his] == unknown:
+                    self.edge_veerings[his] = self.edge_veerings[mine]
+        else:
+            assert (target, perm) == (self.gluing_targets[corner], self.gluing_perms[corner])
+    
+    def clear_temp_peripheral_structure(self, cusp=None):
+        ''' Remove all TEMP peripheral curves.
+        
+        If given, only the TEMP peripheral curves on the corners of cusp are removed. '''
+        
+        peripheral_curves = self.peripheral_array()
+        if cusp is None:
+            peripheral_curves[:, TEMPS] = 0
+        else:
+            for tetrahedron, side in cusp:
+                peripheral_curves[tetrahedron.index, TEMPS, side] = 0
+    
+    def iso_sig(self):
+        ''' Return the isomorphism signature of this triangulation as described by Ben Burton.
+        
+        This is a string such that two triangulations have the same signature
+        if and only if they are combinatorially isomorphic, allowing orientation
+        reversing isomorphisms. It matches the signatures produced by Regina and by
+        SnapPy's Manifold.triangulation_isosig(decorated=False), so it can be used
+        to compare triangulations without SnapPy. '''
+        
+        gluings = [[None if self.gluing_targets[corner] < 0 else (self.gluing_targets[corner], self.gluing_perms[corner]) for corner in range(4 * label, 4 * label + 4)] for label in range(self.num_tetrahedra)]
+        
+        # Find the components.
+        components = []
+        seen = [False] * self.num_tetrahedra
+        for root in range(self.num_tetrahedra):
+            if seen[root]: continue
+            seen[root] = True
+            component, stack = [root], [root]
+            while stack:
+                source = stack.pop()
+                for gluing in gluings[source]:
+                    if gluing is not None and not seen[gluing[0]]:
+                        seen[gluing[0]] = True
+                        component.append(gluing[0])
+                        stack.append(gluing[0])
+            components.append(component)
+        
+        if not components:
+            return SIG_CHARS[0]
+        
+        return ''.join(sorted(_component_iso_sig(gluings, component) for component in components))
     
     def is_closed(self):
         ''' Return if this triangulation is closed. '''
         
-        return all(tetrahedron.glued_to[side] is not None for tetrahedron in self for side in range(4))
+        return -1 not in self.gluing_targets
     
     def is_veering(self):
         ''' Return if this triangulation is veering. '''
         
         # Hmmm, this only checks the local condition. This test appears to be
         # assuming that there are no edges labelled VEERING_UNKNOWN.
-        for tetrahedron in self:
-            for side in range(4):
-                if tetrahedron.glued_to[side] is not None:
-                    target, permutation = tetrahedron.glued_to[side]
-                    for a, b in combinations(VERTICES_MEETING[side], 2):
-                        if tetrahedron.get_edge_label(a, b) != target.get_edge_label(permutation(a), permutation(b)):
-                            return False
+        for corner, target in enumerate(self.gluing_targets):
+            if target >= 0:
+                label, side = divmod(corner, 4)
+                permutation = flipper.kernel.permutation.S4[self.gluing_perms[corner]]
+                for a, b in combinations(VERTICES_MEETING[side], 2):
+                    if self.edge_veerings[6 * label + EDGE_INDEX[(a, b)]] != self.edge_veerings[6 * target + EDGE_INDEX[(permutation[a], permutation[b])]]:
+                        return False
         
         return True
     
@@ -160,12 +617,21 @@ class Triangulation3:
         for tetrahedron in self.tetrahedra:
             for side in range(4):
                 for other in VERTICES_MEETING[side]:
-                    neighbour_tetrahedron, permutation = tetrahedron.glued_to[other]
-                    neighbour_side, neighbour_other = permutation(side), permutation(other)
-                    cusp_pairing[(tetrahedron, side, other)] = (neighbour_tetrahedron, neighbour_side, neighbour_other)
+                    neighbour, neighbour_side, neighbour_other = self.cusp_neighbour(tetrahedron.index, side, other)
+                    cusp_pairing[(tetrahedron, side, other)] = (self.tetrahedra[neighbour], neighbour_side, neighbour_other)
         
         return cusp_pairing
     
+    def cusp_neighbour(self, label, side, other):
+        ''' Return the (label, side, other) triple of the peripheral triangle on the other side of the given one.
+        
+        That is, the peripheral triangle at vertex side of tetrahedron label is glued
+        along its edge in face other to the returned peripheral triangle. '''
+        
+        corner = 4 * label + other
+        permutation = flipper.kernel.permutation.S4[self.gluing_perms[corner]]
+        return (self.gluing_targets[corner], permutation[side], permutation[other])
+    
     def assign_cusp_indices(self):
         ''' Assign the tetrahedra in this triangulation their cusp indices and return the list of corners in the same cusp.
         
@@ -173,15 +639,35 @@ class Triangulation3:
         
         assert self.is_closed()
         
-        cusp_pairing = self.cusp_identification_map()
-        
-        G = nx.Graph(((tetra, side), (neighbour_tetra, neighbour_side)) for (tetra, side, _), (neighbour_tetra, neighbour_side, _) in cusp_pairing.items())
-        self.cusps = [list(component) for component in nx.algorithms.connected_components(G)]
-        
-        # Then iterate through each one assigning cusp indices.
-        for index, vertex_class in enumerate(self.cusps):
-            for tetrahedron, side in vertex_class:
-                tetrahedron.cusp_indices[side] = index
+        # We merge corners whose peripheral triangles are glued together using union--find.
+        parent = list(range(4 * self.num_tetrahedra))
+        
+        def find(corner):
+            while parent[corner] != corner:
+                parent[corner] = parent[parent[corner]]  # Path halving.
+                corner = parent[corner]
+            return corner
+        
+        for corner, target in enumerate(self.gluing_targets):
+            # Glue each corner of this face to the corresponding corner of the face it is glued to.
+            permutation = flipper.kernel.permutation.S4[self.gluing_perms[corner]]
+            label, other = divmod(corner, 4)
+            for side in VERTICES_MEETING[other]:
+                root_a, root_b = find(4 * label + side), find(4 * target + permutation[side])
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+        
+        # Then number the cusps in order of their first corner and assign cusp indices.
+        cusp_of_root = dict()
+        self.cusps = []
+        for corner in range(4 * self.num_tetrahedra):
+            root = find(corner)
+            if root not in cusp_of_root:
+                cusp_of_root[root] = len(self.cusps)
+                self.cusps.append([])
+            index = cusp_of_root[root]
+            self.corner_cusps[corner] = index
+            self.cusps[index].append((self.tetrahedra[corner // 4], corner % 4))
         
         self.num_cusps = len(self.cusps)
         
@@ -202,32 +688,36 @@ class Triangulation3:
         
         has intersection <A, B> := +1. '''
         
-        # This is the number of strands flowing from A to B. It is negative if they go in the opposite direction.
-        flow = lambda A, B: 0 if (A < 0) == (B < 0) else (A if (A < 0) != (A < -B) else -B)
-        
-        if cusp is None: cusp = list(product(self.tetrahedra, range(4)))
+        # This is slow to import so we only do so when needed.
+        import numpy as np  # pylint: disable=import-outside-toplevel
         
-        intersection_number = 0
-        for tetrahedron, side in cusp:
-            periph_a = tetrahedron.peripheral_curves[peripheral_type_a]
-            periph_b = tetrahedron.peripheral_curves[peripheral_type_b]
-            
-            # Count intersection numbers along edges.
-            for other in VERTICES_MEETING[side]:
-                # Only count crossings where periph_a is entering to avoid double counting.
-                if periph_a[side][other] > 0:
-                    intersection_number -= periph_a[side][other] * periph_b[side][other]
-            
-            # and then within each face.
-            for other in VERTICES_MEETING[side]:
-                left = EXIT_CUSP_LEFT[(side, other)]
-                right = EXIT_CUSP_RIGHT[(side, other)]
-                
-                # Even though this looks weird it is the correct pattern.
-                intersection_number += flow(periph_a[side][other], periph_a[side][left]) * flow(periph_b[side][other], periph_b[side][left])
-                intersection_number += flow(periph_a[side][other], periph_a[side][right]) * flow(periph_b[side][other], periph_b[side][left])
+        # This is the number of strands flowing from A to B. It is negative if they go in the opposite direction.
+        flow = lambda A, B: np.where((A < 0) == (B < 0), 0, np.where((A < 0) != (A < -B), A, -B))
         
-        return intersection_number
+        if cusp is None:
+            labels, sides = np.repeat(np.arange(self.num_tetrahedra), 4), np.tile(np.arange(4), self.num_tetrahedra)
+        else:
+            labels, sides = np.array([tetrahedron.index for tetrahedron, _ in cusp], dtype=np.intp), np.array([side for _, side in cusp], dtype=np.intp)
+        
+        # Row i of these is the peripheral curve in the corner (labels[i], sides[i]), indexed by other.
+        # As peripheral curves never use the side == other entry, which is always zero, we can include it.
+        periph_a = self.peripheral_array()[labels, peripheral_type_a, sides]
+        periph_b = self.peripheral_array()[labels, peripheral_type_b, sides]
+        left = np.array([[EXIT_CUSP_LEFT.get((side, other), side) for other in range(4)] for side in range(4)], dtype=np.intp)[sides]
+        right = np.array([[EXIT_CUSP_RIGHT.get((side, other), side) for other in range(4)] for side in range(4)], dtype=np.intp)[sides]
+        periph_a_left, periph_a_right = np.take_along_axis(periph_a, left, axis=1), np.take_along_axis(periph_a, right, axis=1)
+        periph_b_left = np.take_along_axis(periph_b, left, axis=1)
+        
+        # Count intersection numbers along edges.
+        # Only count crossings where periph_a is entering to avoid double counting.
+        intersection_number = -np.sum(np.where(periph_a > 0, periph_a * periph_b, 0))
+        
+        # and then within each face.
+        # Even though this looks weird it is the correct pattern.
+        intersection_number += np.sum(flow(periph_a, periph_a_left) * flow(periph_b, periph_b_left))
+        intersection_number += np.sum(flow(periph_a, periph_a_right) * flow(periph_b, periph_b_left))
+        
+        return int(intersection_number)
     
     def install_peripheral_curves(self):
         ''' Assign a longitude and meridian to each cusp.
@@ -236,14 +726,11 @@ class Triangulation3:
         
         # Install the cusp indices.
         self.assign_cusp_indices()
-        cusp_pairing = self.cusp_identification_map()
+        peripheral_curves = self.peripheral_array()
         
         # Blank out the longitudes and meridians.
-        for peripheral_type in [LONGITUDES, MERIDIANS]:
-            for tetrahedron in self.tetrahedra:
-                for side in range(4):
-                    for other in range(4):
-                        tetrahedron.peripheral_curves[peripheral_type][side][other] = 0
+        peripheral_curves[:, LONGITUDES] = 0
+        peripheral_curves[:, MERIDIANS] = 0
         
         # Install a longitude and meridian on each cusp one at a time.
         for cusp in self.cusps:
@@ -252,13 +739,13 @@ class Triangulation3:
             edge_label_map = dict()
             for tetrahedron, side in cusp:
                 for other in VERTICES_MEETING[side]:
-                    key = (tetrahedron, side, other)
+                    key = (tetrahedron.index, side, other)
                     if key not in edge_label_map:
                         edge_label_map[key] = label
-                        edge_label_map[cusp_pairing[key]] = ~label
+                        edge_label_map[self.cusp_neighbour(*key)] = ~label
                         label += 1
             
-            edge_labels = [[edge_label_map[(tetrahedron, side, other)] for other in VERTICES_MEETING[side]] for tetrahedron, side in cusp]
+            edge_labels = [[edge_label_map[(tetrahedron.index, side, other)] for other in VERTICES_MEETING[side]] for tetrahedron, side in cusp]
             T = flipper.kernel.create_triangulation(edge_labels)
             
             if T.genus != 1:
@@ -273,18 +760,17 @@ class Triangulation3:
                 # Find a starting point.
                 for tetrahedron, side in cusp:
                     for x in VERTICES_MEETING[side]:
-                        if edge_label_map[(tetrahedron, side, x)] == last:
-                            current_tetrahedron, current_side, arrive = tetrahedron, side, x
+                        if edge_label_map[(tetrahedron.index, side, x)] == last:
+                            current, current_side, arrive = tetrahedron.index, side, x
                             break
                 
                 for other in homology_basis_paths[peripheral_type]:
                     for a in VERTICES_MEETING[current_side]:
-                        if edge_label_map[(current_tetrahedron, current_side, a)] == ~other:
+                        if edge_label_map[(current, current_side, a)] == ~other:
                             leave = a
-                            current_tetrahedron.peripheral_curves[peripheral_type][current_side][arrive] += 1
-                            current_tetrahedron.peripheral_curves[peripheral_type][current_side][leave] -= 1
-                            next_tetrahedron, perm = current_tetrahedron.glued_to[leave]
-                            current_tetrahedron, current_side, arrive = next_tetrahedron, perm(current_side), perm(leave)
+                            peripheral_curves[current, peripheral_type, current_side, arrive] += 1
+                            peripheral_curves[current, peripheral_type, current_side, leave] -= 1
+                            current, current_side, arrive = self.cusp_neighbour(current, current_side, leave)
                             break
             
             # Compute the algebraic intersection number between the longitude and meridian we just installed.
@@ -297,16 +783,17 @@ class Triangulation3:
             # If the intersection number is -1 then we need to reverse the direction of one of them (we choose the meridian).
             if intersection_number < 0:
                 for tetrahedron, side in cusp:
-                    for other in VERTICES_MEETING[side]:
-                        tetrahedron.peripheral_curves[MERIDIANS][side][other] = -tetrahedron.peripheral_curves[MERIDIANS][side][other]
+                    peripheral_curves[tetrahedron.index, MERIDIANS, side] *= -1
     
-    def slope(self):
+    def slope(self, cusp=None):
         ''' Return the slope of the peripheral curve in TEMPS relative to the set meridians and longitudes.
         
+        If given, only the corners of cusp are considered.
+        
         Assumes that the meridian and longitude on this cusp have been set. '''
         
-        longitude_intersection = self.intersection_number(LONGITUDES, TEMPS)
-        meridian_intersection = self.intersection_number(MERIDIANS, TEMPS)
+        longitude_intersection = self.intersection_number(LONGITUDES, TEMPS, cusp)
+        meridian_intersection = self.intersection_number(MERIDIANS, TEMPS, cusp)
         
         # So the number of copies of the longitude and the meridian that we need to represent the path is:
         longitude_copies = -meridian_intersection
@@ -1,8 +1,10 @@
 
 ''' A module of useful, generic functions; including input and output formatting. '''
 
+from collections.abc import MutableMapping
 from string import ascii_lowercase, digits, ascii_letters, punctuation
 import itertools
+import os
 
 import flipper
 
@@ -59,3 +61,173 @@ def encode_binary(sequence):
     step = 6  # 2**step <= len(VISABLE_CHARACTERS)
     return ''.join(VISIBLE_CHARACTERS[int(''.join(str(x) for x in sequence[i:i+step]), base=2)] for i in range(0, len(sequence), step))
 
+
+class IndexedHeap:
+    ''' This represents a priority queue of distinct items, each with a key.
+    
+    Unlike heapq, the key of an item already in the queue can be increased
+    or decreased using self[item] = key in O(log(n)) time. Items are popped
+    in order of (key, item) so ties are broken by the items themselves. '''
+    def __init__(self, pairs=None):
+        self.heap = []  # A binary heap of (key, item) pairs.
+        self.position = dict()  # Mapping each item to its position in self.heap.
+        for key, item in pairs if pairs is not None else []:
+            self.position[item] = len(self.heap)
+            self.heap.append((key, item))
+        for index in reversed(range(len(self.heap) // 2)):
+            self._sift_down(index)
+    
+    def __repr__(self):
+        return str(self)
+    def __str__(self):
+        return str(sorted(self.heap))
+    def __len__(self):
+        return len(self.heap)
+    def __contains__(self, item):
+        return item in self.position
+    def __getitem__(self, item):
+        return self.heap[self.position[item]][0]
+    def __setitem__(self, item, key):
+        if item in self.position:
+            index = self.position[item]
+            old_key = self.heap[index][0]
+            self.heap[index] = (key, item)
+            if (key, item) < (old_key, item):
+                self._sift_up(index)
+            else:
+                self._sift_down(index)
+        else:
+            self.position[item] = len(self.heap)
+            self.heap.append((key, item))
+            self._sift_up(len(self.heap) - 1)
+    def __delitem__(self, item):
+        index = self.position.pop(item)
+        last = self.heap.pop()
+        if index < len(self.heap):
+            self.heap[index] = last
+            self.position[last[1]] = index
+            self._sift_up(index)
+            self._sift_down(self.position[last[1]])
+    
+    def _swap(self, i, j):
+        ''' Swap the entries in positions i and j of the heap. '''
+        
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.position[self.heap[i][1]] = i
+        self.position[self.heap[j][1]] = j
+    
+    def _sift_up(self, index):
+        ''' Move the entry at index towards the root until the heap property holds. '''
+        
+        while index > 0:
+            parent = (index - 1) // 2
+            if self.heap[index] < self.heap[parent]:
+                self._swap(index, parent)
+                index = parent
+            else:
+                break
+    
+    def _sift_down(self, index):
+        ''' Move the entry at index towards the leaves until the heap property holds. '''
+        
+        while True:
+            smallest = index
+            for child in [2 * index + 1, 2 * index + 2]:
+                if child < len(self.heap) and self.heap[child] < self.heap[smallest]:
+                    smallest = child
+            if smallest == index:
+                break
+            self._swap(index, smallest)
+            index = smallest
+    
+    def peek(self):
+        ''' Return the (key, item) pair with the smallest key. '''
+        
+        if not self.heap:
+            raise IndexError('peek from an empty heap')
+        
+        return self.heap[0]
+    
+    def pop(self):
+        ''' Remove and return the (key, item) pair with the smallest key. '''
+        
+        key, item = self.peek()
+        del self[item]
+        return key, item
+
+class Thunk:
+    ''' This represents a value which is only computed, by calling function(), the first time that it is needed. '''
+    def __init__(self, function):
+        self.function = function
+        self.resolved = False
+        self.value = None
+    
+    def __repr__(self):
+        return str(self)
+    def __str__(self):
+        return f'Thunk({self.value!r})' if self.resolved else 'Thunk(<unresolved>)'
+    
+    def __call__(self):
+        if not self.resolved:
+            self.value = self.function()
+            self.resolved = True
+            self.function = None  # So that anything the function refers to can be freed.
+        
+        return self.value
+
+class LazyDict(MutableMapping):
+    ''' This represents a dictionary in which some values are only computed when they are first looked up.
+    
+    The values of the keys of thunks are given by calling the corresponding
+    function, with no arguments, the first time that they are looked up.
+    Copies share these Thunks and so each value is only ever computed once.
+    For pickling, these functions should be functools.partial objects. '''
+    def __init__(self, values=None, thunks=None):
+        self.data = dict(values) if values is not None else dict()
+        for key, function in (thunks.items() if thunks is not None else []):
+            self.data[key] = Thunk(function)
+    
+    def __repr__(self):
+        return str(self)
+    def __str__(self):
+        return 'LazyDict({%s})' % ', '.join(f'{key!r}: {value!r}' for key, value in self.data.items())
+    def __getitem__(self, key):
+        value = self.data[key]
+        return value() if isinstance(value, Thunk) else value
+    def __setitem__(self, key, value):
+        self.data[key] = value
+    def __delitem__(self, key):
+        del self.data[key]
+    def __iter__(self):
+        return iter(self.data)
+    def __len__(self):
+        return len(self.data)
+    def __contains__(self, key):
+        return key in self.data
+    
+    def copy(self):
+        ''' Return a shallow copy of this LazyDict which shares its Thunks. '''
+        
+        copy = LazyDict()
+        copy.data = dict(self.data)
+        return copy
+    
+    def is_resolved(self, key):
+        ''' Return if the value of the given key has already been computed. '''
+        
+        value = self.data[key]
+        return not isinstance(value, Thunk) or value.resolved
+    
+    def raw_items(self):
+        ''' Return an iterator over the (key, value) pairs of this dictionary without computing any values.
+        
+        The value of a key that was given as a thunk is its Thunk object. '''
+        
+        return iter(self.data.items())
+
+def cache_directory():
+    ''' Return the directory in which flipper may store files to speed up later sessions.
+    
+    This is $FLIPPER_CACHE if it is set and ~/.cache/flipper otherwise. '''
+    
+    return os.environ.get('FLIPPER_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'flipper'))
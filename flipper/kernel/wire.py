@@ -0,0 +1,354 @@
+
+''' A module for storing Triangulations, Laminations and Encodings in a compact binary format.
+
+Provides two classes: WireWriter and WireReader.
+
+There are also helper functions: dumps and loads.
+
+Unlike a pickle, a record stores an Encoding as its source triangulation
+together with the labels of its flips and isometries, written as
+variable length integers. Many records can be streamed to one file and
+each triangulation is only written the first time that it is used. A
+WireReader hands back WireRecords, which only rebuild their object, and
+so all of the intermediate triangulations of an Encoding, when it is
+asked for. '''
+
+from io import BytesIO
+
+import flipper
+
+MAGIC = b'FLW'
+VERSION = 1
+
+# The kinds of records. A DEFINITION record describes a triangulation that later records refer to by its index.
+TRIANGULATION, LAMINATION, ENCODING, DEFINITION = 0, 1, 2, 3
+KINDS = {TRIANGULATION: 'triangulation', LAMINATION: 'lamination', ENCODING: 'encoding'}
+
+# How each move of an Encoding is coded. A flip of edge_label is coded as 2 * zigzag(edge_label).
+ISOMETRY, IDENTITY = 1, 3
+
+def zigzag(n):
+    ''' Return the natural number coding the integer n, small integers get small codes. '''
+    
+    return 2 * n if n >= 0 else -2 * n - 1
+
+def unzigzag(n):
+    ''' Return the integer coded by the natural number n. '''
+    
+    return n // 2 if n % 2 == 0 else -(n + 1) // 2
+
+def write_varint(buffer, n):
+    ''' Append the natural number n to buffer, seven bits at a time. '''
+    
+    while n >= 0x80:
+        buffer.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buffer.append(n)
+
+def read_varint(data, position):
+    ''' Return the natural number starting at data[position] and the position after it. '''
+    
+    n = shift = 0
+    while True:
+        try:
+            byte = data[position]
+        except IndexError as err:
+            raise ValueError('Truncated record.') from err
+        position += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, position
+        shift += 7
+
+def write_integers(buffer, integers):
+    ''' Append the given integers, preceded by how many there are, to buffer. '''
+    
+    write_varint(buffer, len(integers))
+    for n in integers:
+        write_varint(buffer, zigzag(n))
+
+def read_integers(data, position):
+    ''' Return the list of integers written by write_integers starting at data[position] and the position after it. '''
+    
+    count, position = read_varint(data, position)
+    integers = []
+    for _ in range(count):
+        n, position = read_varint(data, position)
+        integers.append(unzigzag(n))
+    return integers, position
+
+def pack_triangulation(triangulation):
+    ''' Return the bytes describing the given labelled triangulation.
+    
+    This is triangulation.package() and so, unlike its iso_sig, it also
+    records the labels of the edges. '''
+    
+    buffer = bytearray()
+    write_integers(buffer, [label for triangle in triangulation for label in triangle.labels])
+    write_integers(buffer, [triangulation.vertex_lookup[label].label for triangle in triangulation for label in triangle.labels])
+    write_integers(buffer, [int(vertex.filled) for vertex in triangulation.vertices])
+    return bytes(buffer)
+
+def unpack_triangulation(data):
+    ''' Return the triangulation described by the given bytes. '''
+    
+    labels, position = read_integers(data, 0)
+    vertices, position = read_integers(data, position)
+    filled, position = read_integers(data, position)
+    
+    edge_labels = [labels[i:i+3] for i in range(0, len(labels), 3)]
+    vertex_labels = dict(zip(labels, vertices))
+    vertex_states = dict(enumerate(bool(state) for state in filled))
+    return flipper.kernel.create_triangulation(edge_labels, vertex_labels, vertex_states)
+
+class WireRecord:
+    ''' This represents an object read by a WireReader but not yet rebuilt.
+    
+    Its kind is one of 'triangulation', 'lamination' or 'encoding', and
+    self.value() rebuilds the object the first time that it is called. '''
+    def __init__(self, reader, kind, data):
+        self.reader = reader
+        self.kind = KINDS[kind]
+        self.data = data
+        self._value = None
+    
+    def __repr__(self):
+        return str(self)
+    def __str__(self):
+        return f'WireRecord of a {self.kind} using {len(self.data)} bytes'
+    
+    def triangulation(self):
+        ''' Return the (source) triangulation of the object of this record. '''
+        
+        index, _ = read_varint(self.data, 0)
+        return self.reader.triangulation(index)
+    
+    def value(self):
+        ''' Return the object of this record. '''
+        
+        if self._value is None:
+            self._value = self.reader.unpack(self.kind, self.data)
+        
+        return self._value
+
+class WireWriter:
+    ''' This writes a stream of Triangulations, Laminations and Encodings to file.
+    
+    The file must be opened for writing in binary mode. The header of the
+    stream is written when this is created and each triangulation is only
+    written the first time that an object on it is written. '''
+    def __init__(self, file):
+        self.file = file
+        self.triangulations = dict()  # Mapping the package of each triangulation written to its index.
+        self.file.write(MAGIC + bytes([VERSION]))
+    
+    def __enter__(self):
+        return self
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.flush()
+    
+    def _write_record(self, kind, data):
+        ''' Write a record of the given kind, preceded by its length, to self.file. '''
+        
+        buffer = bytearray([kind])
+        write_varint(buffer, len(data))
+        self.file.write(bytes(buffer) + data)
+    
+    def _triangulation_index(self, triangulation):
+        ''' Return the index of the given triangulation, writing it if it is new. '''
+        
+        data = pack_triangulation(triangulation)
+        if data not in self.triangulations:
+            self.triangulations[data] = len(self.triangulations)
+            self._write_record(DEFINITION, data)
+        
+        return self.triangulations[data]
+    
+    def pack(self, item):
+        ''' Return the kind and the bytes of the record describing item, writing any new triangulation it needs. '''
+        
+        buffer = bytearray()
+        if isinstance(item, flipper.kernel.Triangulation):
+            write_varint(buffer, self._triangulation_index(item))
+            return TRIANGULATION, bytes(buffer)
+        elif isinstance(item, flipper.kernel.Lamination):
+            if not all(isinstance(x, flipper.IntegerType) for x in item.geometric):
+                raise ValueError('Can only write integral laminations.')
+            
+            write_varint(buffer, self._triangulation_index(item.triangulation))
+            write_integers(buffer, item.geometric)
+            # If there is no map to get them from then the algebraic intersection numbers can be recomputed.
+            write_integers(buffer, [] if item._algebraic is None and item._pushforward is None else item.algebraic)
+            return LAMINATION, bytes(buffer)
+        elif isinstance(item, flipper.kernel.Encoding):
+            write_varint(buffer, self._triangulation_index(item.source_triangulation))
+            # The length of the name is preceded by whether there is one.
+            if 'name' in item._cache:
+                name = item._cache['name'].encode('utf-8')
+                write_varint(buffer, 1)
+                write_varint(buffer, len(name))
+                buffer.extend(name)
+            else:
+                write_varint(buffer, 0)
+            write_varint(buffer, len(item))
+            for move in reversed(item.sequence):  # In the order that they are applied.
+                if isinstance(move, flipper.kernel.EdgeFlip):
+                    write_varint(buffer, 2 * zigzag(move.edge_label))
+                elif isinstance(move, flipper.kernel.Isometry):
+                    if move.is_identity():
+                        write_varint(buffer, IDENTITY)
+                    else:
+                        write_varint(buffer, ISOMETRY)
+                        for i in move.source_triangulation.indices:
+                            write_varint(buffer, zigzag(move.label_map[i]))
+                else:
+                    raise ValueError(f'Cannot write {move.__class__.__name__} moves.')
+            return ENCODING, bytes(buffer)
+        else:
+            raise TypeError(f'Cannot write objects of type {type(item).__name__}.')
+    
+    def write(self, item):
+        ''' Write a record of the given Triangulation, Lamination or Encoding. '''
+        
+        kind, data = self.pack(item)
+        self._write_record(kind, data)
+
+class WireReader:
+    ''' This reads a stream of records written by a WireWriter from file.
+    
+    The file must be opened for reading in binary mode. Iterating through
+    this yields a WireRecord for each Triangulation, Lamination and Encoding
+    that was written, in the order that they were written.
+    
+    Raises a ValueError if the file was not written by a WireWriter or was
+    written using a newer version of this format. '''
+    def __init__(self, file):
+        self.file = file
+        self.triangulations = []  # The bytes, or once it is rebuilt the Triangulation, of each triangulation seen.
+        header = self.file.read(len(MAGIC) + 1)
+        if len(header) != len(MAGIC) + 1 or header[:len(MAGIC)] != MAGIC:
+            raise ValueError('Not a flipper wire format stream.')
+        if header[-1] > VERSION:
+            raise ValueError(f'Version {header[-1]} of the wire format is not supported.')
+        self.version = header[-1]
+    
+    def __iter__(self):
+        while True:
+            record = self._read_record()
+            if record is None:
+                return
+            kind, data = record
+            if kind == DEFINITION:
+                self.triangulations.append(data)
+            else:
+                yield WireRecord(self, kind, data)
+    
+    def _read_record(self):
+        ''' Return the next (kind, data) pair from self.file or None if there are no more. '''
+        
+        kind = self.file.read(1)
+        if not kind:
+            return None
+        
+        # Read the length one byte at a time, as it is a varint.
+        length_bytes = bytearray()
+        while True:
+            byte = self.file.read(1)
+            if not byte:
+                raise ValueError('Truncated record.')
+            length_bytes.extend(byte)
+            if byte[0] < 0x80:
+                break
+        length, _ = read_varint(length_bytes, 0)
+        data = self.file.read(length)
+        if len(data) != length:
+            raise ValueError('Truncated record.')
+        if kind[0] not in KINDS and kind[0] != DEFINITION:
+            raise ValueError(f'Unknown kind of record {kind[0]}.')
+        
+        return kind[0], data
+    
+    def triangulation(self, index):
+        ''' Return the triangulation with the given index, rebuilding it if needed. '''
+        
+        if not 0 <= index < len(self.triangulations):
+            raise ValueError(f'Record refers to unknown triangulation {index}.')
+        
+        if isinstance(self.triangulations[index], bytes):
+            self.triangulations[index] = unpack_triangulation(self.triangulations[index])
+        
+        return self.triangulations[index]
+    
+    def unpack(self, kind, data):
+        ''' Return the object described by the given record. '''
+        
+        index, position = read_varint(data, 0)
+        triangulation = self.triangulation(index)
+        if kind == 'triangulation':
+            return triangulation
+        elif kind == 'lamination':
+            geometric, position = read_integers(data, position)
+            algebraic, position = read_integers(data, position)
+            return flipper.kernel.Lamination(triangulation, geometric, algebraic if algebraic else None)
+        else:  # kind == 'encoding'.
+            has_name, position = read_varint(data, position)
+            cache = dict()  # An Encoding without a name.
+            if has_name:
+                length, position = read_varint(data, position)
+                cache = {'name': data[position:position+length].decode('utf-8')}
+                position += length
+            num_moves, position = read_varint(data, position)
+            if num_moves == 0:
+                encoding = triangulation.id_encoding()
+                encoding._cache = cache
+                return encoding
+            
+            # Build the moves directly, rather than via Triangulation.encode, since composing
+            # one move at a time copies the sequence each time and so is quadratic.
+            moves = []  # In the order that they are applied.
+            current = triangulation
+            for move_index in range(num_moves):
+                code, position = read_varint(data, position)
+                if code % 2 == 0:
+                    edge_label = unzigzag(code // 2)
+                    move = flipper.kernel.EdgeFlip(current, current.flip_edge(edge_label), edge_label)
+                elif code in (IDENTITY, ISOMETRY):
+                    label_map = dict((i, i) for i in current.labels)
+                    if code == ISOMETRY:
+                        for i in range(current.zeta):
+                            label, position = read_varint(data, position)
+                            label_map[i] = unzigzag(label)
+                            label_map[~i] = ~label_map[i]
+                    target = current.relabel_edges(label_map) if code == ISOMETRY else current
+                    # As in create_encoding, a final isometry onto a copy of the triangulation is
+                    # taken to be one onto the triangulation itself so vertex labels agree.
+                    if move_index == num_moves - 1 and target is not triangulation and target == triangulation:
+                        move = current.find_isometry(triangulation, label_map)
+                    else:
+                        move = flipper.kernel.Isometry(current, target, label_map)
+                else:
+                    raise ValueError(f'Unknown move code {code}.')
+                moves.append(move)
+                current = move.target_triangulation
+            
+            return flipper.kernel.Encoding(moves[::-1], _cache=cache)
+
+
+##############################################
+# Some helper functions for single objects.
+
+def dumps(item):
+    ''' Return the bytes of a stream containing just the given Triangulation, Lamination or Encoding. '''
+    
+    file = BytesIO()
+    WireWriter(file).write(item)
+    return file.getvalue()
+
+def loads(data):
+    ''' Return the Triangulation, Lamination or Encoding described by the bytes of a stream containing just it. '''
+    
+    records = list(WireReader(BytesIO(data)))
+    if len(records) != 1:
+        raise ValueError('Stream does not contain exactly one object.')
+    
+    return records[0].value()
@@ -1,13 +1,25 @@
 
 ''' Some standard example surfaces with mapping classes defined on them.
 Mainly used for running tests on. These can be accessed through
-the load(SURFACE) function. '''
+the load(SURFACE) function.
 
+Each example is only built the first time that it is loaded. A package
+of its triangulation, laminations and mapping classes is then held in
+memory and also written to flipper.kernel.utilities.cache_directory()
+so that later sessions can skip building it altogether. '''
+
+from functools import partial
+import os
+import pickle
 import re
 
 import flipper
 
 REGEX_IS_SPHERE_BRAID = re.compile(r'SB_(?P<num_strands>\d+)$')
+CACHE_VERSION = 1
+
+# The packages of the examples that have been loaded so far, indexed by surface.
+LOADED = dict()
 
 def example_0_4():
     T = flipper.create_triangulation([[0, 3, ~0], [1, 4, ~3], [~1, ~4, 5], [~2, ~5, 2]])
@@ -283,14 +295,8 @@ def example_braid_sphere(n):
     
     return flipper.kernel.EquippedTriangulation(T, laminations, mapping_classes)
 
-def load(surface):
-    ''' Return the requested example EquippedTriangulation.
-    
-    Available surfaces:
-        'S_0_4', 'S_1_1', 'S_1_1m', 'S_1_2', 'S_1_2p',
-        'S_2_1', 'S_2_1b', 'S_3_1', 'S_3_1b',
-        'E_12', 'E_24', 'E_36', and
-        'SB_n' where n is an integer >= 4. '''
+def example(surface):
+    ''' Return the requested example EquippedTriangulation, built from scratch. '''
     
     surfaces = {
         'S_0_4': example_0_4,
@@ -318,3 +324,77 @@ def load(surface):
     
     raise KeyError('Unknown surface: %s' % surface)
 
+def package(equipped_triangulation):
+    ''' Return a small amount of info that load can use to reconstruct the given EquippedTriangulation.
+    
+    Unlike a pickle of it, this does not depend on any classes of flipper. '''
+    
+    return (
+        equipped_triangulation.triangulation.package(),
+        [(name, lamination.geometric) for name, lamination in equipped_triangulation.laminations.items()],
+        [(name, h.package(), h._cache.get('name')) for name, h in equipped_triangulation.pos_mapping_classes.items()]
+        )
+
+def _cache_path(surface):
+    ''' Return where the package of the given surface is cached. '''
+    
+    return os.path.join(flipper.kernel.utilities.cache_directory(), f'load-{surface}.pickle')
+
+def get_package(surface):
+    ''' Return the package of the requested example, building it only if it is not already in memory or cached. '''
+    
+    surface = str(surface)
+    # The examples are defined in this file and are packaged by the kernel, so the cache is stale whenever either changes.
+    stat = os.stat(__file__)
+    stamp = (CACHE_VERSION, flipper.__version__, stat.st_mtime_ns, stat.st_size)
+    if surface in LOADED and LOADED[surface][0] == stamp:
+        return LOADED[surface][1]
+    
+    surface_package = None
+    cache_path = _cache_path(surface)
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            cached_stamp, cached_package = pickle.load(cache_file)
+        if cached_stamp == stamp:
+            surface_package = cached_package
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        pass  # There is no usable cached copy.
+    
+    if surface_package is None:
+        surface_package = package(example(surface))  # Raises a KeyError if surface is unknown.
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # Write to a temporary file first so that a concurrent load never sees half of a pickle.
+            temporary_path = f'{cache_path}.{os.getpid()}'
+            with open(temporary_path, 'wb') as cache_file:
+                pickle.dump((stamp, surface_package), cache_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, cache_path)
+        except OSError:
+            pass  # The cache directory is not writable, so we will just build the example again next session.
+    
+    LOADED[surface] = (stamp, surface_package)
+    return surface_package
+
+def load(surface):
+    ''' Return the requested example EquippedTriangulation.
+    
+    Available surfaces:
+        'S_0_4', 'S_1_1', 'S_1_1m', 'S_1_2', 'S_1_2p',
+        'S_2_1', 'S_2_1b', 'S_3_1', 'S_3_1b', 'S_4_1', 'S_5_1',
+        'E_12', 'E_24', 'E_36', and
+        'SB_n' where n is an integer >= 4.
+    
+    Each call returns a new EquippedTriangulation, so it is safe to modify.
+    Its mapping classes are only built when they are first used. '''
+    
+    triangulation_package, laminations, mapping_classes = get_package(surface)
+    
+    T = flipper.create_triangulation(*triangulation_package)
+    return flipper.kernel.EquippedTriangulation(
+        T,
+        dict((name, flipper.kernel.Lamination(T, geometric)) for name, geometric in laminations),
+        flipper.kernel.utilities.LazyDict(thunks=dict(
+            (name, partial(flipper.kernel.encoding.create_encoding, T, h_package, {'name': h_name} if h_name is not None else None))
+            for name, h_package, h_name in mapping_classes
+            ))
+        )
@@ -0,0 +1,76 @@
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import flipper
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results.db')
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+    
+    def test_persistence(self):
+        with flipper.kernel.ResultCache(self.path) as cache:
+            h = flipper.load('S_1_1').mapping_class('aB')
+            expected = (h.nielsen_thurston_type(), h.order(), h.dilatation(), h.canonical().package())
+            self.assertTrue(len(cache) > 0)
+        cache.close()
+        
+        # A new session on a freshly built mapping class should find the same answers.
+        with flipper.kernel.ResultCache(self.path) as cache:
+            h = flipper.load('S_1_1').mapping_class('aB')
+            self.assertEqual((h.nielsen_thurston_type(), h.order(), h.dilatation(), h.canonical().package()), expected)
+            self.assertIn('minpoly', cache.lookup(cache.key(h), 'pml_fixedpoint'))
+        cache.close()
+    
+    def test_consulted(self):
+        S = flipper.load('S_1_1')
+        with flipper.kernel.ResultCache(self.path) as cache:
+            h = S.mapping_class('ab')
+            cache.store(cache.key(h), 'order', 7)  # Deliberately wrong so that we can tell it was used.
+            self.assertEqual(h.order(), 7)
+        cache.close()
+        
+        self.assertEqual(S.mapping_class('ab').order(), 6)
+    
+    def test_keys(self):
+        S = flipper.load('S_1_1')
+        key = flipper.kernel.ResultCache.key
+        self.assertEqual(key(S.mapping_class('ababab')), key(S.mapping_class('bababa')))  # Both are the hyperelliptic involution.
+        self.assertNotEqual(key(S.mapping_class('aB')), key(S.mapping_class('bA')))
+
+
+class TestMemoryCache(unittest.TestCase):
+    def test_shared(self):
+        S = flipper.load('S_1_1')
+        with flipper.kernel.MemoryCache() as cache:
+            h = S.mapping_class('aB')
+            expected = (h.nielsen_thurston_type(), h.dilatation(), h.canonical().package(), h.stratum(), h.bundle().triangulation3.iso_sig())
+            # bA is conjugate but a different mapping class so it has its own results.
+            S.mapping_class('bA').dilatation()
+            hits = cache.hits
+            
+            # aBbB is a different word for the same mapping class so it should not compute anything.
+            g = S.mapping_class('aBbB')
+            self.assertEqual(cache.key(g), cache.key(h))
+            self.assertEqual((g.nielsen_thurston_type(), g.dilatation(), g.canonical().package(), g.stratum(), g.bundle().triangulation3.iso_sig()), expected)
+            self.assertEqual(cache.hits, hits + 5)
+        
+        self.assertNotIn(cache, flipper.kernel.cache.active_caches())
+    
+    def test_eviction(self):
+        cache = flipper.kernel.MemoryCache(max_size=150)
+        cache.store('x', 'a', 'a' * 40)
+        cache.store('y', 'a', 'b' * 40)
+        cache.lookup('x', 'a')  # Now y is the least recently used.
+        cache.store('z', 'a', 'c' * 40)
+        self.assertEqual(len(cache), 2)
+        self.assertTrue(cache.size <= cache.max_size)
+        self.assertEqual(cache.lookup('x', 'a'), 'a' * 40)
+        with self.assertRaises(KeyError):
+            cache.lookup('y', 'a')
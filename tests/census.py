@@ -0,0 +1,27 @@
+
+import unittest
+
+import flipper
+
+class TestCensus(unittest.TestCase):
+    def test_lookups(self):
+        census = flipper.get_census('CHW')
+        self.assertEqual(len(list(census)), len(census))
+        
+        row = census.by_manifold('m004')
+        self.assertEqual((row.surface, row.monodromy), ('S_1_1', 'aB'))
+        self.assertIn(row, census.by_monodromy('aB', surface='S_1_1'))
+        self.assertTrue(all(row.surface == 'S_1_2' for row in census.by_surface('S_1_2')))
+        
+        dilatations = [row.dilatation for row in census.by_dilatation(2, 3)]
+        self.assertEqual(dilatations, sorted(dilatations))
+        self.assertTrue(all(2 <= dilatation <= 3 for dilatation in dilatations))
+        self.assertEqual(len(census.by_dilatation()), len(census))
+    
+    def test_dataframe(self):
+        census = flipper.get_census('knots')
+        dataframe = flipper.census('knots')
+        self.assertEqual(list(dataframe.columns), census.columns)
+        self.assertEqual(len(dataframe), len(census))
+        self.assertEqual(list(dataframe.monodromy), [row.monodromy for row in census])
+
@@ -1,4 +1,5 @@
 
+import pickle
 import unittest
 
 import flipper
@@ -82,4 +83,102 @@ class TestEncoding(unittest.TestCase):
         for surface, word, nt_type in examples:
             h = flipper.load(surface).mapping_class(word)
             self.assertEqual(h.canonical(), h.canonical().canonical())
-
+    
+    def test_homology_matrix(self):
+        S = flipper.load('S_1_1')
+        a, b = S.mapping_class('a'), S.mapping_class('b')
+        A, B = a.homology_matrix(), b.homology_matrix()
+        self.assertEqual((a * b).homology_matrix(), A * B)
+        self.assertEqual(S.mapping_class('abababababab').homology_matrix(), flipper.kernel.id_matrix(2))
+        self.assertEqual(S.mapping_class('ababab').homology_matrix(), -flipper.kernel.id_matrix(2))
+        self.assertTrue(S.mapping_class('aba').is_homologous_to(S.mapping_class('bab')))
+        self.assertFalse(a.is_homologous_to(b))
+    
+    def test_homology_matrix_rebuilt(self):
+        # These maps swap punctures, so their rebuilt copies end at triangulations with differently labelled vertices.
+        for surface, word in [('S_1_2', 'X'), ('S_1_2', 'XaBc'), ('SB_4', 's_0s_1s_2')]:
+            h = flipper.load(surface).mapping_class(word)
+            for g in [pickle.loads(pickle.dumps(h)), flipper.kernel.wire.loads(flipper.kernel.wire.dumps(h))]:
+                self.assertEqual(g, h)
+                self.assertEqual(g.homology_matrix(), h.homology_matrix())
+    
+    def test_quick_invariants(self):
+        S = flipper.load('S_1_2')
+        h, g = S.mapping_class('aCB'), S.mapping_class('bc')
+        self.assertEqual(h.quick_invariants(), (g * h * g.inverse()).quick_invariants())
+        self.assertNotEqual(S.mapping_class('aB').quick_invariants(), S.mapping_class('ab').quick_invariants())
+        self.assertFalse(S.mapping_class('aB').is_conjugate_to(S.mapping_class('ab')))
+        
+        # A rebuilt copy of a puncture swapping map must not be rejected by its invariants.
+        h = S.mapping_class('XaBc')
+        self.assertEqual(h.quick_invariants(), pickle.loads(pickle.dumps(h)).quick_invariants())
+        self.assertTrue(h.is_conjugate_to(pickle.loads(pickle.dumps(h))))
+    
+    def test_order(self):
+        examples = [
+            ('S_1_1', 'a', 0),
+            ('S_1_1', 'ab', 6),
+            ('S_1_1', 'aba', 4),
+            ('S_1_1', 'ababab', 2),
+            ('S_1_1', 'aB', 0),
+            ('S_2_1', 'abcd', 10),
+            ('S_2_1', 'abcde', 8),
+            ('SB_4', 's_0s_1s_2', 2),
+            ]
+        
+        for surface, word, order in examples:
+            h = flipper.load(surface).mapping_class(word)
+            self.assertEqual(h.order(), order)
+            self.assertEqual(h.is_periodic(), order > 0)
+    
+    def test_equality(self):
+        S = flipper.load('S_2_1')
+        h, g = S.mapping_class('abc'), S.mapping_class('bcd')
+        self.assertEqual(S.mapping_class('aba'), S.mapping_class('bab'))
+        self.assertEqual(hash(S.mapping_class('aba')), hash(S.mapping_class('bab')))
+        self.assertEqual(h * g, S.mapping_class('abcbcd'))
+        self.assertNotEqual(h, g)
+        self.assertNotEqual(S.mapping_class('ab'), S.mapping_class('ba'))
+        self.assertTrue((h * h.inverse()).is_identity())
+        self.assertFalse(h.is_identity())
+        self.assertEqual(len(set([h, g, S.mapping_class('abcbB'), S.mapping_class('bcdDd')])), 2)
+    
+    def test_simplify(self):
+        S = flipper.load('S_2_1')
+        for word in ['aBcD', 'abcDDe', 'aBBcdeF', 'aA', 'abCcBA']:
+            h = S.mapping_class(word)
+            g = h.simplify()
+            self.assertTrue(len(g) <= len(h))
+            self.assertEqual(g.source_triangulation, h.source_triangulation)
+            self.assertEqual(g.target_triangulation, h.target_triangulation)
+            self.assertEqual(g.identify(), h.identify())
+        
+        self.assertEqual(len(S.mapping_class('abCcBA').simplify()), 1)
+        h = S.mapping_class('aBcD')
+        for i in range(1, len(h), 5):  # These slices do not all start with an isometry.
+            self.assertEqual(h[:i].simplify(), h[:i])
+        
+        S.auto_simplify = True
+        self.assertTrue(len(S.mapping_class('aBcD')) < len(h))
+        self.assertEqual(S.mapping_class('aBcD'), h)
+    
+    def test_inverse(self):
+        S = flipper.load('S_2_1')
+        h = S.mapping_class('aBcD')
+        self.assertIs(h.inverse(), h.inverse())
+        self.assertIs(h.inverse().inverse(), h)
+        self.assertTrue(all(item.inverse().inverse() is item for item in h))
+        self.assertTrue((h.inverse() * h).is_identity())
+        self.assertTrue((h * h.inverse()).is_identity())
+        
+        T = S.triangulation
+        f, g = T.id_isometry(), T.id_isometry()
+        self.assertIs(f.inverse_index_map, g.inverse_index_map)
+    
+    def test_pl_action(self):
+        for surface, word, num_cells in [('S_1_1', 'aB', 4), ('S_1_2', 'aBc', 28), ('S_0_4', 'aB', 9)]:
+            h = flipper.load(surface).mapping_class(word)
+            cells = list(h.pl_action())
+            self.assertEqual(len(cells), num_cells)
+            for curve in h.source_triangulation.key_curves():
+                self.assertTrue(any(C.nonnegative_image(curve.geometric) and A(curve.geometric) == h(curve).geometric for A, C in cells))
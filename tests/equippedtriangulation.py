@@ -1,8 +1,16 @@
 
+import importlib
+import os
+import pickle
+import tempfile
 import unittest
+from unittest import mock
 
 import flipper
 
+# flipper.load is the load function, which hides the module that it comes from.
+load_module = importlib.import_module('flipper.load')
+
 class TestEquippedTriangulation(unittest.TestCase):
     def test_random_word(self):
         S = flipper.load('S_1_2')
@@ -14,4 +22,80 @@ class TestEquippedTriangulation(unittest.TestCase):
     def test_composition(self):
         S = flipper.load('S_1_2')
         self.assertEqual(S.mapping_class('abababababab'), S.mapping_class('xx'))
-
+    
+    def test_minimal_dilatation(self):
+        S = flipper.load('S_1_1')
+        dilatations = sorted(S.mapping_class(word).dilatation() for word in S.all_words(4) if S.mapping_class(word).is_pseudo_anosov())
+        for tolerance in [0.05, None]:
+            best = S.minimal_dilatation(4, k=3, tolerance=tolerance)
+            self.assertEqual([dilatation for dilatation, _ in best], dilatations[:3])
+            for dilatation, word in best:
+                self.assertEqual(S.mapping_class(word).dilatation(), dilatation)
+        
+        # Words discarded by the estimator must not be mistaken for a worker finishing.
+        best = S.minimal_dilatation(4, k=3, tolerance=None, cores=2)
+        self.assertEqual([dilatation for dilatation, _ in best], dilatations[:3])
+    
+    def test_mapping_class_powers(self):
+        S = flipper.load('S_1_2')
+        self.assertEqual(S.mapping_class('(aBc)^3'), S.mapping_class('aBcaBcaBc'))
+        self.assertEqual(S.mapping_class('(a(Bc)^2)^-2'), S.mapping_class('CbCbACbCbA'))
+        self.assertEqual(S.mapping_class('a^3 B^-2'), S.mapping_class('aaabb'))
+        self.assertEqual(len(S.mapping_class('(aBc)^1000')), 1000 * len(S.mapping_class('aBc')))
+        self.assertEqual(S.decompose_word('aB.c'), ['a', 'B', 'c'])
+        for word in ['(aB', 'aB)', 'a^', '^2', 'aQ']:
+            with self.assertRaises(TypeError):
+                S.mapping_class(word)
+    
+    def test_word_cache(self):
+        S = flipper.load('S_1_2')
+        S.clear_word_cache()
+        h = S.mapping_class('a.(bC)^5.A')
+        self.assertEqual(S.word_cache_info().misses, 2)
+        self.assertEqual(S.mapping_class('c.(bC)^5.C'), S.mapping_class('c') * S.mapping_class('bCbCbCbCbC') * S.mapping_class('C'))
+        self.assertGreaterEqual(S.word_cache_info().hits, 1)
+        self.assertEqual(S.mapping_class('a.(bC)^5.A'), h)
+        
+        # Changing the available mapping classes clears the cache.
+        S.mapping_classes['x'] = S.mapping_classes['a']
+        self.assertEqual(S.mapping_class('x.(bC)^5.A'), h)
+        self.assertEqual(S.word_cache_info().hits, 0)
+        
+        # Pickling keeps the letters, including ones added directly, but not the cache.
+        T = pickle.loads(pickle.dumps(S))
+        self.assertEqual(T.word_cache_info().size, 0)
+        self.assertEqual(T.mapping_class('x.(bC)^5.A'), h)
+    
+    def test_load(self):
+        S = flipper.load('S_2_1')
+        self.assertFalse(any(S.mapping_classes.is_resolved(name) for name in S.mapping_classes))
+        h = S.mapping_class('aB')
+        self.assertTrue(S.mapping_classes.is_resolved('a') and S.mapping_classes.is_resolved('B'))
+        self.assertFalse(S.mapping_classes.is_resolved('c'))
+        self.assertEqual(h, load_module.example('S_2_1').mapping_class('aB'))
+        
+        # Each load is independent.
+        S.mapping_classes['x'] = h
+        self.assertNotIn('x', flipper.load('S_2_1').mapping_classes)
+        self.assertEqual(pickle.loads(pickle.dumps(S)).mapping_class('aB'), h)
+    
+    def test_load_homology(self):
+        # Half twists permute the punctures, so their rebuilt inverses must still start on the triangulation itself.
+        for surface, word in [('SB_4', 'S_0.s_3.s_0.S_2'), ('SB_4', 's_0.s_1.S_2'), ('SB_5', 'S_3.s_1.S_0')]:
+            S, E = flipper.load(surface), load_module.example(surface)
+            self.assertEqual(S.mapping_class(word).homology_matrix(), E.mapping_class(word).homology_matrix())
+    
+    def test_load_cache(self):
+        with tempfile.TemporaryDirectory() as directory, mock.patch.dict(os.environ, {'FLIPPER_CACHE': directory}):
+            load_module.LOADED.pop('SB_5', None)
+            S = flipper.load('SB_5')
+            self.assertTrue(os.path.exists(load_module._cache_path('SB_5')))
+            
+            # Build from the cached package rather than from scratch.
+            load_module.LOADED.pop('SB_5')
+            with mock.patch.object(load_module, 'example', side_effect=AssertionError):
+                T = flipper.load('SB_5')
+            self.assertEqual(T.mapping_class('s_1S_2'), S.mapping_class('s_1S_2'))
+        
+        with self.assertRaises(KeyError):
+            flipper.load('S_9_9')
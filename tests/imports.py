@@ -0,0 +1,25 @@
+
+import subprocess
+import sys
+import unittest
+
+import flipper
+
+class TestImports(unittest.TestCase):
+    def test_lazy(self):
+        # Applying an encoding to an integral lamination should not need any of the heavy dependencies.
+        code = '; '.join([
+            'import sys',
+            'import flipper',
+            'S = flipper.load("S_1_1")',
+            'print(S.mapping_class("aB")(S.laminations["a"]))',
+            'print(",".join(module for module in ["numpy", "pandas", "realalg", "snappy"] if module in sys.modules))',
+            ])
+        output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout.split('\n')
+        self.assertEqual(output[1], '')
+    
+    def test_available(self):
+        self.assertTrue(flipper.__version__)
+        self.assertTrue(callable(flipper.monodromy_from_bundle))
+        self.assertTrue(issubclass(flipper.kernel.RealAlgebraic, object))
+
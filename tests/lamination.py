@@ -1,4 +1,5 @@
 
+import pickle
 import unittest
 
 import flipper
@@ -26,4 +27,27 @@ class TestLamination(unittest.TestCase):
                 mapping_class.invariant_lamination()
         except flipper.AssumptionError:
             pass  # mapping_class is not pseudo-Anosov.
-
+    
+    def test_algebraic(self):
+        S = flipper.load('S_2_1')
+        h = S.mapping_class('abCDe')
+        for curve in S.triangulation.key_curves():
+            image = h(curve)
+            rebuilt = image.triangulation.lamination(image.geometric)
+            # The orientation may differ so compare up to sign.
+            self.assertIn(rebuilt.algebraic, [image.algebraic, [-x for x in image.algebraic]])
+            self.assertIs(rebuilt.conjugate_short(), rebuilt.conjugate_short())
+            self.assertEqual(pickle.loads(pickle.dumps(rebuilt)), rebuilt)
+        
+        # Repeatedly applying a map must not build a chain that is too deep to evaluate.
+        curve = S.triangulation.key_curves()[0]
+        g = S.mapping_class('a')
+        for _ in range(2000):
+            curve = g(curve)
+        
+        # Nor keep every intermediate curve alive.
+        depth, lamination = 0, curve
+        while lamination._pushforward is not None:
+            depth, lamination = depth + 1, lamination._pushforward[1]
+        self.assertLessEqual(depth, flipper.kernel.lamination.MAX_PUSHFORWARD_DEPTH)
+        self.assertEqual(curve.algebraic, S.triangulation.key_curves()[0].algebraic)
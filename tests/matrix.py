@@ -13,4 +13,26 @@ class TestMatrix(unittest.TestCase):
     def test_powers(self):
         M = flipper.kernel.Matrix([[2, 1], [1, 1]])
         self.assertEqual((M**2)**3, (M**3)**2)  # Check that powers are associative.
-
+    
+    def test_inverse(self):
+        M = flipper.kernel.Matrix([[2, 1], [1, 1]])
+        self.assertEqual(M.inverse(), flipper.kernel.Matrix([[1, -1], [-1, 2]]))
+        self.assertEqual(M * M.inverse(), flipper.kernel.id_matrix(2))
+        with self.assertRaises(ValueError):
+            flipper.kernel.Matrix([[1, 2], [2, 4]]).inverse()
+    
+    def test_char_poly(self):
+        M = flipper.kernel.Matrix([[2, 1], [1, 1]])
+        self.assertEqual(M.trace(), 3)
+        self.assertEqual(M.char_poly(), [1, -3, 1])
+        self.assertEqual(flipper.kernel.id_matrix(3).char_poly(), [1, -3, 3, -1])
+    
+    def test_interior_point(self):
+        for rows in [[[1, 0], [0, 1]], [[1, -2], [-1, 3]], [[1, 1, -1], [1, -1, 1], [-1, 1, 1]]]:
+            M = flipper.kernel.Matrix(rows)
+            for hint in [None, [0] * M.width, [1] * M.width]:
+                v = M.interior_point(hint)
+                self.assertTrue(all(x > 0 for x in M(v)))
+        
+        for rows in [[[1, 0], [-1, 0]], [[1, 1], [-1, 0], [0, -1]], [[0, 0]]]:
+            self.assertIsNone(flipper.kernel.Matrix(rows).interior_point())
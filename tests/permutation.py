@@ -61,4 +61,16 @@ class TestPermutation(unittest.TestCase):
         for i in range(1, perm.order()):
             self.assertNotEqual(perm**i, identity)
         self.assertEqual(perm**perm.order(), identity)
-
+    
+    def test_tables(self):
+        Permutation = flipper.kernel.Permutation
+        for S, compose, inverse in [(flipper.kernel.permutation.S3, flipper.kernel.permutation.S3_COMPOSE, flipper.kernel.permutation.S3_INVERSE), (flipper.kernel.permutation.S4, flipper.kernel.permutation.S4_COMPOSE, flipper.kernel.permutation.S4_INVERSE)]:
+            for i, perm1 in enumerate(S):
+                self.assertEqual(Permutation(S[inverse[i]]), ~Permutation(perm1))
+                for j, perm2 in enumerate(S):
+                    self.assertEqual(Permutation(S[compose[i][j]]), Permutation(perm1) * Permutation(perm2))
+        
+        for i, perm in enumerate(flipper.kernel.permutation.S3):
+            self.assertEqual(Permutation(flipper.kernel.permutation.S4[flipper.kernel.permutation.S3_EMBED[i]]), Permutation(perm).embed(4))
+        for (a, b, c, d), index in flipper.kernel.permutation.S4_FROM_PAIR.items():
+            self.assertEqual(Permutation(flipper.kernel.permutation.S4[index]), flipper.kernel.permutation.permutation_from_pair(a, b, c, d))
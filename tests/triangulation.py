@@ -24,4 +24,37 @@ class TestTriangulation(unittest.TestCase):
             T2 = flipper.triangulation_from_iso_sig(T.iso_sig())
             self.assertTrue(T.is_isometric_to(T2))
             self.assertEqual(T.iso_sig(), T2.iso_sig())
-
+    
+    def test_homology_basis(self):
+        for surface in ['S_0_4', 'S_1_1', 'S_1_2', 'S_2_1', 'S_3_1', 'E_12']:
+            T = flipper.load(surface).triangulation
+            tree, dual_tree = T.tree_and_dual_tree()
+            self.assertFalse(any(a and b for a, b in zip(tree, dual_tree)))
+            self.assertEqual(sum(tree), T.num_vertices - len(T.components()))
+            self.assertEqual(sum(dual_tree), T.num_triangles - len(T.components()))
+            
+            basis = T.homology_basis()
+            self.assertEqual(len(basis), 2 * T.genus)
+            for path in basis:
+                # Each path is a closed loop in the dual 1--skeleton.
+                for label, next_label in zip(path, path[1:] + path[:1]):
+                    self.assertEqual(T.triangle_lookup[label], T.triangle_lookup[~next_label])
+            
+            self.assertIs(T.key_curves(), T.key_curves())
+    
+    def test_derived(self):
+        # Triangulations built by flip_edge and relabel_edges should match those built from scratch.
+        def data(T):
+            return (
+                T.signature, [vertex.label for vertex in T.vertices],
+                [[corner.label for corner in corner_class] for corner_class in T.corner_classes],
+                sorted((label, corner.vertex.label, corner.triangle.labels) for label, corner in T.corner_lookup.items()),
+                sorted((label, edge.source_vertex.label, edge.target_vertex.label) for label, edge in T.edge_lookup.items()),
+                )
+        
+        for surface in ['S_0_4', 'S_1_2', 'S_2_1', 'E_12']:
+            T = flipper.load(surface).triangulation
+            for edge_label in T.flippable_edges():
+                for T2 in [T.flip_edge(edge_label), T.flip_edge(~edge_label).relabel_edges([~i for i in T.indices])]:
+                    self.assertEqual(data(T2), data(flipper.create_triangulation(*T2.package())))
+                    self.assertEqual(data(T2), data(flipper.kernel.Triangulation(list(T2.triangles))))
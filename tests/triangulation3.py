@@ -1,4 +1,5 @@
 
+from itertools import combinations
 import unittest
 try:
     import snappy
@@ -49,4 +50,80 @@ class TestTriangulation3(unittest.TestCase):
         for surface, word in twister_tests:
             manifold = snappy.Manifold(flipper.load(surface).mapping_class(word).bundle(veering=False))
             self.assertManifoldsIsometric(manifold, snappy.twister.Surface(surface).bundle(word))
-
+    
+    def test_layered(self):
+        for surface, word, _ in tests:
+            h = flipper.load(surface).mapping_class(word)
+            layered = flipper.kernel.LayeredTriangulation(h.source_triangulation)
+            layered.extend(reversed(h.sequence))
+            bundle = layered.close()
+            
+            # Streaming the moves in one at a time should build exactly the same triangulation.
+            layered = flipper.kernel.LayeredTriangulation(h.source_triangulation)
+            for move in reversed(h.sequence):
+                layered.extend(iter([move]))
+            streamed = layered.close()
+            self.assertEqual(str(streamed.triangulation3), str(bundle.triangulation3))
+            self.assertEqual(streamed.triangulation3.num_tetrahedra, h.flip_length())
+            self.assertEqual(set(streamed.immersion), set(h.source_triangulation))
+    
+    def test_cusps(self):
+        for surface, word, _ in tests:
+            triangulation3 = flipper.load(surface).mapping_class(word).bundle().triangulation3
+            corners = [corner for cusp in triangulation3.cusps for corner in cusp]
+            self.assertEqual(len(corners), 4 * triangulation3.num_tetrahedra)
+            self.assertEqual(len(set(corners)), len(corners))
+            for index, cusp in enumerate(triangulation3.cusps):
+                self.assertTrue(all(tetrahedron.cusp_indices[side] == index for tetrahedron, side in cusp))
+    
+    def test_iso_sig(self):
+        for surface, word, _ in tests:
+            bundle = flipper.load(surface).mapping_class(word).bundle()
+            sig = bundle.iso_sig()
+            self.assertEqual(flipper.kernel.Triangulation3.from_iso_sig(sig).iso_sig(), sig)
+            if snappy is not None:
+                self.assertEqual(snappy.Manifold(bundle.snappy_string(filled=False)).triangulation_isosig(decorated=False), sig)
+        
+        self.assertEqual(flipper.load('S_1_1').mapping_class('aB').bundle().iso_sig(), 'cPcbbbiht')  # m004.
+        self.assertEqual(flipper.load('S_1_1').mapping_class('Ab').bundle().iso_sig(), 'cPcbbbiht')
+        
+        with self.assertRaises(flipper.AssumptionError):
+            flipper.kernel.Triangulation3.from_iso_sig('bkaaid')  # The Gieseking manifold is not orientable.
+    
+    def test_views(self):
+        triangulation3 = flipper.load('S_1_1').mapping_class('aB').bundle().triangulation3
+        for tetrahedron in triangulation3:
+            for side in range(4):
+                target, permutation = tetrahedron.glued_to[side]
+                self.assertEqual(target.glued_to[permutation(side)], (tetrahedron, permutation.inverse()))
+                for a, b in combinations([vertex for vertex in range(4) if vertex != side], 2):
+                    self.assertEqual(tetrahedron.get_edge_label(a, b), target.get_edge_label(permutation(a), permutation(b)))
+        
+        # Tetrahedra created later still see the arrays of their triangulation.
+        tetrahedron = triangulation3.create_tetrahedron()
+        tetrahedron.set_edge_label(0, 1, flipper.kernel.triangulation3.VEERING_LEFT)
+        tetrahedron.cusp_indices[2] = 5
+        tetrahedron.peripheral_curves[0][1][2] = 3
+        self.assertEqual(tetrahedron.edge_labels[(0, 1)], flipper.kernel.triangulation3.VEERING_LEFT)
+        self.assertEqual(list(tetrahedron.cusp_indices), [-1, -1, 5, -1])
+        self.assertEqual(triangulation3.peripheral_curves[tetrahedron.label, 0, 1, 2], 3)
+        self.assertEqual(tetrahedron.glued_to, [None] * 4)
+        
+        # Writing to the views writes to the triangulation, or fails loudly.
+        tetrahedron.edge_labels[(2, 3)] = flipper.kernel.triangulation3.VEERING_RIGHT
+        self.assertEqual(tetrahedron.get_edge_label(3, 2), flipper.kernel.triangulation3.VEERING_RIGHT)
+        self.assertEqual(dict(tetrahedron.edge_labels)[(0, 1)], flipper.kernel.triangulation3.VEERING_LEFT)
+        with self.assertRaises(TypeError):
+            tetrahedron.glued_to[0] = (tetrahedron, flipper.kernel.Permutation((1, 0, 2, 3)))
+        
+        # Tetrahedra can still be made on their own.
+        tetrahedron = flipper.kernel.Tetrahedron(2)
+        self.assertEqual(tetrahedron.label, 2)
+        self.assertEqual(tetrahedron.triangulation3.num_tetrahedra, 1)
+        self.assertIs(tetrahedron.triangulation3.tetrahedra[0], tetrahedron)
+        tetrahedron.cusp_indices[3] = 5
+        self.assertEqual(list(tetrahedron.cusp_indices), [-1, -1, -1, 5])
+        self.assertEqual(len(flipper.kernel.Tetrahedron(10**9).triangulation3.gluing_targets), 4)
+        self.assertEqual(tetrahedron.vertex_labels, [None] * 4)
+        with self.assertRaises(ValueError):
+            tetrahedron.glue(0, triangulation3.tetrahedra[0], flipper.kernel.Permutation((1, 0, 2, 3)))
@@ -0,0 +1,24 @@
+
+from hypothesis import given
+import hypothesis.strategies as st
+import unittest
+
+import flipper
+
+class TestIndexedHeap(unittest.TestCase):
+    @given(st.lists(st.tuples(st.integers(0, 20), st.integers(-100, 100))))
+    def test_heap(self, updates):
+        heap = flipper.kernel.utilities.IndexedHeap()
+        keys = dict()
+        for item, key in updates:
+            if key % 7 == 0 and item in keys:
+                del heap[item]
+                del keys[item]
+            else:
+                heap[item] = key
+                keys[item] = key
+            self.assertEqual(len(heap), len(keys))
+            if keys:
+                self.assertEqual(heap.peek(), min((key, item) for item, key in keys.items()))
+        
+        self.assertEqual([heap.pop() for _ in range(len(heap))], sorted((key, item) for item, key in keys.items()))
@@ -0,0 +1,68 @@
+import io
+import unittest
+from unittest import mock
+
+import flipper
+
+class TestWire(unittest.TestCase):
+    def test_round_trip(self):
+        wire = flipper.kernel.wire
+        S = flipper.load('S_1_2')
+        for word in ['aBc', 'xxaB', 'ab.ab.ab.ab.ab.ab']:
+            h = S.mapping_class(word)
+            for encoding in [h, h.simplify(), h.canonical() if h.is_pseudo_anosov() else h.inverse()]:
+                new = wire.loads(wire.dumps(encoding))
+                self.assertEqual(new.package(), encoding.package())
+                self.assertEqual(new, encoding)
+            lamination = h(S.laminations['a'])
+            self.assertEqual(wire.loads(wire.dumps(lamination)), lamination)
+            self.assertEqual(wire.loads(wire.dumps(lamination)).algebraic, lamination.algebraic)
+        self.assertEqual(wire.loads(wire.dumps(S.triangulation)).package(), S.triangulation.package())
+        
+        # Names survive, but are not invented for unnamed encodings.
+        self.assertEqual(wire.loads(wire.dumps(S.mapping_class('aB')))._cache.get('name'), 'aB')
+        self.assertNotIn('name', wire.loads(wire.dumps(S.triangulation.encode([0], _cache=dict())))._cache)
+    
+    def test_linear(self):
+        # Decoding must not build an Encoding for every prefix of the moves, as that is quadratic.
+        wire = flipper.kernel.wire
+        h = flipper.load('S_1_2').mapping_class('abC')**50
+        data = wire.dumps(h)
+        sizes = []
+        init = flipper.kernel.Encoding.__init__
+        
+        def recording_init(self, sequence, _cache=None):
+            sizes.append(len(sequence))
+            init(self, sequence, _cache)
+        
+        with mock.patch.object(flipper.kernel.Encoding, '__init__', recording_init):
+            new = wire.loads(data)
+        self.assertEqual(new.package(), h.package())
+        self.assertLessEqual(sum(sizes), 2 * len(h))
+    
+    def test_stream(self):
+        wire = flipper.kernel.wire
+        S = flipper.load('S_2_1')
+        encodings = [S.mapping_class(S.random_word(5)) for _ in range(20)]
+        file = io.BytesIO()
+        with wire.WireWriter(file) as writer:
+            for encoding in encodings:
+                writer.write(encoding)
+            writer.write(S.laminations['a'])
+        
+        file.seek(0)
+        records = list(wire.WireReader(file))
+        self.assertEqual([record.kind for record in records], ['encoding'] * 20 + ['lamination'])
+        self.assertEqual(records[0].triangulation(), S.triangulation)
+        for record, encoding in zip(records, encodings):
+            self.assertEqual(record.value().package(), encoding.package())
+        self.assertEqual(records[-1].value(), S.laminations['a'])
+    
+    def test_invalid(self):
+        wire = flipper.kernel.wire
+        data = wire.dumps(flipper.load('S_1_1').mapping_class('aB'))
+        # A triangulation record whose index refers to a triangulation that was never defined.
+        missing = wire.dumps(flipper.load('S_1_1').triangulation)[:-1] + bytes([5])
+        for bad in [b'', b'XYZ' + data[3:], data[:3] + bytes([wire.VERSION + 1]) + data[4:], data[:-1], missing]:
+            with self.assertRaises(ValueError):
+                wire.loads(bad)